@@ -0,0 +1,158 @@
+# Third-party imports
+import httpx
+
+# Built-in imports
+from collections import deque
+import asyncio
+import gzip
+import itertools
+import json
+import signal
+import time
+
+# local imports
+from app.config import settings
+from app.ingest.fetcher import Fetcher
+from app.ingest.scheduler import Scheduler
+from app.models.sample import MetricSample
+from app.transform.transformer import Transformer
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# longest wait between POST attempts while the server keeps failing
+MAX_RETRY_DELAY = 60.0
+
+class Agent:
+    """
+    Collects and transforms samples on the local host and POSTs them to a
+    central `/ingest` endpoint as gzip-compressed batches.
+
+    Samples wait in a bounded buffer until a batch is full or
+    `flush_interval` has passed. While the server is unreachable they stay
+    buffered (the oldest are dropped once `buffer_size` is reached) and the
+    POST is retried with exponential backoff.
+    """
+    def __init__(
+        self,
+        url: str | None = None,
+        interval: float | None = None,
+        batch_size: int | None = None,
+        flush_interval: float | None = None,
+        buffer_size: int | None = None,
+        client: httpx.AsyncClient | None = None,
+        clock=time.monotonic,
+    ):
+        self.url = url or settings.INGEST_URL
+        self.host = settings.HOST_NAME
+        self.batch_size = batch_size or settings.AGENT_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else settings.AGENT_FLUSH_INTERVAL
+        self.buffer: deque[MetricSample] = deque(maxlen=buffer_size or settings.AGENT_BUFFER_SIZE)
+        self.client = client or httpx.AsyncClient(timeout=settings.REQUEST_TIMEOUT)
+        self.headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+        if settings.API_KEY:
+            self.headers["X-API-Key"] = settings.API_KEY
+        self.clock = clock
+        self.fetcher = Fetcher()
+        self.transformer = Transformer()
+        self.scheduler = Scheduler(interval if interval is not None else settings.COLLECT_INTERVAL, self.tick)
+        self.sent = 0
+        self.dropped = 0
+        self.failures = 0
+        self._last_send = clock()
+        self._retry_at = 0.0
+        self._sender: asyncio.Task | None = None
+
+    def add(self, items: list[MetricSample]) -> None:
+        for item in items:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.dropped += 1 # the deque evicts the oldest sample
+            if not item.host:
+                item.host = self.host
+            self.buffer.append(item)
+
+    def due(self, now: float) -> bool:
+        if not self.buffer or now < self._retry_at:
+            return False
+        return len(self.buffer) >= self.batch_size or now - self._last_send >= self.flush_interval
+
+    async def tick(self) -> None:
+        sample = await self.fetcher.fetch_metrics()
+        self.add(self.transformer.transform([sample]))
+        if self.due(self.clock()) and (self._sender is None or self._sender.done()):
+            # POSTs run beside the collection schedule, one at a time
+            self._sender = asyncio.create_task(self.drain())
+
+    async def drain(self) -> None:
+        """Send full batches until the buffer is empty or a POST fails."""
+        while self.buffer and await self.send():
+            if len(self.buffer) < self.batch_size:
+                break
+
+    async def send(self) -> bool:
+        """POST the oldest buffered samples as one batch; True if the server took them."""
+        batch = list(itertools.islice(self.buffer, self.batch_size))
+        if not batch:
+            return True
+        self._last_send = self.clock()
+        body = gzip.compress(json.dumps({"samples": [item.to_dict() for item in batch]}).encode())
+        try:
+            response = await self.client.post(self.url, content=body, headers=self.headers)
+        except httpx.HTTPError as e:
+            return self._failed(f"POST {self.url} failed: {e}")
+        if response.status_code in (408, 429) or response.status_code >= 500:
+            return self._failed(f"Ingest server answered {response.status_code}")
+
+        sent = {id(item) for item in batch}
+        while self.buffer and id(self.buffer[0]) in sent:
+            self.buffer.popleft()
+        self.failures = 0
+        self._retry_at = 0.0
+        if response.is_success:
+            self.sent += len(batch)
+            logger.info(f"Sent {len(batch)} sample(s) to {self.url}")
+            return True
+        # any other 4xx is a permanent rejection: retrying the same batch cannot succeed
+        self.dropped += len(batch)
+        logger.error(f"Ingest server rejected {len(batch)} sample(s) with {response.status_code}: {response.text}")
+        return False
+
+    def _failed(self, message: str) -> bool:
+        self.failures += 1
+        delay = min(settings.RETRY_BACKOFF * 2 ** (self.failures - 1), MAX_RETRY_DELAY)
+        self._retry_at = self.clock() + delay
+        logger.warning(f"{message}; {len(self.buffer)} sample(s) buffered, retrying in {delay:.1f}s")
+        return False
+
+    async def close(self) -> None:
+        """Try to send what is buffered, then release the HTTP client and collector threads."""
+        if self._sender is not None:
+            await self._sender
+        self._retry_at = 0.0
+        await self.drain()
+        if self.buffer:
+            logger.warning(f"Agent stopped with {len(self.buffer)} unsent sample(s)")
+        await self.client.aclose()
+        self.fetcher.close()
+
+    def stats(self) -> dict:
+        return {"buffered": len(self.buffer), "sent": self.sent, "dropped": self.dropped, "failures": self.failures}
+
+async def main():
+    agent = Agent()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, agent.scheduler.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+    logger.info(f"Agent for '{agent.host}' posting to {agent.url} every {agent.scheduler.interval}s")
+    try:
+        await agent.scheduler.run()
+    finally:
+        await agent.close()
+        logger.info(f"Agent stopped: {agent.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+# third-party imports
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+
+# Built-in imports
+from datetime import datetime
+from typing import AsyncIterator
+import json
+import zlib
+
+# local imports
+from app.config import settings
+from app.storage.database import AsyncSessionLocal
+from app.storage.storage import storage
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+async def ndjson_chunks(
+    start: datetime | None, end: datetime | None, chunk_size: int, host: str | None = None
+) -> AsyncIterator[bytes]:
+    """Serialise each cursor partition into one NDJSON chunk as soon as it arrives."""
+    # the request-scoped session is closed before a streaming body runs, so own one here
+    async with AsyncSessionLocal() as session:
+        exported = 0
+        async for records in storage.stream_data_from_db(session, start=start, end=end, chunk_size=chunk_size, host=host):
+            yield "".join(json.dumps(record.to_dict()) + "\n" for record in records).encode()
+            exported += len(records)
+        logger.info(f"Exported {exported} records")
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    compressor = zlib.compressobj(wbits=31) # gzip container
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+@router.get("/records/export", tags=["Metrics"])
+async def export_records(
+    start: datetime | None = Query(None, alias="from", description="Inclusive lower time bound"),
+    end: datetime | None = Query(None, alias="to", description="Exclusive upper time bound"),
+    gzip: bool = Query(False, description="gzip-compress the stream"),
+    host: str | None = Query(None, description="Only samples of this host"),
+):
+    logger.info("Exporting records...")
+    body = ndjson_chunks(start, end, settings.EXPORT_CHUNK_SIZE, host)
+    headers = {"Content-Disposition": 'attachment; filename="records.ndjson"'}
+    if gzip:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
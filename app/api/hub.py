@@ -0,0 +1,263 @@
+# Third-party imports
+from fastapi import WebSocket
+
+# Built-in imports
+from collections import deque
+import asyncio
+import json
+import time
+
+# local imports
+from app.api.subscriber import Subscriber, sub
+from app.config import settings
+from app.ingest.codec import decode_payload
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+OVERFLOW_POLICIES = ("drop_oldest", "latest")
+FORMATS = ("json", "binary")
+
+# always sent with a projection so clients can place the values in time
+PROJECTION_KEYS = ("timestamp",)
+
+def parse_subscription(text: str) -> tuple[tuple[str, ...] | None, float | None]:
+    """
+    Read a `{"fields": [...], "max_rate": <Hz>}` subscription message.
+
+    Fields are top-level keys or `group.key` paths such as `memory.percent`;
+    omitting `fields` asks for the full sample and omitting `max_rate` for
+    every sample. Raises ValueError on anything else.
+    """
+    request = json.loads(text)
+    if not isinstance(request, dict):
+        raise ValueError("subscription must be a JSON object")
+    fields = request.get("fields")
+    if fields is not None:
+        if not isinstance(fields, list) or not fields or not all(isinstance(f, str) and f for f in fields):
+            raise ValueError("fields must be a non-empty list of strings")
+        fields = tuple(sorted(set(fields)))
+    max_rate = request.get("max_rate")
+    if max_rate is not None:
+        if isinstance(max_rate, bool) or not isinstance(max_rate, (int, float)) or max_rate <= 0:
+            raise ValueError("max_rate must be a positive number")
+        max_rate = float(max_rate)
+    return fields, max_rate
+
+def project(sample: dict, fields: tuple[str, ...]) -> dict:
+    """
+    Keep only the requested top-level keys and `group.key` paths of a sample.
+    Groups that are missing or null (a degraded sample) are left out; group
+    dicts are copied so a `group.key` path never writes into the sample.
+    """
+    out = {key: sample[key] for key in PROJECTION_KEYS if key in sample}
+    for path in fields:
+        group, _, key = path.partition(".")
+        values = sample.get(group)
+        if values is None:
+            continue
+        if not key:
+            out[group] = dict(values) if isinstance(values, dict) else values
+            continue
+        out.setdefault(group, {})[key] = values.get(key) if isinstance(values, dict) else None
+    return out
+
+class WebSocketClient:
+    """
+    Bounded outbound queue and sender task for one WebSocket.
+
+    `offer()` never blocks: when the queue is full the oldest message is
+    dropped (`drop_oldest`), or the queue always collapses to the newest
+    snapshot (`latest`). A slow socket therefore only delays itself.
+    `fields` and `min_interval` describe what the client subscribed to;
+    `binary` clients get the published payload relayed as-is in binary frames.
+    """
+    def __init__(self, websocket: WebSocket, max_size: int | None = None, policy: str | None = None, binary: bool = False):
+        policy = policy or settings.WS_OVERFLOW_POLICY
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {OVERFLOW_POLICIES}")
+        self.websocket = websocket
+        self.binary = binary
+        self.max_size = max_size or settings.WS_QUEUE_SIZE
+        self.policy = policy
+        self.fields: tuple[str, ...] | None = None
+        self.min_interval = 0.0
+        self.next_due = 0.0
+        self.sent = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self._queue: deque[tuple[float, str | bytes]] = deque()
+        self._ready = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def subscribe(self, fields: tuple[str, ...] | None, max_rate: float | None) -> None:
+        if fields and self.binary:
+            raise ValueError("fields are not supported with format=binary")
+        self.fields = fields
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.next_due = 0.0
+
+    def due(self, now: float) -> bool:
+        """Rate limit: true when the client may receive a message at `now`."""
+        if now < self.next_due:
+            self.skipped += 1
+            return False
+        # 5% slack keeps a 1 Hz client on a 1 s collection interval from skipping ticks on jitter
+        self.next_due = now + self.min_interval * 0.95
+        return True
+
+    def offer(self, data: str | bytes) -> None:
+        if self.policy == "latest":
+            self.dropped += len(self._queue)
+            self._queue.clear()
+        elif len(self._queue) >= self.max_size:
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append((time.monotonic(), data))
+        self._ready.set()
+
+    async def run(self) -> None:
+        while True:
+            while not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+            enqueued_at, data = self._queue.popleft()
+            if isinstance(data, bytes):
+                await self.websocket.send_bytes(data)
+            else:
+                await self.websocket.send_text(data)
+            self.sent += 1
+            self.last_lag = time.monotonic() - enqueued_at
+            self.max_lag = max(self.max_lag, self.last_lag)
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "format": "binary" if self.binary else "json",
+            "fields": self.fields,
+            "max_rate": 1.0 / self.min_interval if self.min_interval else None,
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+        }
+
+class BroadcastHub:
+    """
+    Fans Redis pub/sub messages out to every connected WebSocket.
+
+    The process holds a single subscription per channel, taken when the first
+    client joins and dropped when the last one leaves, and one listener task
+    that awaits messages instead of polling for them. Messages are handed to
+    each client's bounded queue, so fan-out never waits on a socket. Each
+    distinct field projection is serialised at most once per message and
+    shared by every client that asked for it.
+    """
+    def __init__(self, subscriber: Subscriber = sub, retry_delay: float = 1.0):
+        self.subscriber = subscriber
+        self.retry_delay = retry_delay
+        self.clients: dict[str, dict[WebSocket, WebSocketClient]] = {}
+        self._listener: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.encodes = 0
+
+    def client_count(self, channel: str | None = None) -> int:
+        if channel is not None:
+            return len(self.clients.get(channel, ()))
+        return sum(len(clients) for clients in self.clients.values())
+
+    async def join(self, channel: str, websocket: WebSocket, **client_options) -> WebSocketClient:
+        async with self._lock:
+            client = WebSocketClient(websocket, **client_options)
+            client.task = asyncio.create_task(self._send_loop(channel, client))
+            clients = self.clients.setdefault(channel, {})
+            clients[websocket] = client
+            if len(clients) == 1:
+                await self.subscriber.subscribe(channel)
+                logger.info(f"Hub subscribed to '{channel}'")
+            if self._listener is None or self._listener.done():
+                self._listener = asyncio.create_task(self._listen())
+            return client
+
+    async def leave(self, channel: str, websocket: WebSocket) -> None:
+        async with self._lock:
+            clients = self.clients.get(channel)
+            if not clients or websocket not in clients:
+                return
+            client = clients.pop(websocket)
+            if client.task is not asyncio.current_task():
+                client.task.cancel()
+            if clients:
+                return
+            del self.clients[channel]
+            await self.subscriber.unsubscribe(channel)
+            logger.info(f"Hub unsubscribed from '{channel}'")
+            if not self.clients and self._listener is not None:
+                self._listener.cancel()
+                self._listener = None
+
+    async def _listen(self) -> None:
+        while self.clients:
+            try:
+                async for message in self.subscriber.listen():
+                    await self.broadcast(message["channel"], message["data"])
+                # listen() returns at once without a subscription, e.g. when Redis was down on subscribe
+                logger.warning(f"Hub listener has no subscription, re-subscribing in {self.retry_delay}s")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Hub listener failed, retrying: {e}")
+            await asyncio.sleep(self.retry_delay)
+            await self._resubscribe()
+
+    async def _resubscribe(self) -> None:
+        async with self._lock:
+            for channel in self.clients:
+                await self.subscriber.subscribe(channel)
+
+    async def broadcast(self, channel: str, data: str | bytes) -> None:
+        now = time.monotonic()
+        payloads: dict[tuple[bool, tuple[str, ...] | None], str | bytes] = {}
+        sample = None
+        for client in self.clients.get(channel, {}).values():
+            if not client.due(now):
+                continue
+            key = (client.binary, client.fields)
+            payload = payloads.get(key)
+            if payload is None:
+                if client.binary: # relayed without decoding
+                    payload = data if isinstance(data, bytes) else data.encode()
+                elif client.fields is None and isinstance(data, str): # already JSON text
+                    payload = data
+                else:
+                    try:
+                        if sample is None:
+                            sample = decode_payload(data) # decoded once per message
+                        payload = json.dumps(project(sample, client.fields) if client.fields else sample)
+                        self.encodes += 1
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"Cannot decode message on '{channel}', relaying it as-is: {e}")
+                        payload = data
+                payloads[key] = payload
+            client.offer(payload)
+
+    async def _send_loop(self, channel: str, client: WebSocketClient) -> None:
+        try:
+            await client.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e: # the endpoint's receive loop will notice the disconnect too
+            logger.warning(f"Dropping WebSocket client after failed send: {e}")
+            await self.leave(channel, client.websocket)
+
+    def stats(self) -> dict:
+        return {
+            channel: [client.stats() for client in clients.values()]
+            for channel, clients in self.clients.items()
+        }
+
+hub = BroadcastHub()
@@ -0,0 +1,92 @@
+# third-party imports
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Built-in imports
+import hmac
+import json
+import zlib
+
+# local imports
+from app.config import settings
+from app.ingest.codec import get_codec
+from app.ingest.publisher import publisher
+from app.ingest.stream import StreamProducer
+from app.models.models import IngestBatch
+from app.models.sample import MetricSample
+from app.pipeline import propagate_batch, publish_alerts
+from app.storage.database import get_db_session
+from app.storage.redis_cache import cache_panel
+from app.storage.rollup import rollups
+from app.storage.storage import storage
+from app.transform.anomaly import AnomalyDetector
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter()
+
+# with the stream transport the storage workers do the writes
+stream = StreamProducer(settings.REDIS_URL) if settings.INGEST_TRANSPORT == "stream" else None
+codec = get_codec(settings.METRICS_CODEC)
+# rolling alert state of the agents' hosts, kept per host by the detector
+detector = AnomalyDetector() if settings.ALERTS_ENABLED else None
+
+def channel_sample(sample: MetricSample) -> dict:
+    """A stored sample in the `metrics-channel` shape."""
+    item = sample.to_dict()
+    return {"timestamp": item.pop("time_stamp"), **item}
+
+def check_api_key(request: Request) -> None:
+    if settings.API_KEY and not hmac.compare_digest(request.headers.get("x-api-key", ""), settings.API_KEY):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key!")
+
+def gunzip(body: bytes, max_bytes: int) -> bytes:
+    """Inflate a gzip body, refusing anything that grows past `max_bytes`."""
+    try:
+        inflater = zlib.decompressobj(wbits=31)
+        data = inflater.decompress(body, max_bytes + 1)
+    except zlib.error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid gzip body!")
+    if len(data) > max_bytes or inflater.unconsumed_tail:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Batch too large!")
+    return data
+
+@router.post("/ingest", status_code=status.HTTP_202_ACCEPTED, tags=["Ingest"])
+async def ingest(request: Request, db: AsyncSession = Depends(get_db_session)):
+    """
+    Store a batch of transformed samples posted by an agent.
+
+    The body is `{"samples": [...]}`, optionally gzip-encoded. The batch is
+    validated as a whole in one pass and written with a single bulk insert
+    (or XADD with the stream transport); any invalid sample rejects the
+    batch with 422. A 503 means nothing was stored and the agent should retry.
+    """
+    check_api_key(request)
+    body = await request.body()
+    if request.headers.get("content-encoding", "").lower() == "gzip":
+        body = gunzip(body, settings.INGEST_MAX_BYTES)
+    elif len(body) > settings.INGEST_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Batch too large!")
+    try:
+        batch = IngestBatch.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=json.loads(e.json(include_url=False)))
+    if len(batch.samples) > settings.INGEST_MAX_BATCH:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Batch too large!")
+
+    items = [MetricSample.from_dict(sample.model_dump()) for sample in batch.samples]
+    if stream is not None:
+        if not await stream.add_many(items):
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Ingest stream unavailable!")
+    else:
+        ids = await storage.save_many_to_db(items, db)
+        if not ids:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Storage unavailable!")
+        await propagate_batch(items, ids, rollups, cache_panel)
+    # live subscribers see remote hosts like the local one, on the shared and per-host channels
+    await publisher.publish_many("metrics-channel", [(item.host, codec.encode(channel_sample(item))) for item in items])
+    await publish_alerts(detector, items)
+    logger.info(f"Ingested {len(items)} sample(s)")
+    return {"accepted": len(items)}
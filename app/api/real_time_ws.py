@@ -4,11 +4,15 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
 # built-in imports
 import asyncio
+import json
+import re
 
 # local imports
+from app.config import settings
 from app.utils.logger import get_logger
 from app.ingest.fetcher import Fetcher
-from app.api.subscriber import sub
+from app.api.hub import FORMATS, OVERFLOW_POLICIES, hub, parse_subscription
+from app.ingest.publisher import host_channel
 
 logger = get_logger(__name__)
 
@@ -16,17 +20,59 @@ router = APIRouter()
 
 SERVER_URL = "ws://localhost:8765"
 
+# host names that may be turned into a Redis channel name
+HOST_PATTERN = re.compile(r"[A-Za-z0-9_.:-]{1,255}")
+
 @router.websocket("/ws/metrics")
-async def listen_channel(websocket: WebSocket):
+async def listen_channel(websocket: WebSocket, policy: str | None = None, format: str = "json", host: str | None = None):
+    if policy is not None and policy not in OVERFLOW_POLICIES:
+        await websocket.close(code=1008, reason=f"policy must be one of {OVERFLOW_POLICIES}")
+        return
+    if format not in FORMATS:
+        await websocket.close(code=1008, reason=f"format must be one of {FORMATS}")
+        return
+    if host is not None and not HOST_PATTERN.fullmatch(host):
+        await websocket.close(code=1008, reason="invalid host")
+        return
+    # a host's samples are also published on its own channel, so Redis does the filtering
+    channel = "metrics-channel" if host is None else host_channel("metrics-channel", host)
     await websocket.accept()
-    await sub.subscribe("metrics-channel")
+    # shared subscription, fanned out by the hub
+    client = await hub.join(channel, websocket, policy=policy, binary=format == "binary")
     
     try:
         while True:
-            message = await sub.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-            if message:
-                await websocket.send_text(message['data'])
-            await asyncio.sleep(0.01)
+            message = await websocket.receive_text() # {"fields": [...], "max_rate": <Hz>}, at any time
+            try:
+                client.subscribe(*parse_subscription(message))
+            except ValueError as e:
+                client.offer(json.dumps({"error": f"Invalid subscription: {e}"}))
     except WebSocketDisconnect:
-        await sub.unsubscribe("metrics-channel")
-        await sub.close()
+        pass
+    finally:
+        await hub.leave(channel, websocket)
+
+
+@router.websocket("/ws/alerts")
+async def listen_alerts(websocket: WebSocket, host: str | None = None):
+    """Threshold and anomaly alert events as they fire and resolve, optionally for one host."""
+    if host is not None and not HOST_PATTERN.fullmatch(host):
+        await websocket.close(code=1008, reason="invalid host")
+        return
+    channel = settings.ALERTS_CHANNEL if host is None else host_channel(settings.ALERTS_CHANNEL, host)
+    await websocket.accept()
+    # a slow client keeps the newest alerts rather than the newest state only
+    await hub.join(channel, websocket, policy="drop_oldest")
+    try:
+        while True:
+            await websocket.receive_text() # nothing to configure, only watch for the disconnect
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await hub.leave(channel, websocket)
+
+
+@router.get("/ws/stats", tags=["WebSocket"])
+async def websocket_stats():
+    """Queue depth, sent/dropped counters and send lag of every connected client."""
+    return hub.stats()
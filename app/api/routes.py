@@ -1,31 +1,126 @@
 # third-party imports
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # Built-in imports
+from datetime import datetime, timedelta, timezone
 from typing import List
+import base64
 
 # local imports
-from app.models.models import Metrics, MetricsModel
+from app.config import settings
+from app.models.models import Aggregates, Metrics, MetricsModel, Percentiles, ROLLUP_RESOLUTIONS
 from app.storage.database import get_db_session
-from app.storage.storage import storage
+from app.storage.record_cache import record_cache
+from app.storage.redis_cache import cache_panel
+from app.storage.rollup import choose_resolution, rollups
+from app.storage.storage import storage, to_naive_utc
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+def encode_cursor(record) -> str:
+    """Opaque page cursor holding the (time_stamp, id) of the last row served."""
+    raw = f"{record.time_stamp.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        time_stamp, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(time_stamp), int(record_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor!")
+
 @router.get("/records", response_model=List[Metrics], tags=["Metrics"])
-async def get_records(db: AsyncSession = Depends(get_db_session)):
+async def get_records(
+    response: Response,
+    start: datetime | None = Query(None, alias="from", description="Inclusive lower time bound"),
+    end: datetime | None = Query(None, alias="to", description="Exclusive upper time bound"),
+    limit: int = Query(settings.RECORDS_PAGE_SIZE, ge=1, le=settings.RECORDS_MAX_PAGE_SIZE),
+    cursor: str | None = Query(None, description="Value of X-Next-Cursor from the previous page"),
+    host: str | None = Query(None, description="Only samples of this host"),
+    db: AsyncSession = Depends(get_db_session)
+):
     logger.info("Retrieving data...")
-    return await storage.get_data_from_db(db)
+    after = decode_cursor(cursor) if cursor else None
+    records = await storage.get_data_from_db(db, start=start, end=end, limit=limit, after=after, host=host)
+    if len(records) == limit: # a full page, there may be more
+        response.headers["X-Next-Cursor"] = encode_cursor(records[-1])
+    return records
+
+@router.get("/records/recent", response_model=List[Metrics], tags=["Metrics"])
+async def get_recent_records(
+    seconds: int = Query(300, ge=1, description="Look-back window in seconds"),
+    host: str | None = Query(None, description="Only samples of this host"),
+    db: AsyncSession = Depends(get_db_session)
+):
+    # both paths return the newest RECORDS_MAX_PAGE_SIZE samples of the window
+    if seconds <= settings.CACHE_WINDOW_SECONDS:
+        records = await cache_panel.get_recent(seconds, host=host, limit=settings.RECORDS_MAX_PAGE_SIZE)
+        if records is not None: # the Redis hot window covers the whole span
+            return records
+    logger.info("Recent records not cached, reading from DB...")
+    start = datetime.now(timezone.utc) - timedelta(seconds=seconds)
+    return await storage.get_latest_from_db(db, start, settings.RECORDS_MAX_PAGE_SIZE, host=host)
 
 @router.get("/record/{record_id}", response_model=Metrics, tags=["Metrics"])
 async def get_record(record_id: int, db: AsyncSession = Depends(get_db_session)):
-    result = await storage.get_record_from_db(db, record_id)
+    result = await record_cache.get(db, record_id) # LRU → Redis → DB
     if result is None:
         logger.warning(f"Warning: record with ID {record_id} has not been found!")
         raise HTTPException(status_code=404, detail="Record not found!")
     logger.info(f"The record with Id {record_id} has been retrieved!")
-    return result
\ No newline at end of file
+    return result
+
+@router.get("/aggregates", response_model=Aggregates, tags=["Metrics"])
+async def get_aggregates(
+    resolution: str | None = Query(None, description="1m, 1h or 1d; picked from the range when omitted"),
+    start: datetime | None = Query(None, alias="from", description="Inclusive lower time bound, defaults to 24h before `to`"),
+    end: datetime | None = Query(None, alias="to", description="Exclusive upper time bound, defaults to now"),
+    metric: List[str] | None = Query(None, description="Metric columns to return, all when omitted"),
+    host: str | None = Query(None, description="Only buckets of this host, every host's when omitted"),
+    db: AsyncSession = Depends(get_db_session)
+):
+    # naive bounds are UTC, like the stored buckets
+    end = to_naive_utc(end or datetime.now(timezone.utc))
+    start = to_naive_utc(start) if start is not None else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`from` must be before `to`!")
+    if resolution is None:
+        resolution = choose_resolution(start, end)
+    elif resolution not in ROLLUP_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown resolution, expected one of {list(ROLLUP_RESOLUTIONS)}")
+    logger.info(f"Retrieving {resolution} aggregates...")
+    points = await rollups.query(db, resolution, start, end, metric, host=host)
+    return {"resolution": resolution, "points": points}
+
+@router.get("/percentiles", response_model=Percentiles, tags=["Metrics"])
+async def get_percentiles(
+    metric: str = Query(..., description="Sketched metric column, e.g. cpu_percent"),
+    q: List[float] = Query([0.5, 0.95, 0.99], description="Quantiles between 0 and 1"),
+    start: datetime | None = Query(None, alias="from", description="Inclusive lower time bound, defaults to 24h before `to`"),
+    end: datetime | None = Query(None, alias="to", description="Exclusive upper time bound, defaults to now"),
+    host: str | None = Query(None, description="Only this host, every host merged when omitted"),
+    db: AsyncSession = Depends(get_db_session)
+):
+    """Quantiles over any window from the per-bucket sketches, within `relative_accuracy` of the exact values."""
+    end = to_naive_utc(end or datetime.now(timezone.utc))
+    start = to_naive_utc(start) if start is not None else end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="`from` must be before `to`!")
+    if metric not in rollups.sketch_metrics or not rollups.sketch_resolutions:
+        raise HTTPException(status_code=400, detail=f"No sketches kept for this metric, expected one of {list(rollups.sketch_metrics)}")
+    if not all(0 <= value <= 1 for value in q):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1!")
+    logger.info(f"Retrieving {metric} percentiles...")
+    result = await rollups.quantiles(db, metric, q, start, end, host=host)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Sketches unavailable!")
+    return result
+
+@router.get("/cache/stats", tags=["Cache"])
+async def get_cache_stats():
+    return record_cache.stats()
\ No newline at end of file
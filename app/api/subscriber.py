@@ -2,13 +2,16 @@
 import redis.asyncio as redis
 
 
+from app.config import settings
+from app.ingest.codec import get_codec
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 class Subscriber:
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
-        self.redis = redis.from_url(redis_url, decode_responses=True)
+    def __init__(self, redis_url: str = "redis://localhost:6379", decode_responses: bool = True):
+        # binary codecs need raw bytes, so payload decoding can be turned off
+        self.redis = redis.from_url(redis_url, decode_responses=decode_responses)
         self.pubsub = self.redis.pubsub()
     
     async def subscribe(self, channel):
@@ -23,8 +26,16 @@ class Subscriber:
         except Exception as e:
             logger.error(f"Error: Failed to unsubscribe '{channel}': {e}")
             
+    async def listen(self):
+        """Await published messages on the subscribed channels, skipping subscribe confirmations."""
+        async for message in self.pubsub.listen():
+            if message["type"] == "message":
+                if isinstance(message["channel"], bytes):
+                    message["channel"] = message["channel"].decode()
+                yield message
+            
     async def close(self):
         await self.pubsub.close()
         await self.redis.close()
             
-sub = Subscriber()
\ No newline at end of file
+sub = Subscriber(decode_responses=not get_codec(settings.METRICS_CODEC).binary)
\ No newline at end of file
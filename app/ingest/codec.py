@@ -0,0 +1,130 @@
+# Built-in imports
+from datetime import datetime, timezone
+import json
+import math
+import struct
+
+# Third-party imports
+try:
+    import msgpack
+except ImportError: # optional, only needed for the msgpack codec
+    msgpack = None
+
+# local imports
+from app.models.models import METRIC_COLUMNS, STORED_COLUMNS
+
+# binary payloads start with a 2-byte header: codec id + layout version
+MSGPACK_ID = b"m"
+MSGPACK_VERSION = 1
+STRUCT_ID = b"s"
+STRUCT_VERSION = 2 # v2 added the rate columns, host and tags
+
+# columns whose values are integers in the sample (byte and packet counts)
+INTEGER_COLUMNS = {column for column, (_, key) in METRIC_COLUMNS.items() if not key.endswith("percent")}
+
+class JsonCodec:
+    """Plain JSON text, the original channel format."""
+    name = "json"
+    binary = False
+
+    def encode(self, sample: dict) -> str:
+        return json.dumps(sample)
+
+    def decode(self, payload: str | bytes) -> dict:
+        return json.loads(payload)
+
+class MsgpackCodec:
+    """The whole sample as msgpack behind the version header."""
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("The msgpack codec needs the 'msgpack' package installed")
+        self.header = MSGPACK_ID + bytes([MSGPACK_VERSION])
+
+    def encode(self, sample: dict) -> bytes:
+        return self.header + msgpack.packb(sample, use_bin_type=True)
+
+    def decode(self, payload: bytes) -> dict:
+        if payload[:2] != self.header:
+            raise ValueError(f"Not a v{MSGPACK_VERSION} msgpack payload")
+        return msgpack.unpackb(payload[2:], raw=False)
+
+class StructCodec:
+    """
+    Little-endian layout: header, epoch-ns timestamp, cpu_percent and the
+    `STORED_COLUMNS` values (rates included) as float64, NaN for missing,
+    then the host and the JSON tags, each behind a uint16 byte length
+    (0 when absent). Only those fields are carried; anything else in the
+    sample (per-device groups, degraded flags) is dropped.
+    """
+    name = "struct"
+    binary = True
+    layout = struct.Struct(f"<2sq{1 + len(STORED_COLUMNS)}dHH")
+
+    def __init__(self):
+        self.header = STRUCT_ID + bytes([STRUCT_VERSION])
+
+    def encode(self, sample: dict) -> bytes:
+        time_stamp = datetime.fromisoformat(sample["timestamp"])
+        if time_stamp.tzinfo is None:
+            time_stamp = time_stamp.replace(tzinfo=timezone.utc)
+        seconds = int(time_stamp.timestamp())
+        ts_ns = seconds * 1_000_000_000 + time_stamp.microsecond * 1000
+        values = [sample.get("cpu_percent")]
+        for group, key in STORED_COLUMNS.values():
+            group_values = sample.get(group)
+            values.append(group_values.get(key) if isinstance(group_values, dict) else None)
+        host = (sample.get("host") or "").encode()
+        tags = json.dumps(sample["tags"]).encode() if sample.get("tags") else b""
+        return self.layout.pack(
+            self.header, ts_ns, *(math.nan if v is None else v for v in values), len(host), len(tags)
+        ) + host + tags
+
+    def decode(self, payload: bytes) -> dict:
+        header, ts_ns, cpu_percent, *values, host_length, tags_length = self.layout.unpack_from(payload)
+        if header != self.header:
+            raise ValueError(f"Not a v{STRUCT_VERSION} struct payload")
+        if len(payload) != self.layout.size + host_length + tags_length:
+            raise ValueError("Truncated struct payload")
+        seconds, nanos = divmod(ts_ns, 1_000_000_000)
+        time_stamp = datetime.fromtimestamp(seconds, timezone.utc).replace(microsecond=nanos // 1000)
+        sample = {}
+        if host_length:
+            sample["host"] = payload[self.layout.size:self.layout.size + host_length].decode()
+        if tags_length:
+            sample["tags"] = json.loads(payload[self.layout.size + host_length:])
+        sample.update({
+            "timestamp": time_stamp.isoformat(),
+            "cpu_percent": None if math.isnan(cpu_percent) else cpu_percent,
+            "memory": {},
+            "disk": {},
+            "net_io": {},
+        })
+        for (column, (group, key)), value in zip(STORED_COLUMNS.items(), values):
+            if not math.isnan(value):
+                sample[group][key] = int(value) if column in INTEGER_COLUMNS else value
+        return sample
+
+CODECS = {"json": JsonCodec, "msgpack": MsgpackCodec, "struct": StructCodec}
+
+def get_codec(name: str):
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown codec '{name}', expected one of {list(CODECS)}")
+
+_BINARY_DECODERS = [StructCodec()]
+if msgpack is not None:
+    _BINARY_DECODERS.append(MsgpackCodec())
+# full 2-byte header -> decoder, so a payload of another layout version falls through to JSON parsing and fails loudly
+_BINARY_DECODERS = {decoder.header: decoder for decoder in _BINARY_DECODERS}
+
+def decode_payload(payload: str | bytes) -> dict:
+    """Decode a channel payload of any codec, recognised by its header."""
+    if isinstance(payload, bytes):
+        decoder = _BINARY_DECODERS.get(payload[:2])
+        if decoder is not None:
+            return decoder.decode(payload)
+    return json.loads(payload)
@@ -0,0 +1,156 @@
+# Third-party imports
+import psutil
+
+# Built-in imports
+import threading
+from contextlib import contextmanager
+
+# local imports
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class Collector:
+    """
+    One source of sample values. `read` is a blocking psutil call run in a
+    worker thread; collectors sharing a `group` are read back to back in the
+    same job. `interval` is the minimum seconds between reads, 0 = every tick.
+    """
+    __slots__ = ("name", "read", "interval", "group")
+
+    def __init__(self, name: str, read, interval: float = 0.0, group: str = "procfs"):
+        self.name = name
+        self.read = read
+        self.interval = interval
+        self.group = group
+
+# sample key -> collector, in the order keys appear in the emitted sample
+COLLECTORS: dict[str, Collector] = {}
+
+def collector(name: str, interval: float = 0.0, group: str = "procfs"):
+    """Register the decorated function as the reader of sample key `name`."""
+    def decorator(read):
+        COLLECTORS[name] = Collector(name, read, interval, group)
+        return read
+    return decorator
+
+def _busy(times) -> tuple[float, float]:
+    """(busy, total) seconds of one cpu_times entry; guest time is already in user, as psutil counts it."""
+    total = sum(times) - getattr(times, "guest", 0.0) - getattr(times, "guest_nice", 0.0)
+    return total - times.idle - getattr(times, "iowait", 0.0), total
+
+def _percent(before: tuple[float, float], after: tuple[float, float]) -> float:
+    busy, total = after[0] - before[0], after[1] - before[1]
+    return round(min(max(busy / total * 100, 0.0), 100.0), 1) if total > 0 else 0.0
+
+class CpuStat:
+    """
+    Overall and per-core CPU usage since the previous read, both from one
+    `/proc/stat` read. Inside `shared()` the first read is reused, so
+    `cpu_percent` and `per_cpu` in one group job cost a single read.
+    """
+    def __init__(self):
+        self._last: list[tuple[float, float]] | None = None
+        self._local = threading.local() # group jobs run concurrently, each shares only its own read
+
+    def read(self) -> tuple[float, list[float]]:
+        shared = getattr(self._local, "values", None)
+        if shared is not None:
+            return shared
+        current = [_busy(times) for times in psutil.cpu_times(percpu=True)] # /proc/stat
+        last, self._last = self._last, current
+        if last is None or len(last) != len(current): # first read or CPUs hotplugged
+            values = (0.0, [0.0] * len(current))
+        else:
+            overall = _percent(tuple(map(sum, zip(*last))), tuple(map(sum, zip(*current))))
+            values = (overall, [_percent(before, after) for before, after in zip(last, current)])
+        if getattr(self._local, "sharing", False):
+            self._local.values = values
+        return values
+
+    @contextmanager
+    def shared(self):
+        self._local.sharing = True
+        try:
+            yield
+        finally:
+            self._local.sharing, self._local.values = False, None
+
+cpu_stat = CpuStat()
+
+@collector("cpu_percent")
+def read_cpu_percent() -> float:
+    return cpu_stat.read()[0]
+
+@collector("memory")
+def read_memory() -> dict:
+    return psutil.virtual_memory()._asdict() # /proc/meminfo
+
+@collector("disk", group="disk")
+def read_disk() -> dict:
+    return psutil.disk_usage('/')._asdict() # statvfs, hangs with the mount
+
+@collector("net_io")
+def read_net_io() -> dict:
+    return psutil.net_io_counters()._asdict() # /proc/net/dev
+
+@collector("per_cpu")
+def read_per_cpu() -> list[float]:
+    return cpu_stat.read()[1]
+
+@collector("disk_io", interval=5.0)
+def read_disk_io() -> dict:
+    return {disk: counters._asdict() for disk, counters in (psutil.disk_io_counters(perdisk=True) or {}).items()}
+
+@collector("per_nic", interval=5.0)
+def read_per_nic() -> dict:
+    return {nic: counters._asdict() for nic, counters in psutil.net_io_counters(pernic=True).items()}
+
+@collector("top_processes", interval=30.0, group="processes")
+def read_top_processes() -> list[dict]:
+    """The busiest processes by CPU, then memory; walks every /proc/<pid> so it runs rarely."""
+    # process_iter caches Process objects between calls, so cpu_percent is a delta
+    # since the previous walk; attrs are fetched under a single oneshot() per process
+    processes = [p.info for p in psutil.process_iter(["pid", "name", "cpu_percent", "memory_percent"])]
+    processes.sort(key=lambda info: (info["cpu_percent"] or 0.0, info["memory_percent"] or 0.0), reverse=True)
+    return processes[:settings.TOP_PROCESSES]
+
+def parse_intervals(text: str) -> dict[str, float]:
+    """Parse `name=seconds,...` interval overrides."""
+    intervals = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, sep, seconds = part.partition("=")
+        if not sep:
+            raise ValueError(f"Expected name=seconds, got '{part}'")
+        intervals[name.strip()] = float(seconds)
+    return intervals
+
+def build_collectors(names: str | list[str] | None = None, intervals: str | dict | None = None) -> list[Collector]:
+    """Enabled collectors in registry order, with interval overrides applied."""
+    if names is None:
+        names = settings.COLLECTORS
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(",") if name.strip()]
+    if intervals is None:
+        intervals = settings.COLLECTOR_INTERVALS
+    if isinstance(intervals, str):
+        intervals = parse_intervals(intervals)
+    unknown = (set(names) | set(intervals)) - set(COLLECTORS)
+    if unknown:
+        raise ValueError(f"Unknown collector(s) {sorted(unknown)}, expected some of {list(COLLECTORS)}")
+    return [
+        Collector(name, item.read, intervals.get(name, item.interval), item.group)
+        for name, item in COLLECTORS.items() if name in names
+    ]
+
+def read_group(collectors: list[Collector]) -> dict:
+    """Run the readers of one group (in a worker thread); failed reads are left out."""
+    values = {}
+    with cpu_stat.shared():
+        for item in collectors:
+            try:
+                values[item.name] = item.read()
+            except Exception as e:
+                logger.error(f"Collector '{item.name}' failed: {e}")
+    return values
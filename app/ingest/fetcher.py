@@ -1,37 +1,128 @@
 # imports
 import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
-import psutil
-import json
+import time
 
 # local imports
 from app.utils.logger import get_logger
 from app.config import settings
 from app.ingest.publisher import publisher as pub
+from app.ingest.codec import get_codec
+from app.ingest.collectors import Collector, build_collectors, read_group
+from app.models.sample import to_ns
+from app.transform.rates import DEVICE_COUNTERS, RateTracker
 
 logger = get_logger(__name__)
 
+# fraction of a collector's interval it may fire early, absorbs scheduler jitter
+DUE_SLACK = 0.05
+
+def parse_tags(text: str) -> dict[str, str]:
+    """Parse `name=value,...` host labels."""
+    tags = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Expected name=value, got '{part}'")
+        tags[name.strip()] = value.strip()
+    return tags
+
 class Fetcher:
-    def __init__(self):
+    def __init__(self, collectors: list[Collector] | None = None, clock=time.monotonic):
         self.api_endpoint = settings.API_ENDPOINT
         self.api_key = settings.API_KEY
         self.timeout = settings.REQUEST_TIMEOUT
         self.retries = settings.MAX_RETRIES
         self.retry_backoff = settings.RETRY_BACKOFF
+        self.codec = get_codec(settings.METRICS_CODEC)
+        self.host = settings.HOST_NAME
+        self.tags = parse_tags(settings.HOST_TAGS)
         self.metrics = {}
-        
-        
+        # psutil calls never run on the event loop that also serves the API and WebSockets
+        self.executor = ThreadPoolExecutor(max_workers=settings.COLLECTOR_THREADS, thread_name_prefix="collector")
+        self.collectors = build_collectors() if collectors is None else collectors
+        self.groups = {}
+        for item in self.collectors:
+            self.groups.setdefault(item.group, []).append(item)
+        self.timeouts = {group: settings.COLLECTOR_TIMEOUT for group in self.groups} # seconds, per group
+        self.clock = clock
+        self.next_due = {item.name: 0.0 for item in self.collectors}
+        self.latest = {} # collector name -> last value read
+        self._inflight: dict[str, Future] = {}
+        self.degraded = 0
+        self.rates = RateTracker() # per-disk and per-NIC counter rates
+
+    def due(self, now: float) -> dict[str, list[Collector]]:
+        """Collectors whose interval has elapsed, by group."""
+        due = {}
+        for group, collectors in self.groups.items():
+            ready = [item for item in collectors if now >= self.next_due[item.name] - item.interval * DUE_SLACK]
+            if ready:
+                due[group] = ready
+        return due
+
+    async def _collect(self, group: str, collectors: list[Collector]) -> dict:
+        """Values of the due collectors of one group, or {} if it timed out or is still stuck."""
+        pending = self._inflight.get(group)
+        if pending is not None and not pending.done():
+            # a hung read keeps its thread; don't pile more threads onto it
+            logger.warning(f"Collector group '{group}' is still blocked from an earlier tick, skipping it")
+            return {}
+        now = self.clock()
+        for item in collectors:
+            self.next_due[item.name] = now + item.interval
+        future = self.executor.submit(read_group, collectors)
+        self._inflight[group] = future
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeouts[group])
+        except asyncio.TimeoutError:
+            logger.warning(f"Collector group '{group}' timed out after {self.timeouts[group]}s")
+            return {}
+
     async def fetch_metrics(self) -> dict:
-        """Collect system metrics using psutil"""
-        
-        logger.info("the system data has been successfully collected!")
-        return {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "cpu_percent": psutil.cpu_percent(interval=None),
-            "memory": psutil.virtual_memory()._asdict(),
-            "disk": psutil.disk_usage('/')._asdict(),
-            "net_io": psutil.net_io_counters()._asdict()
-        }
+        """
+        Collect system metrics using psutil.
+
+        Only collectors whose interval has elapsed are read; the sample
+        merges their fresh values with the latest value of every other
+        collector. Groups of due collectors run concurrently in the thread
+        pool. A due collector that fails or exceeds its group timeout is
+        None in the sample, which is flagged `degraded` with the absent
+        keys listed in `missing`.
+
+        Fresh reads of the per-device counters (`disk_io`, `per_nic`) get a
+        `<key>_rate` per device, so a slow collector's latest value carries
+        the rate over its own interval rather than zeros between reads.
+        """
+        timestamp = datetime.now(timezone.utc).isoformat()
+        due = self.due(self.clock())
+        attempted = {item.name for collectors in due.values() for item in collectors}
+        for group_values in await asyncio.gather(*(self._collect(group, collectors) for group, collectors in due.items())):
+            for name, value in group_values.items():
+                if name in DEVICE_COUNTERS and isinstance(value, dict):
+                    self.rates.apply_devices(name, value, to_ns(timestamp), self.host)
+            self.latest.update(group_values)
+            attempted -= group_values.keys()
+
+        metrics = {"timestamp": timestamp, "host": self.host}
+        if self.tags:
+            metrics["tags"] = self.tags
+        missing = []
+        for item in self.collectors:
+            if item.name in attempted or item.name not in self.latest:
+                missing.append(item.name)
+                metrics[item.name] = None
+            else:
+                metrics[item.name] = self.latest[item.name]
+        if missing:
+            self.degraded += 1
+            metrics["degraded"] = True
+            metrics["missing"] = missing
+            logger.warning(f"Collected a degraded sample, missing: {missing}")
+        else:
+            logger.info("the system data has been successfully collected!")
+        return metrics
         
     async def fetcher(self) -> dict | None:
         """Try to fetch metrics with retries on failure."""
@@ -41,7 +132,8 @@ class Fetcher:
                 # get system health data
                 
                 metrics = await self.fetch_metrics()
-                await pub.publish("metrics-channel", json.dumps(metrics))
+                # on the shared channel and on the host's own, for host-filtered subscribers
+                await pub.publish("metrics-channel", self.codec.encode(metrics), host=self.host)
                 return metrics
             except Exception as e:
                 logger.error(f"attempt {retries}: Could not get data! {e}")
@@ -51,4 +143,8 @@ class Fetcher:
         return None
     
     async def run(self) -> dict | None:
-        return await self.fetcher()
\ No newline at end of file
+        return await self.fetcher()
+
+    def close(self) -> None:
+        """Release the collector threads without waiting on hung reads."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
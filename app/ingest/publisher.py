@@ -5,15 +5,45 @@ from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+def host_channel(channel: str, host: str) -> str:
+    """The per-host variant of a channel, e.g. `metrics-channel:web-1`."""
+    return f"{channel}:{host}"
+
 class Publisher:
     def __init__(self, redis_url: str = "redis://localhost:6379"):
         self.redis = redis.from_url(redis_url, decode_responses=True)
     
-    async def publish(self, channel: str, message: str) -> None:
+    async def publish(self, channel: str, message: str | bytes, host: str | None = None) -> bool:
+        """Publish to `channel`, and to the host's own channel too when `host` is given; False if Redis failed."""
         try:
-            await self.redis.publish(channel, message)
+            if host is None:
+                await self.redis.publish(channel, message)
+            else:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.publish(channel, message)
+                    pipe.publish(host_channel(channel, host), message)
+                    await pipe.execute()
             logger.info(f"Published message to channel '{channel}'")
+            return True
         except Exception as e:
             logger.error(f"Failed to publish message: {e}")
+            return False
+
+    async def publish_many(self, channel: str, messages: list[tuple[str | None, str | bytes]]) -> bool:
+        """Publish (host, message) pairs in one round trip, as `publish` would one by one; False if Redis failed."""
+        if not messages:
+            return True
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for host, message in messages:
+                    pipe.publish(channel, message)
+                    if host is not None:
+                        pipe.publish(host_channel(channel, host), message)
+                await pipe.execute()
+            logger.info(f"Published {len(messages)} messages to channel '{channel}'")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to publish messages: {e}")
+            return False
 
-publisher = Publisher()
\ No newline at end of file
+publisher = Publisher()
@@ -0,0 +1,84 @@
+# Built-in imports
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+# local imports
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class Scheduler:
+    """
+    Fires an async callback on a fixed monotonic grid.
+
+    Tick `n` is due at `start + n * interval`, so sleeping errors never
+    accumulate. When a tick runs long, the deadlines that already passed are
+    counted as missed and only the most recent one is fired, so a slow tick
+    never causes a burst of catch-up calls.
+    """
+    def __init__(
+        self,
+        interval: float,
+        callback: Callable[[], Awaitable[None]],
+        late_tolerance: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval = interval
+        self.callback = callback
+        self.late_tolerance = late_tolerance if late_tolerance is not None else interval * 0.1
+        self.clock = clock
+        self.sleep = sleep
+        self.ticks = 0
+        self.missed = 0
+        self.late = 0
+        self.max_lag = 0.0
+        self._running = False
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "ticks": self.ticks,
+            "missed": self.missed,
+            "late": self.late,
+            "max_lag": self.max_lag,
+        }
+
+    def stop(self) -> None:
+        self._running = False
+
+    async def run(self, max_ticks: int | None = None) -> None:
+        self._running = True
+        start = self.clock()
+        slot = 0
+        while self._running and (max_ticks is None or self.ticks < max_ticks):
+            deadline = start + slot * self.interval
+            now = self.clock()
+            if now < deadline:
+                await self.sleep(deadline - now)
+                now = self.clock()
+
+            lag = now - deadline
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.late_tolerance:
+                self.late += 1
+                logger.warning(f"Tick {slot} fired {lag * 1000:.1f} ms late")
+
+            try:
+                await self.callback()
+            except Exception as e:
+                logger.exception(f"Scheduled callback failed: {e}")
+            self.ticks += 1
+
+            # realign on the grid: skip every slot whose deadline already passed except the latest one
+            current = int((self.clock() - start) // self.interval)
+            if current > slot + 1:
+                skipped = current - slot - 1
+                self.missed += skipped
+                logger.warning(f"Missed {skipped} tick(s) after slow tick {slot}")
+                slot = current
+            else:
+                slot += 1
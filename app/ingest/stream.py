@@ -0,0 +1,106 @@
+# Third-Party imports
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+# Built-in imports
+import json
+import os
+import socket
+
+# local imports
+from app.config import settings
+from app.models.sample import MetricSample
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class StreamProducer:
+    """
+    Appends transformed samples to a Redis stream for the storage workers.
+
+    Unlike pub/sub, entries stay in the stream until a worker acknowledges
+    them. The stream is capped at about `maxlen` entries (approximate
+    trimming), so size it to cover the longest expected worker outage.
+    """
+    def __init__(self, redis_url: str = "redis://localhost:6379", stream: str | None = None, maxlen: int | None = None):
+        self.redis = redis.from_url(redis_url, decode_responses=True)
+        self.stream = stream or settings.STREAM_KEY
+        self.maxlen = maxlen or settings.STREAM_MAXLEN
+
+    async def add_many(self, items: list[MetricSample]) -> list[str]:
+        """XADD each sample as JSON, returning the entry ids ([] on failure)."""
+        if not items:
+            return []
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for item in items:
+                    pipe.xadd(self.stream, {"data": json.dumps(item.to_dict())}, maxlen=self.maxlen, approximate=True)
+                entry_ids = await pipe.execute()
+            logger.info(f"{len(entry_ids)} item(s) added to stream '{self.stream}'")
+            return entry_ids
+        except Exception as e:
+            logger.error(f"Failed to add to stream '{self.stream}': {e}")
+            return []
+
+class StreamConsumer:
+    """
+    One member of the storage consumer group.
+
+    `read()` first reclaims entries another consumer has left pending for
+    longer than `claim_idle_ms` (it crashed or hangs), then reads new ones.
+    Entries are only removed from the pending list by `ack()`, so a batch
+    that could not be stored is redelivered.
+    """
+    def __init__(
+        self,
+        redis_url: str = "redis://localhost:6379",
+        stream: str | None = None,
+        group: str | None = None,
+        consumer: str | None = None,
+        batch_size: int | None = None,
+        block_ms: int | None = None,
+        claim_idle_ms: int | None = None,
+    ):
+        self.redis = redis.from_url(redis_url, decode_responses=True)
+        self.stream = stream or settings.STREAM_KEY
+        self.group = group or settings.STREAM_GROUP
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.batch_size = batch_size or settings.STREAM_BATCH_SIZE
+        self.block_ms = block_ms if block_ms is not None else settings.STREAM_BLOCK_MS
+        self.claim_idle_ms = claim_idle_ms if claim_idle_ms is not None else settings.STREAM_CLAIM_IDLE_MS
+        self._claim_cursor = "0-0"
+
+    async def ensure_group(self) -> None:
+        """Create the stream and the consumer group if they don't exist yet."""
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+            logger.info(f"Created consumer group '{self.group}' on '{self.stream}'")
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def claim(self) -> list[tuple[str, dict]]:
+        """Take over entries idle in other consumers' pending lists."""
+        self._claim_cursor, entries, *_ = await self.redis.xautoclaim(
+            self.stream, self.group, self.consumer, self.claim_idle_ms, self._claim_cursor, count=self.batch_size
+        )
+        if entries:
+            logger.warning(f"Reclaimed {len(entries)} stale entries for consumer '{self.consumer}'")
+        return entries
+
+    async def read(self) -> list[tuple[str, dict]]:
+        entries = await self.claim()
+        if entries:
+            return entries
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.batch_size, block=self.block_ms or None
+        )
+        return [entry for _, stream_entries in response or [] for entry in stream_entries]
+
+    async def ack(self, entry_ids: list[str]) -> int:
+        if not entry_ids:
+            return 0
+        return await self.redis.xack(self.stream, self.group, *entry_ids)
+
+    async def pending(self) -> int:
+        return (await self.redis.xpending(self.stream, self.group))["pending"]
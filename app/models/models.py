@@ -1,32 +1,226 @@
 # Third-party imports
-from pydantic import BaseModel, Field
-from sqlalchemy import Column, Integer, String, Float, DateTime
-from sqlalchemy.ext.declarative import declarative_base
+from pydantic import BaseModel, ConfigDict, Field
+from sqlalchemy import Column, Integer, BigInteger, Float, DateTime, Index, JSON, LargeBinary, String
+from sqlalchemy.orm import declarative_base, declared_attr
 
 # Built-in imports
 from datetime import datetime
 
 Base = declarative_base()
 
+# flat column -> (group, key) in the nested sample dicts produced by the fetcher
+METRIC_COLUMNS = {
+    "mem_total": ("memory", "total"),
+    "mem_used": ("memory", "used"),
+    "mem_available": ("memory", "available"),
+    "mem_percent": ("memory", "percent"),
+    "disk_total": ("disk", "total"),
+    "disk_used": ("disk", "used"),
+    "disk_free": ("disk", "free"),
+    "disk_percent": ("disk", "percent"),
+    "net_bytes_sent": ("net_io", "bytes_sent"),
+    "net_bytes_recv": ("net_io", "bytes_recv"),
+    "net_packets_sent": ("net_io", "packets_sent"),
+    "net_packets_recv": ("net_io", "packets_recv"),
+}
+
+# per-second rate column -> (group, key), derived from the cumulative net_io counters at ingest
+RATE_COLUMNS = {
+    f"{column}_rate": (group, f"{key}_rate")
+    for column, (group, key) in METRIC_COLUMNS.items() if group == "net_io"
+}
+
+# every flat column stored next to cpu_percent
+STORED_COLUMNS = {**METRIC_COLUMNS, **RATE_COLUMNS}
+
+# every numeric column of `resources`, in the order rollups and exports use
+NUMERIC_COLUMNS = ("cpu_percent", *STORED_COLUMNS)
+
+# host of rows stored before samples carried one, or posted without one
+UNKNOWN_HOST = "unknown"
+
+# rollup tier -> bucket width in seconds, finest first
+ROLLUP_RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+def flatten_metrics(data: dict) -> dict:
+    """Pick the typed column values out of the nested memory/disk/net_io dicts."""
+    row = {}
+    for column, (group, key) in STORED_COLUMNS.items():
+        values = data.get(group)
+        row[column] = values.get(key) if isinstance(values, dict) else None
+    return row
+
 # SQLAlchemy Model
 class MetricsModel(Base):
     __tablename__ = "resources"
-    
+    __table_args__ = (
+        Index("ix_resources_time_stamp_id", "time_stamp", "id"), # range scans + keyset pagination
+        Index("ix_resources_host_time_stamp_id", "host", "time_stamp", "id"), # the same, narrowed to one host
+    )
+
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    host = Column(String(255), nullable=False, server_default=UNKNOWN_HOST)
+    tags = Column(JSON) # free-form labels of the host, e.g. {"role": "db"}
     time_stamp = Column(DateTime, nullable=False)
-    cpu_percent = Column(String, nullable=False)
-    memory = Column(String, nullable=False)
-    disk = Column(String, nullable=False)
-    net_io = Column(String, nullable=False)
-    
+    cpu_percent = Column(Float, nullable=False)
+    mem_total = Column(BigInteger)
+    mem_used = Column(BigInteger)
+    mem_available = Column(BigInteger)
+    mem_percent = Column(Float)
+    disk_total = Column(BigInteger)
+    disk_used = Column(BigInteger)
+    disk_free = Column(BigInteger)
+    disk_percent = Column(Float)
+    net_bytes_sent = Column(BigInteger)
+    net_bytes_recv = Column(BigInteger)
+    net_packets_sent = Column(BigInteger)
+    net_packets_recv = Column(BigInteger)
+    net_bytes_sent_rate = Column(Float) # per second, NULL across a counter reset
+    net_bytes_recv_rate = Column(Float)
+    net_packets_sent_rate = Column(Float)
+    net_packets_recv_rate = Column(Float)
+
+    def _group(self, name: str) -> dict:
+        return {
+            key: getattr(self, column)
+            for column, (group, key) in STORED_COLUMNS.items()
+            if group == name and getattr(self, column) is not None
+        }
+
+    # nested views keep the API payload shape of the old JSON blob columns
+    @property
+    def memory(self) -> dict:
+        return self._group("memory")
+
+    @property
+    def disk(self) -> dict:
+        return self._group("disk")
+
+    @property
+    def net_io(self) -> dict:
+        return self._group("net_io")
+
+    def to_dict(self) -> dict:
+        """JSON-ready payload in the `Metrics` shape, without a Pydantic round-trip."""
+        return {
+            "id": self.id,
+            "host": self.host,
+            "tags": self.tags,
+            "timestamp": self.time_stamp.isoformat(),
+            "cpu_percent": self.cpu_percent,
+            "memory": self.memory,
+            "disk": self.disk,
+            "net_io": self.net_io,
+        }
+
+class RollupMixin:
+    """Pre-aggregated values of one metric of one host over one bucket; avg is sum / count."""
+    host = Column(String(255), primary_key=True)
+    metric = Column(String(32), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    min = Column(Float, nullable=False)
+    max = Column(Float, nullable=False)
+    sum = Column(Float, nullable=False)
+    last = Column(Float, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        # the primary key serves per-host reads, the first index fleet-wide reads and the second retention
+        return (
+            Index(f"ix_{cls.__tablename__}_metric_bucket", "metric", "bucket"),
+            Index(f"ix_{cls.__tablename__}_bucket", "bucket"),
+        )
+
+class Rollup1m(RollupMixin, Base):
+    __tablename__ = "rollup_1m"
+
+class Rollup1h(RollupMixin, Base):
+    __tablename__ = "rollup_1h"
+
+class Rollup1d(RollupMixin, Base):
+    __tablename__ = "rollup_1d"
+
+ROLLUP_MODELS = {"1m": Rollup1m, "1h": Rollup1h, "1d": Rollup1d}
+
+class SketchMixin:
+    """Encoded `DDSketch` of one metric of one host over one bucket, for quantiles."""
+    host = Column(String(255), primary_key=True)
+    metric = Column(String(32), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    count = Column(Integer, nullable=False)
+    sketch = Column(LargeBinary, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (
+            Index(f"ix_{cls.__tablename__}_metric_bucket", "metric", "bucket"),
+            Index(f"ix_{cls.__tablename__}_bucket", "bucket"),
+        )
+
+class Sketch1m(SketchMixin, Base):
+    __tablename__ = "sketch_1m"
+
+class Sketch1h(SketchMixin, Base):
+    __tablename__ = "sketch_1h"
+
+class Sketch1d(SketchMixin, Base):
+    __tablename__ = "sketch_1d"
+
+SKETCH_MODELS = {"1m": Sketch1m, "1h": Sketch1h, "1d": Sketch1d}
+
 # Pydantic Schema
 class Metrics(BaseModel):
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
     id: int = Field(..., description="Unique identifier of the Metrics model")
+    host: str | None = Field(None, description="Host the sample was collected on")
+    tags: dict | None = Field(None, description="Labels of the host")
     time_stamp: datetime = Field(..., description="Timestamp of the taken out metrics!", alias="timestamp")
     cpu_percent: float = Field(..., description="CPU percentage")
     memory: dict = Field(..., description="Memory Usage - RAM")
     disk: dict = Field(..., description="Disk Usage")
     net_io: dict = Field(..., description="Net IO Usage")
-    
-    class Config:
-        orm_mode = True
\ No newline at end of file
+
+
+class AggregatePoint(BaseModel):
+    host: str = Field(..., description="Host the bucket was aggregated for")
+    metric: str = Field(..., description="Column name of the aggregated metric")
+    bucket: datetime = Field(..., description="Start of the bucket (UTC)")
+    count: int = Field(..., description="Number of samples in the bucket")
+    min: float
+    max: float
+    avg: float
+    last: float = Field(..., description="Latest sample in the bucket")
+
+class Aggregates(BaseModel):
+    resolution: str = Field(..., description="Rollup tier the points were read from")
+    points: list[AggregatePoint]
+
+class Percentiles(BaseModel):
+    metric: str = Field(..., description="Column name of the metric")
+    host: str | None = Field(None, description="Host the sketches were read for, all hosts when empty")
+    start: datetime = Field(..., description="Start of the first bucket read (UTC)")
+    end: datetime = Field(..., description="End of the last bucket read (UTC)")
+    count: int = Field(..., description="Number of samples in the merged sketches")
+    sketches: int = Field(..., description="Number of bucket sketches merged")
+    relative_accuracy: float = Field(..., description="Bound on the relative error of every value")
+    values: dict[str, float | None] = Field(..., description="Value per requested quantile, e.g. p99")
+
+
+class IngestSample(BaseModel):
+    """One transformed sample as posted by an agent to `/ingest`."""
+    host: str | None = Field(None, max_length=255, description="Hostname of the reporting agent")
+    tags: dict[str, str] | None = Field(None, description="Labels of the host")
+    time_stamp: datetime = Field(..., description="Collection time (UTC)")
+    cpu_percent: float = Field(..., ge=0, le=100, description="CPU percentage")
+    memory: dict | None = None
+    disk: dict | None = None
+    net_io: dict | None = None
+    degraded: bool = Field(False, description="Some collectors were missing from this sample")
+    missing: list[str] = Field(default_factory=list)
+
+class IngestBatch(BaseModel):
+    samples: list[IngestSample] = Field(..., min_length=1)
+
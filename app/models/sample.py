@@ -0,0 +1,149 @@
+# Built-in imports
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+# local imports
+from app.models.models import METRIC_COLUMNS, STORED_COLUMNS, UNKNOWN_HOST
+
+EPOCH = datetime(1970, 1, 1)
+
+# sample group -> its raw columns, to tell a present group from an absent one
+GROUP_COLUMNS: dict[str, tuple] = {}
+for _column, (_group, _key) in METRIC_COLUMNS.items():
+    GROUP_COLUMNS[_group] = (*GROUP_COLUMNS.get(_group, ()), _column)
+
+# group -> ((key, column), ...) of every stored column, to read the nested groups in one pass
+GROUP_KEYS: dict[str, tuple] = {}
+for _column, (_group, _key) in STORED_COLUMNS.items():
+    GROUP_KEYS[_group] = (*GROUP_KEYS.get(_group, ()), (_key, _column))
+
+def to_ns(value: datetime | str) -> int:
+    """Epoch nanoseconds of an ISO 8601 string or a datetime; naive values are UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - EPOCH) // timedelta(microseconds=1) * 1000
+
+def from_ns(ts_ns: int) -> datetime:
+    """The naive UTC datetime stored in the DB for epoch nanoseconds."""
+    return EPOCH + timedelta(microseconds=ts_ns // 1000)
+
+class MetricSample:
+    """
+    One transformed sample on its way from the transformer to storage.
+
+    Holds an epoch-nanosecond timestamp and the flat numeric values named
+    after the `resources` columns in slots, instead of nested dicts and an
+    ISO string. Use `from_dict`/`to_dict` only where a sample enters or
+    leaves the process (ingest, the stream, agent POSTs).
+    """
+    __slots__ = ("ts_ns", "cpu_percent", "host", "tags", "missing", *STORED_COLUMNS)
+
+    def __init__(
+        self,
+        ts_ns: int,
+        cpu_percent: float | None,
+        host: str | None = None,
+        tags: dict | None = None,
+        missing: list[str] | None = None,
+        **columns: Any,
+    ):
+        unknown = columns.keys() - STORED_COLUMNS.keys()
+        if unknown:
+            raise TypeError(f"Unknown sample columns: {sorted(unknown)}")
+        self.ts_ns = ts_ns
+        self.cpu_percent = cpu_percent
+        self.host = host
+        self.tags = tags
+        self.missing = missing # collectors absent from a degraded sample, else None
+        for column in STORED_COLUMNS:
+            setattr(self, column, columns.get(column))
+
+    @classmethod
+    def from_groups(
+        cls,
+        ts_ns: int,
+        item: dict,
+        host: str | None = None,
+        tags: dict | None = None,
+        missing: list[str] | None = None,
+    ) -> "MetricSample":
+        """Build from `cpu_percent` and the nested memory/disk/net_io groups of `item`, without an intermediate dict."""
+        sample = cls.__new__(cls)
+        sample.ts_ns = ts_ns
+        sample.cpu_percent = item.get("cpu_percent")
+        sample.host = host
+        sample.tags = tags
+        sample.missing = missing
+        for group, keys in GROUP_KEYS.items():
+            values = item.get(group)
+            if not isinstance(values, dict): # a group missing from a degraded sample
+                values = {}
+            for key, column in keys:
+                setattr(sample, column, values.get(key))
+        return sample
+
+    @classmethod
+    def from_dict(cls, item: dict) -> "MetricSample":
+        """Build from the nested wire shape: `time_stamp` plus the memory/disk/net_io groups."""
+        return cls.from_groups(
+            to_ns(item["time_stamp"]),
+            item,
+            host=item.get("host"),
+            tags=item.get("tags") or None,
+            missing=list(item.get("missing") or []) if item.get("degraded") else None,
+        )
+
+    @property
+    def degraded(self) -> bool:
+        return self.missing is not None
+
+    @property
+    def time_stamp(self) -> datetime:
+        return from_ns(self.ts_ns)
+
+    def has_group(self, group: str) -> bool:
+        for column in GROUP_COLUMNS[group]:
+            if getattr(self, column) is not None:
+                return True
+        return False
+
+    def to_dict(self) -> dict:
+        """The nested wire shape read by `from_dict`; None values are left out of the groups."""
+        item = {"host": self.host, "time_stamp": self.time_stamp.replace(tzinfo=timezone.utc).isoformat()}
+        if self.tags:
+            item["tags"] = self.tags
+        item["cpu_percent"] = self.cpu_percent
+        groups: dict[str, dict] = {}
+        for column, (group, key) in STORED_COLUMNS.items():
+            values = groups.setdefault(group, {})
+            value = getattr(self, column)
+            if value is not None:
+                values[key] = value
+        for group, values in groups.items():
+            item[group] = values or None
+        if self.missing is not None:
+            item["degraded"] = True
+            item["missing"] = list(self.missing)
+        return item
+
+    def to_row(self) -> dict:
+        """The `resources` column values."""
+        row = {
+            "host": self.host or UNKNOWN_HOST,
+            "tags": self.tags or None,
+            "time_stamp": self.time_stamp,
+            "cpu_percent": float(self.cpu_percent),
+        }
+        for column in STORED_COLUMNS:
+            row[column] = getattr(self, column)
+        return row
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, MetricSample):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"MetricSample(host={self.host!r}, ts_ns={self.ts_ns}, cpu_percent={self.cpu_percent})"
@@ -0,0 +1,154 @@
+# Built-in imports
+import asyncio
+import json
+import os
+import signal
+
+# local imports
+from app.config import settings
+from app.ingest.fetcher import Fetcher
+from app.ingest.publisher import publisher
+from app.ingest.scheduler import Scheduler
+from app.ingest.stream import StreamProducer
+from app.models.models import MetricsModel
+from app.models.sample import MetricSample
+from app.storage.batch_writer import BatchWriter
+from app.storage.database import engine, init_db
+from app.storage.redis_cache import CachePanel
+from app.storage.retention import RetentionManager
+from app.storage.rollup import RollupEngine
+from app.storage.spool import Spool
+from app.storage.storage import create_storage
+from app.transform.anomaly import AnomalyDetector
+from app.transform.transformer import Transformer
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+async def propagate_batch(items: list[MetricSample], ids: list[int], rollups: RollupEngine, cache: CachePanel) -> None:
+    """After a batch is stored: fold it into the rollup tiers and push it to the Redis hot window."""
+    rollups.add_many(items) # fold the stored batch into the 1m/1h/1d tiers
+    await rollups.flush()
+    if ids: # COPY batches come back without ids and cannot be keyed in the cache
+        records = [MetricsModel(id=record_id, **item.to_row()).to_dict() for item, record_id in zip(items, ids)]
+        await cache.cache_many(records) # keep the hot window in Redis
+    elif items:
+        await cache.forget_coverage() # the hot window now misses stored records, recent reads go to the DB
+    logger.info("Data saved successfully.")
+
+async def publish_alerts(detector: AnomalyDetector | None, items: list[MetricSample]) -> None:
+    """Run the detector over transformed samples and publish its alert events, shared and per host."""
+    if detector is None:
+        return
+    events = detector.observe_many(items)
+    if events:
+        await publisher.publish_many(settings.ALERTS_CHANNEL, [(event["host"], json.dumps(event)) for event in events])
+
+class Pipeline:
+    """
+    Fetch → transform → store, either once or on a fixed interval.
+
+    The stages, the DB engine pool and the Redis clients are created once and
+    reused by every tick, so continuous mode only pays connection setup on start.
+    """
+    def __init__(self, interval: float | None = None):
+        self.interval = interval if interval is not None else settings.COLLECT_INTERVAL
+        self.fetcher = Fetcher()
+        self.transformer = Transformer()
+        self.detector = AnomalyDetector() if settings.ALERTS_ENABLED else None
+        self.storage = create_storage()
+        self.cache = CachePanel(settings.REDIS_URL)
+        self.rollups = RollupEngine()
+        # samples a sink refuses wait on disk and are replayed in bulk once it is back
+        self.writer = BatchWriter(self.storage, on_flush=self._after_flush, spool=self._spool("storage"))
+        self.retention = RetentionManager()
+        # with the stream transport, storage workers (`python -m app.worker`) do the writes
+        self.stream = StreamProducer(settings.REDIS_URL) if settings.INGEST_TRANSPORT == "stream" else None
+        self.stream_spool = self._spool("stream") if self.stream is not None else None
+        self._stream_replay: asyncio.Task | None = None
+        self.scheduler = Scheduler(self.interval, self.tick)
+
+    async def tick(self) -> None:
+        data = await self.fetcher.run() # Fetch Data
+        if not data: # if data object does not exist!
+            logger.warning("No data fetched.")
+            return
+        transformed_data = self.transformer.transform([data]) # Transform data
+        await publish_alerts(self.detector, transformed_data) # threshold and anomaly alerts
+        if self.stream is not None:
+            await self._add_to_stream(transformed_data) # hand off to the storage workers
+        else:
+            await self.writer.add_many(transformed_data) # save data in batches
+
+    @staticmethod
+    def _spool(name: str) -> Spool | None:
+        return Spool(os.path.join(settings.SPOOL_DIR, name)) if settings.SPOOL_ENABLED else None
+
+    async def _add_to_stream(self, items: list[MetricSample]) -> None:
+        if await self.stream.add_many(items):
+            if self.stream_spool is not None and self.stream_spool.pending() and self._stream_replay is None:
+                # Redis is back: catch up in the background, the next tick must not wait on it
+                self._stream_replay = asyncio.create_task(self._replay_stream())
+        elif self.stream_spool is not None:
+            self.stream_spool.append([json.dumps(item.to_dict()).encode() for item in items])
+            logger.warning(f"Spooled {len(items)} samples until the ingest stream is back")
+
+    async def _replay_stream(self) -> None:
+        try:
+            await self.stream_spool.replay(self._replay_to_stream)
+        except Exception as e:
+            logger.error(f"Stream spool replay failed: {e}")
+        finally:
+            self._stream_replay = None
+
+    async def _finish_stream_replay(self) -> None:
+        if self._stream_replay is not None:
+            await self._stream_replay
+
+    async def _replay_to_stream(self, payloads: list[bytes]) -> bool:
+        return bool(await self.stream.add_many([MetricSample.from_dict(json.loads(payload)) for payload in payloads]))
+
+    async def _after_flush(self, items: list[MetricSample], ids: list[int]) -> None:
+        await propagate_batch(items, ids, self.rollups, self.cache)
+
+    async def run_once(self) -> None:
+        logger.info("Starting async data pipeline...")
+        await init_db()
+        try:
+            await self.tick()
+        finally:
+            await self._finish_stream_replay()
+            await self.writer.close()
+            self.fetcher.close()
+
+    async def run_forever(self) -> None:
+        logger.info(f"Starting continuous data pipeline every {self.interval}s...")
+        await init_db()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.scheduler.stop)
+            except (NotImplementedError, RuntimeError):
+                pass
+        reporter = asyncio.create_task(self._report_stats())
+        retention = asyncio.create_task(self.retention.run_forever()) # ages old rows out in small chunks
+        try:
+            await self.scheduler.run()
+        finally:
+            reporter.cancel()
+            retention.cancel()
+            await self._finish_stream_replay()
+            await self.writer.close() # final flush
+            self.fetcher.close()
+            logger.info(f"Pipeline stopped: {self.scheduler.stats()}")
+            await engine.dispose()
+
+    async def _report_stats(self) -> None:
+        while True:
+            await asyncio.sleep(settings.SCHEDULER_STATS_INTERVAL)
+            stats = self.scheduler.stats()
+            logger.info(
+                f"Scheduler: {stats['ticks']} ticks, {stats['missed']} missed, "
+                f"{stats['late']} late, max lag {stats['max_lag'] * 1000:.1f} ms"
+            )
+            logger.info(f"Batch writer: {self.writer.stats()}")
@@ -0,0 +1,164 @@
+# Built-in imports
+import asyncio
+import json
+from typing import Awaitable, Callable
+
+# local imports
+from app.config import settings
+from app.models.sample import MetricSample
+from app.storage.database import AsyncSessionLocal
+from app.storage.spool import Spool
+from app.storage.storage import Storage
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class BatchWriter:
+    """
+    Buffers transformed samples and writes them through `Storage` in bulk.
+
+    A batch is flushed as soon as it holds `max_rows` items or its oldest item
+    has waited `max_latency` seconds, whichever comes first. `close()` flushes
+    whatever is left, so call it on shutdown.
+
+    With a `spool`, a batch the database refuses is appended to it instead
+    of being lost, and the next successful flush starts replaying the spool
+    in large bulk loads (`copy_to_db`) in a background task, so the flush
+    itself returns at once. `close()` waits for a running replay.
+    """
+    def __init__(
+        self,
+        storage: Storage,
+        session_factory=AsyncSessionLocal,
+        max_rows: int | None = None,
+        max_latency: float | None = None,
+        use_copy: bool | None = None,
+        on_flush: Callable[[list[MetricSample], list[int]], Awaitable[None]] | None = None,
+        spool: Spool | None = None,
+    ):
+        self.storage = storage
+        self.session_factory = session_factory
+        self.max_rows = max_rows or settings.BATCH_MAX_ROWS
+        self.max_latency = max_latency if max_latency is not None else settings.BATCH_MAX_LATENCY
+        self.use_copy = settings.BATCH_USE_COPY if use_copy is None else use_copy
+        self.on_flush = on_flush
+        self.spool = spool
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed = 0
+        self._buffer: list[MetricSample] = []
+        self._lock = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+        self._replaying = False
+        self._replay_task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    async def add(self, item: MetricSample) -> None:
+        self._buffer.append(item)
+        if len(self._buffer) >= self.max_rows:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_latency())
+
+    async def add_many(self, items: list[MetricSample]) -> None:
+        for item in items:
+            await self.add(item)
+
+    async def _flush_after_latency(self) -> None:
+        await asyncio.sleep(self.max_latency)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> list[int]:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+        self._timer = None
+        async with self._lock:
+            if not self._buffer:
+                return []
+            batch, self._buffer = self._buffer, []
+            try:
+                async with self.session_factory() as session:
+                    if self.use_copy:
+                        written = await self.storage.copy_to_db(batch, session)
+                        ids = []
+                    else:
+                        ids = await self.storage.save_many_to_db(batch, session)
+                        written = len(ids)
+            except Exception as e: # the batch is already out of the buffer: count and spool it like a refusal
+                logger.error(f"Batch write raised: {e}")
+                written, ids = 0, []
+            self.flushes += 1
+            if not written:
+                self.failed += len(batch)
+                logger.error(f"Failed to write batch of {len(batch)} records")
+                if self.spool is not None:
+                    self._spool(batch)
+                return []
+            self.rows_written += written
+        await self._after_flush(batch, ids)
+        if self.spool is not None and self.spool.pending() and not self._replaying:
+            self._replaying = True # the database is back
+            self._replay_task = asyncio.create_task(self._replay())
+        return ids
+
+    async def _after_flush(self, batch: list[MetricSample], ids: list[int]) -> None:
+        if self.on_flush is not None:
+            try:
+                await self.on_flush(batch, ids)
+            except Exception as e:
+                logger.error(f"Post-flush hook failed: {e}")
+
+    def _spool(self, batch: list[MetricSample]) -> None:
+        try:
+            self.spool.append([json.dumps(item.to_dict()).encode() for item in batch])
+            logger.warning(f"Spooled {len(batch)} records to {self.spool.directory} until the database is back")
+        except Exception as e:
+            logger.error(f"Failed to spool {len(batch)} records, they are lost: {e}")
+
+    async def _write_spooled(self, payloads: list[bytes]) -> bool:
+        items = [MetricSample.from_dict(json.loads(payload)) for payload in payloads]
+        try:
+            async with self.session_factory() as session:
+                written = await self.storage.copy_to_db(items, session) # COPY on asyncpg, one multi-row INSERT elsewhere
+        except Exception as e:
+            logger.error(f"Spooled batch write raised: {e}")
+            written = 0
+        if not written:
+            return False
+        self.rows_written += written
+        await self._after_flush(items, []) # rollups catch up, the hot cache only keeps recent records
+        return True
+
+    async def replay(self) -> int:
+        """Write the spooled records back in bulk, oldest first; stops while the database still refuses them."""
+        if self.spool is None or self._replaying:
+            return 0
+        self._replaying = True
+        return await self._replay()
+
+    async def _replay(self) -> int:
+        try:
+            return await self.spool.replay(self._write_spooled)
+        except Exception as e:
+            logger.error(f"Spool replay failed: {e}")
+            return 0
+        finally:
+            self._replaying = False
+            self._replay_task = None
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._replay_task is not None:
+            await self._replay_task
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._buffer),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "failed": self.failed,
+            **({"spool": self.spool.stats()} if self.spool is not None else {}),
+        }
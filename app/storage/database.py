@@ -4,6 +4,8 @@ from sqlalchemy.orm import sessionmaker
 
 # local imports
 from app.config import settings
+from app.models.models import Base, MetricsModel
+from app.storage.migrations import create_partitioned_resources
 
 DB_URL = settings.DB_URL
 
@@ -20,4 +22,14 @@ AsyncSessionLocal = async_sessionmaker(
 # Dependency-like context manager
 async def get_db_session() -> AsyncSession:
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+async def init_db() -> None:
+    """Create any missing tables and indexes."""
+    async with engine.begin() as conn:
+        if settings.STORAGE_BACKEND == "segments": # raw samples live in segment files, only rollups and sketches here
+            tables = [table for table in Base.metadata.sorted_tables if table.name != MetricsModel.__tablename__]
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+            return
+        await conn.run_sync(create_partitioned_resources) # only with RETENTION_STRATEGY=partitions on Postgres
+        await conn.run_sync(Base.metadata.create_all)
@@ -0,0 +1,202 @@
+# Third-party imports
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn
+
+# Built-in imports
+from datetime import datetime
+import asyncio
+import json
+
+# local imports
+from app.config import settings
+from app.models.models import ROLLUP_MODELS, SKETCH_MODELS, UNKNOWN_HOST, Base, MetricsModel, flatten_metrics
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LEGACY_TABLE = "resources_legacy"
+BLOB_COLUMNS = {"memory", "disk", "net_io"}
+
+
+def _legacy_indexes(sync_conn) -> list[str] | None:
+    """Index names of `resources` if it still has the JSON blob layout, else None."""
+    inspector = inspect(sync_conn)
+    if not inspector.has_table(MetricsModel.__tablename__):
+        return None
+    columns = {col["name"] for col in inspector.get_columns(MetricsModel.__tablename__)}
+    if not BLOB_COLUMNS <= columns:
+        return None
+    return [index["name"] for index in inspector.get_indexes(MetricsModel.__tablename__)]
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    """create_all skips existing tables, so add indexes introduced after the table was created."""
+    for model in (MetricsModel, *ROLLUP_MODELS.values(), *SKETCH_MODELS.values()):
+        for index in model.__table__.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+def create_partitioned_resources(sync_conn) -> bool:
+    """
+    With `RETENTION_STRATEGY=partitions` on Postgres, create `resources`
+    partitioned by day on `time_stamp`, so retention drops whole partitions.
+    The primary key becomes (id, time_stamp), as Postgres requires, and a
+    default partition catches samples outside the pre-created days. An
+    existing table is left as it is.
+    """
+    table = MetricsModel.__table__
+    if settings.RETENTION_STRATEGY != "partitions" or sync_conn.dialect.name != "postgresql":
+        return False
+    if inspect(sync_conn).has_table(table.name):
+        return False
+    columns = ", ".join(str(CreateColumn(column).compile(dialect=sync_conn.dialect)) for column in table.columns)
+    sync_conn.execute(text(f"CREATE TABLE {table.name} ({columns}, PRIMARY KEY (id, time_stamp)) PARTITION BY RANGE (time_stamp)"))
+    sync_conn.execute(text(f"CREATE TABLE {table.name}_default PARTITION OF {table.name} DEFAULT"))
+    for index in table.indexes:
+        index.create(sync_conn)
+    logger.info(f"Created {table.name} partitioned by day")
+    return True
+
+
+def _rebuild_stale_rollups(sync_conn) -> list[str]:
+    """
+    Rollup tables keyed without `host` can't be altered into the new key, so
+    they are rebuilt: the rows are set aside, the table is recreated with the
+    host key and the rows come back as `UNKNOWN_HOST` buckets. Rollups outlive
+    the raw samples, so they can't be recomputed and must not be dropped.
+    """
+    inspector = inspect(sync_conn)
+    rebuilt = []
+    for model in ROLLUP_MODELS.values():
+        name = model.__tablename__
+        if not inspector.has_table(name):
+            continue
+        old_columns = {col["name"] for col in inspector.get_columns(name)}
+        if "host" in old_columns:
+            continue
+        columns = [column.name for column in model.__table__.columns if column.name in old_columns]
+        missing = [column.name for column in model.__table__.columns
+                   if column.name not in old_columns and column.name != "host" and not column.nullable]
+        backup = f"{name}_legacy"
+        # CREATE TABLE AS copies no constraints, so the new table can take the index and key names
+        sync_conn.execute(text(f"DROP TABLE IF EXISTS {backup}"))
+        sync_conn.execute(text(f"CREATE TABLE {backup} AS SELECT * FROM {name}"))
+        sync_conn.execute(text(f"DROP TABLE {name}"))
+        model.__table__.create(sync_conn)
+        if missing:
+            logger.error(f"Cannot keep the rows of {name}, its old layout lacks {missing}; it refills from new samples")
+        else:
+            select_list = ", ".join(columns)
+            sync_conn.execute(
+                text(f"INSERT INTO {name} (host, {select_list}) SELECT :host, {select_list} FROM {backup}"),
+                {"host": UNKNOWN_HOST},
+            )
+        sync_conn.execute(text(f"DROP TABLE {backup}"))
+        rebuilt.append(name)
+    if rebuilt:
+        logger.warning(f"Rebuilt rollup tables with a host key, existing buckets belong to '{UNKNOWN_HOST}': {rebuilt}")
+    return rebuilt
+
+
+def _add_missing_columns(sync_conn) -> list[str]:
+    """create_all skips existing tables, so add columns introduced after the table was created."""
+    table = MetricsModel.__table__
+    existing = {col["name"] for col in inspect(sync_conn).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=sync_conn.dialect)
+        if column.nullable:
+            sync_conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        elif column.server_default is not None: # existing rows take the default
+            default = column.server_default.arg
+            sync_conn.execute(text(
+                f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} NOT NULL DEFAULT '{default}'"
+            ))
+        else:
+            logger.error(f"Cannot add required column {column.name} to {table.name} without a default")
+            continue
+        added.append(column.name)
+    if added:
+        logger.info(f"Added columns to {table.name}: {added}")
+    return added
+
+
+def legacy_to_row(row) -> dict:
+    """Convert a blob-layout row into typed column values."""
+    data = {group: json.loads(getattr(row, group)) if getattr(row, group) else {} for group in BLOB_COLUMNS}
+    time_stamp = row.time_stamp
+    if isinstance(time_stamp, str): # SQLite hands raw DATETIME text back
+        time_stamp = datetime.fromisoformat(time_stamp)
+    return {
+        "id": row.id,
+        "time_stamp": time_stamp,
+        "cpu_percent": float(row.cpu_percent),
+        **flatten_metrics(data)
+    }
+
+
+async def migrate_blob_layout(engine: AsyncEngine, chunk_size: int = 5000) -> int:
+    """
+    Move `resources` from the JSON blob layout to typed columns.
+
+    The old table is renamed aside, the typed table is created with its
+    indexes, rows are copied over in id-ordered chunks (one transaction each,
+    ids preserved) and the old table is dropped. Safe to re-run: it resumes
+    from the last copied id and is a no-op once the layout is typed. Typed
+    tables created by an older release get their newer columns added, and
+    rollup tables from before the host key are rebuilt with their buckets
+    kept under the `unknown` host.
+    """
+    async with engine.begin() as conn:
+        indexes = await conn.run_sync(_legacy_indexes)
+        if indexes is not None:
+            for name in indexes: # index names are global, free them for the new table
+                await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            await conn.execute(text(f"ALTER TABLE {MetricsModel.__tablename__} RENAME TO {LEGACY_TABLE}"))
+        has_legacy = await conn.run_sync(lambda c: inspect(c).has_table(LEGACY_TABLE))
+        await conn.run_sync(_rebuild_stale_rollups)
+        await conn.run_sync(create_partitioned_resources)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_create_missing_indexes)
+    if not has_legacy:
+        logger.info("resources table already uses the typed layout")
+        return 0
+
+    async with engine.connect() as conn:
+        last_id = (await conn.execute(text(f"SELECT COALESCE(MAX(id), 0) FROM {MetricsModel.__tablename__}"))).scalar()
+
+    migrated = 0
+    while True:
+        async with engine.begin() as conn:
+            rows = (await conn.execute(
+                text(
+                    f"SELECT id, time_stamp, cpu_percent, memory, disk, net_io FROM {LEGACY_TABLE} "
+                    "WHERE id > :last_id ORDER BY id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": chunk_size}
+            )).all()
+            if not rows:
+                break
+            await conn.execute(insert(MetricsModel), [legacy_to_row(row) for row in rows])
+        last_id = rows[-1].id
+        migrated += len(rows)
+        logger.info(f"Migrated {migrated} rows to the typed layout")
+
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql": # explicit ids bypass the serial sequence
+            await conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{MetricsModel.__tablename__}', 'id'), "
+                f"COALESCE(MAX(id), 1)) FROM {MetricsModel.__tablename__}"
+            ))
+        await conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    logger.info(f"Migration finished: {migrated} rows")
+    return migrated
+
+
+if __name__ == "__main__":
+    from app.storage.database import engine
+    asyncio.run(migrate_blob_layout(engine))
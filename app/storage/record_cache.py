@@ -0,0 +1,87 @@
+# Built-in imports
+from collections import OrderedDict
+from typing import Any, Hashable
+
+# Third-party imports
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# local imports
+from app.config import settings
+from app.models.models import Metrics
+from app.storage.redis_cache import CachePanel, cache_panel
+from app.storage.storage import Storage, storage
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class LRUCache:
+    """Size-bounded in-process mapping that evicts the least recently used entry."""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict[Hashable, Any] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+class RecordCache:
+    """
+    Read-through lookup of single records: in-process LRU → Redis → DB.
+
+    Stored records never change, so whatever a lower tier returns is copied
+    into the tiers above it and never invalidated.
+    """
+    def __init__(self, redis_cache: CachePanel = cache_panel, store: Storage = storage, max_size: int | None = None):
+        self.redis_cache = redis_cache
+        self.storage = store
+        self.lru = LRUCache(max_size or settings.RECORD_LRU_SIZE)
+        self.counters = {"lru_hits": 0, "redis_hits": 0, "db_hits": 0, "misses": 0}
+
+    async def get(self, db: AsyncSession, record_id: int) -> dict | None:
+        record = self.lru.get(record_id)
+        if record is not None:
+            self.counters["lru_hits"] += 1
+            return record
+
+        record = await self.redis_cache.get_cache(record_id)
+        if record is not None:
+            self.counters["redis_hits"] += 1
+            self.lru.put(record_id, record)
+            return record
+
+        result = await self.storage.get_record_from_db(db, record_id)
+        if result is None:
+            self.counters["misses"] += 1
+            return None
+        self.counters["db_hits"] += 1
+        record = Metrics.model_validate(result).model_dump(mode="json", by_alias=True)
+        self.lru.put(record_id, record)
+        await self.redis_cache.put_record(record)
+        return record
+
+    def stats(self) -> dict:
+        lookups = sum(self.counters.values())
+        cached = self.counters["lru_hits"] + self.counters["redis_hits"]
+        return {
+            **self.counters,
+            "lookups": lookups,
+            "hit_ratio": cached / lookups if lookups else 0.0,
+            "lru_size": len(self.lru),
+            "lru_max_size": self.lru.max_size,
+        }
+
+record_cache = RecordCache()
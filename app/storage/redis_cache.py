@@ -2,55 +2,167 @@
 import redis.asyncio as redis
 
 # Built-in imports
+from datetime import datetime, timezone
 import json
+import time
 
 # Local imports
-from app.models.models import MetricsModel, Metrics
+from app.config import settings
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+INDEX_KEY = "metrics:index"
+HOST_INDEX_KEY = "metrics:index:{}"
+HOSTS_KEY = "metrics:hosts"
+RECORD_KEY = "metrics:record:{}"
+COVERED_KEY = "metrics:covered_from"
+
+def record_score(record: dict) -> float:
+    """Epoch seconds of a cached record's (naive UTC) timestamp."""
+    time_stamp = datetime.fromisoformat(record["timestamp"])
+    if time_stamp.tzinfo is None:
+        time_stamp = time_stamp.replace(tzinfo=timezone.utc)
+    return time_stamp.timestamp()
+
 class CachePanel:
-    def __init__(self, redis_url: str = "redis://localhost:6379"):
+    """
+    Rolling window of the most recent records in Redis.
+
+    Each record lives under its own key (`metrics:record:<id>`, expiring after
+    `window_seconds`) and the `metrics:index` sorted set orders the ids by
+    timestamp. A `metrics:index:<host>` sorted set per host does the same for
+    that host's records, so per-host reads don't scan the whole fleet. Every
+    write trims the indexes to the window and to `max_entries`, so the cache
+    stays bounded and ages out one record at a time.
+
+    `metrics:covered_from` is the epoch second from which the index holds
+    every stored record. It starts at the first cached record and moves up
+    past evicted ones. It is dropped when records are stored without being
+    cached (`forget_coverage`), when a write fails, or after a window with
+    no writes. `get_recent` only answers for spans that lie inside it.
+    """
+    def __init__(self, redis_url: str = "redis://localhost:6379", max_entries: int | None = None, window_seconds: int | None = None):
         self.redis = redis.from_url(redis_url, decode_responses=True)
-        
+        self.max_entries = max_entries or settings.CACHE_MAX_ENTRIES
+        self.window_seconds = window_seconds or settings.CACHE_WINDOW_SECONDS
+
     async def cache(self, data: dict) -> None:
+        await self.cache_many([data])
+
+    async def cache_many(self, records: list[dict]) -> None:
+        """Add records carrying their DB `id` and ISO `timestamp`, then trim the window."""
+        if not records:
+            return
         try:
-            await self.redis.rpush("records", json.dumps(data))
-            ttl = await self.redis.ttl("records")
-            if ttl == -1:
-                await self.redis.expire("records", 3600)
-            logger.info("Record pushed to Redis")
+            oldest = f"({time.time() - self.window_seconds}"
+            by_host: dict[str, dict[str, float]] = {}
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for record in records:
+                    pipe.set(RECORD_KEY.format(record["id"]), json.dumps(record), ex=self.window_seconds)
+                    if record.get("host"):
+                        by_host.setdefault(record["host"], {})[str(record["id"])] = record_score(record)
+                for host, scores in by_host.items():
+                    host_key = HOST_INDEX_KEY.format(host)
+                    pipe.zadd(host_key, scores)
+                    pipe.zremrangebyscore(host_key, "-inf", oldest)
+                    pipe.zremrangebyrank(host_key, 0, -self.max_entries - 1)
+                if by_host:
+                    pipe.sadd(HOSTS_KEY, *by_host)
+                scores = {str(record["id"]): record_score(record) for record in records}
+                pipe.zadd(INDEX_KEY, scores)
+                pipe.zremrangebyscore(INDEX_KEY, "-inf", oldest)
+                pipe.set(COVERED_KEY, min(scores.values()), nx=True) # a cold cache covers from its first record
+                pipe.expire(COVERED_KEY, self.window_seconds)
+                pipe.zcard(INDEX_KEY)
+                *_, size = await pipe.execute()
+            if size > self.max_entries:
+                evicted = await self.redis.zpopmin(INDEX_KEY, size - self.max_entries)
+                await self.redis.delete(*(RECORD_KEY.format(record_id) for record_id, _ in evicted))
+                covered_from = await self.redis.get(COVERED_KEY)
+                await self.redis.set(COVERED_KEY, max(evicted[-1][1], float(covered_from or 0)), ex=self.window_seconds)
+            logger.info(f"{len(records)} record(s) pushed to Redis")
         except Exception as e:
             logger.error(f"Failed to push to Redis: {e}")
-            
+            await self.forget_coverage() # some of the records may be missing from the index
+
+    async def forget_coverage(self) -> None:
+        """Mark the index incomplete, e.g. after records were stored without being cached."""
+        try:
+            await self.redis.delete(COVERED_KEY)
+        except Exception as e:
+            logger.error(f"Failed to reset Redis cache coverage: {e}")
+
+    async def put_record(self, record: dict) -> None:
+        """Cache a record for by-id reads only, without adding it to the time index."""
+        try:
+            await self.redis.set(RECORD_KEY.format(record["id"]), json.dumps(record), ex=self.window_seconds)
+        except Exception as e:
+            logger.error(f"Failed to push record to Redis: {e}")
+
     async def get_cache(self, record_id: int) -> dict | None:
         try:
-            data = await self.redis.lindex("records", record_id)
+            data = await self.redis.get(RECORD_KEY.format(record_id))
             return json.loads(data) if data else None
         except Exception as e:
             logger.error(f"Failed to get record from Redis: {e}")
             return None
-        
+
+    async def _load(self, record_ids: list[str]) -> list[dict]:
+        if not record_ids:
+            return []
+        raw_data = await self.redis.mget([RECORD_KEY.format(record_id) for record_id in record_ids])
+        return [json.loads(item) for item in raw_data if item] # skip records that already expired
+
+    async def get_range(self, start: float, end: float = float("inf"), host: str | None = None) -> list[dict]:
+        """Records with start <= timestamp < end (epoch seconds), oldest first, of one host or all."""
+        try:
+            index_key = INDEX_KEY if host is None else HOST_INDEX_KEY.format(host)
+            record_ids = await self.redis.zrangebyscore(index_key, start, f"({end}")
+            return await self._load(record_ids)
+        except Exception as e:
+            logger.error(f"Failed to get records range from Redis: {e}")
+            return []
+
+    async def get_recent(self, seconds: float, host: str | None = None, limit: int | None = None) -> list[dict] | None:
+        """The newest `limit` records of the last `seconds`, oldest first; None unless the cache covers that whole span."""
+        start = time.time() - seconds
+        try:
+            covered_from = await self.redis.get(COVERED_KEY)
+            if covered_from is None or float(covered_from) > start:
+                return None
+            index_key = INDEX_KEY if host is None else HOST_INDEX_KEY.format(host)
+            if limit is None:
+                return await self._load(await self.redis.zrangebyscore(index_key, start, "+inf"))
+            newest = await self.redis.zrevrangebyscore(index_key, "+inf", start, start=0, num=limit)
+            return await self._load(newest[::-1])
+        except Exception as e:
+            logger.error(f"Failed to get recent records from Redis: {e}")
+            return None
+
     async def get_all_cache(self) -> list[dict]:
         try:
-            raw_data = await self.redis.lrange("records", 0, -1)
-            return [json.loads(item) for item in raw_data]
+            return await self._load(await self.redis.zrange(INDEX_KEY, 0, -1))
         except Exception as e:
             logger.error(f"Failed to get all records from redis: {e}")
             return []
-        
+
     async def cache_size(self) -> int:
         try:
-            return await self.redis.llen("records")
+            return await self.redis.zcard(INDEX_KEY)
         except Exception as e:
             logger.error(f"Failed to get Redis cache size: {e}")
             return 0
-    
+
     async def clear_cache(self) -> None:
         try:
-            await self.redis.delete("records")
+            record_ids = await self.redis.zrange(INDEX_KEY, 0, -1)
+            host_keys = [HOST_INDEX_KEY.format(host) for host in await self.redis.smembers(HOSTS_KEY)]
+            await self.redis.delete(
+                INDEX_KEY, HOSTS_KEY, COVERED_KEY, *host_keys, *(RECORD_KEY.format(record_id) for record_id in record_ids)
+            )
             logger.info("Redis cache cleared.")
         except Exception as e:
             logger.error(f"Failed to clear Redis cache: {e}")
-        
\ No newline at end of file
+
+cache_panel = CachePanel(settings.REDIS_URL)
@@ -0,0 +1,210 @@
+# Third-party imports
+from sqlalchemy import delete, select, text, tuple_
+
+# Built-in imports
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+import re
+
+# local imports
+from app.config import settings
+from app.models.models import ROLLUP_MODELS, SKETCH_MODELS, MetricsModel
+from app.storage.database import AsyncSessionLocal
+from app.storage.segments import SegmentStorage
+from app.storage.storage import Storage, storage as default_storage
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STRATEGIES = ("chunked", "partitions")
+
+# daily partitions of `resources`, e.g. resources_p20250521
+PARTITION_PATTERN = re.compile(rf"{MetricsModel.__tablename__}_p(\d{{8}})")
+
+def parse_days(text: str) -> dict[str, float]:
+    """Parse `tier=days,...` retention overrides; 0 keeps a tier forever."""
+    days = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"Expected tier=days, got '{part}'")
+        days[name.strip()] = float(value)
+    unknown = set(days) - set(ROLLUP_MODELS)
+    if unknown:
+        raise ValueError(f"Unknown rollup tier(s) {sorted(unknown)}, expected some of {list(ROLLUP_MODELS)}")
+    return days
+
+def partition_name(day: date) -> str:
+    return f"{MetricsModel.__tablename__}_p{day:%Y%m%d}"
+
+def expired_partitions(names: list[str], cutoff: datetime) -> list[str]:
+    """Daily partitions whose whole day is before `cutoff`, oldest first; the default partition never is."""
+    expired = []
+    for name in sorted(names):
+        match = PARTITION_PATTERN.fullmatch(name)
+        if match and datetime.strptime(match.group(1), "%Y%m%d") + timedelta(days=1) <= cutoff:
+            expired.append(name)
+    return expired
+
+class RetentionManager:
+    """
+    Ages raw samples, rollups and sketches out of the database in the background.
+
+    Raw rows older than `RETENTION_RAW_DAYS` are deleted in bounded chunks,
+    one short transaction each with a pause in between, so writers and
+    readers never queue behind one huge DELETE and a run can stop anywhere.
+    With `RETENTION_STRATEGY=partitions` on a day-partitioned Postgres table,
+    expired days are dropped as whole partitions instead (no dead rows,
+    no vacuum) and upcoming days are created ahead. Each rollup tier, and
+    the sketches of that tier, keep their own, longer TTL. With the segment
+    store backend, raw samples go a whole segment file at a time.
+    """
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        raw_days: float | None = None,
+        rollup_days: str | dict[str, float] | None = None,
+        strategy: str | None = None,
+        chunk_size: int | None = None,
+        chunk_pause: float | None = None,
+        storage: Storage | None = None,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage or default_storage
+        self.raw_days = settings.RETENTION_RAW_DAYS if raw_days is None else raw_days
+        rollup_days = settings.RETENTION_ROLLUP_DAYS if rollup_days is None else rollup_days
+        self.rollup_days = parse_days(rollup_days) if isinstance(rollup_days, str) else dict(rollup_days)
+        self.strategy = strategy or settings.RETENTION_STRATEGY
+        if self.strategy not in STRATEGIES:
+            raise ValueError(f"Unknown retention strategy '{self.strategy}', expected one of {STRATEGIES}")
+        self.chunk_size = chunk_size or settings.RETENTION_CHUNK_SIZE
+        self.chunk_pause = settings.RETENTION_CHUNK_PAUSE if chunk_pause is None else chunk_pause
+        for tier, days in self.rollup_days.items():
+            if self.raw_days and 0 < days < self.raw_days:
+                logger.warning(f"Rollup tier {tier} is kept for less time ({days}d) than raw samples ({self.raw_days}d)")
+        self._partitioned: bool | None = None # looked up on the first run
+        self.deleted = 0
+        self.dropped = 0
+        self.runs = 0
+
+    async def _delete_chunk(self, model, key_columns: list, column, cutoff: datetime) -> int:
+        """Delete up to `chunk_size` of the oldest rows before `cutoff` in one transaction."""
+        oldest = select(*key_columns).where(column < cutoff).order_by(column).limit(self.chunk_size)
+        key = key_columns[0] if len(key_columns) == 1 else tuple_(*key_columns)
+        async with self.session_factory() as session:
+            result = await session.execute(delete(model).where(key.in_(oldest)).execution_options(synchronize_session=False))
+            await session.commit()
+        return result.rowcount
+
+    async def delete_before(self, model, key_columns: list, column, cutoff: datetime) -> int:
+        """Delete every row before `cutoff` in chunks, pausing between them; returns the rows deleted."""
+        deleted = 0
+        while True:
+            count = await self._delete_chunk(model, key_columns, column, cutoff)
+            deleted += count
+            if count < self.chunk_size:
+                break
+            await asyncio.sleep(self.chunk_pause)
+        if deleted:
+            logger.info(f"Retention deleted {deleted} rows from {model.__tablename__} before {cutoff}")
+        return deleted
+
+    async def is_partitioned(self) -> bool:
+        if self._partitioned is None:
+            self._partitioned = False
+            async with self.session_factory() as session:
+                if session.bind.dialect.name == "postgresql":
+                    self._partitioned = (await session.execute(text(
+                        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :name"
+                    ), {"name": MetricsModel.__tablename__})).first() is not None
+            if self.strategy == "partitions" and not self._partitioned:
+                logger.warning(f"{MetricsModel.__tablename__} is not partitioned, retention falls back to chunked deletes")
+        return self._partitioned
+
+    async def ensure_partitions(self, today: date, ahead: int | None = None) -> list[str]:
+        """Create the daily partitions from yesterday to `ahead` days out, each in its own transaction."""
+        ahead = settings.RETENTION_PARTITIONS_AHEAD if ahead is None else ahead
+        table = MetricsModel.__tablename__
+        created = []
+        for offset in range(-1, ahead + 1):
+            day = today + timedelta(days=offset)
+            name = partition_name(day)
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+                    ))
+                    await session.commit()
+                created.append(name)
+            except Exception as e: # e.g. the default partition already holds rows of that day
+                logger.error(f"Failed to create partition {name}: {e}")
+        return created
+
+    async def drop_partitions(self, cutoff: datetime) -> list[str]:
+        """Drop the daily partitions that end before `cutoff`."""
+        async with self.session_factory() as session:
+            names = (await session.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :name"
+            ), {"name": MetricsModel.__tablename__})).scalars().all()
+        dropped = []
+        for name in expired_partitions(list(names), cutoff):
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                    await session.commit()
+                dropped.append(name)
+            except Exception as e:
+                logger.error(f"Failed to drop partition {name}: {e}")
+        if dropped:
+            logger.info(f"Retention dropped partitions {dropped}")
+        return dropped
+
+    async def run_once(self, now: datetime | None = None) -> dict:
+        """One retention pass over raw samples, rollups and sketches; returns what was removed."""
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        report = {"resources": 0, "partitions": 0}
+        try:
+            if self.raw_days:
+                cutoff = now - timedelta(days=self.raw_days)
+                if isinstance(self.storage, SegmentStorage): # raw samples are in segment files, not `resources`
+                    report["resources"] = await self.storage.drop_before(cutoff)
+                else:
+                    if self.strategy == "partitions" and await self.is_partitioned():
+                        cutoff = cutoff.replace(hour=0, minute=0, second=0, microsecond=0) # whole days only
+                        await self.ensure_partitions(now.date())
+                        report["partitions"] = len(await self.drop_partitions(cutoff))
+                    # with partitions this only finds stragglers in the default partition
+                    report["resources"] = await self.delete_before(MetricsModel, [MetricsModel.id], MetricsModel.time_stamp, cutoff)
+            for tier, days in self.rollup_days.items():
+                if not days:
+                    continue
+                cutoff = now - timedelta(days=days)
+                for models in (ROLLUP_MODELS, SKETCH_MODELS):
+                    model = models[tier]
+                    keys = [model.host, model.metric, model.bucket]
+                    report[model.__tablename__] = await self.delete_before(model, keys, model.bucket, cutoff)
+        except Exception as e:
+            logger.error(f"Retention run failed: {e}")
+        self.runs += 1
+        deleted = sum(count for name, count in report.items() if name != "partitions")
+        self.deleted += deleted
+        self.dropped += report["partitions"]
+        if deleted or report["partitions"]:
+            logger.info(f"Retention run: {report}")
+        return report
+
+    async def run_forever(self, interval: float | None = None) -> None:
+        interval = interval or settings.RETENTION_INTERVAL
+        while True:
+            await self.run_once()
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        return {"runs": self.runs, "deleted": self.deleted, "dropped_partitions": self.dropped}
+
+
+if __name__ == "__main__":
+    # one pass, e.g. from cron when no continuous pipeline runs
+    asyncio.run(RetentionManager().run_once())
@@ -0,0 +1,337 @@
+# Third-party imports
+from sqlalchemy import case, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Built-in imports
+from datetime import datetime, timedelta, timezone
+
+# local imports
+from app.config import settings
+from app.models.models import NUMERIC_COLUMNS, ROLLUP_MODELS, ROLLUP_RESOLUTIONS, SKETCH_MODELS, UNKNOWN_HOST
+from app.models.sample import MetricSample
+from app.storage.database import AsyncSessionLocal
+from app.storage.sketch import DDSketch
+from app.storage.storage import to_naive_utc
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def bucket_start(time_stamp: datetime, seconds: int) -> datetime:
+    """Floor a naive UTC timestamp to the start of its bucket."""
+    epoch = int(time_stamp.replace(tzinfo=timezone.utc).timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, timezone.utc).replace(tzinfo=None)
+
+def choose_resolution(start: datetime, end: datetime, max_points: int | None = None) -> str:
+    """Finest tier that covers [start, end) in at most `max_points` buckets, else the coarsest one."""
+    max_points = max_points or settings.AGGREGATE_MAX_POINTS
+    span = (end - start).total_seconds()
+    for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+        if span / seconds <= max_points:
+            return resolution
+    return list(ROLLUP_RESOLUTIONS)[-1]
+
+def cover_range(start: datetime, end: datetime, resolutions: dict[str, int]) -> list[tuple[str, datetime, datetime]]:
+    """
+    (resolution, first bucket, end) ranges covering [start, end) with the
+    fewest buckets: whole coarse buckets in the middle, finer ones at the
+    edges. The edges are widened to the finest tier's bucket boundaries.
+    """
+    if start >= end:
+        return []
+    tiers = sorted(resolutions.items(), key=lambda tier: tier[1])
+    resolution, seconds = tiers[-1]
+    if len(tiers) == 1:
+        return [(resolution, bucket_start(start, seconds), end)]
+    first = bucket_start(start, seconds)
+    if first < start:
+        first += timedelta(seconds=seconds)
+    last = bucket_start(end, seconds)
+    finer = dict(tiers[:-1])
+    if first >= last:
+        return cover_range(start, end, finer)
+    return [*cover_range(start, first, finer), (resolution, first, last), *cover_range(last, end, finer)]
+
+def _names(text: str) -> list[str]:
+    return [name.strip() for name in text.split(",") if name.strip()]
+
+class Accumulator:
+    __slots__ = ("count", "min", "max", "sum", "last", "last_at")
+
+    def __init__(self):
+        self.count = 0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.sum = 0.0
+        self.last = None
+        self.last_at = None
+
+    def add(self, value: float, time_stamp: datetime) -> None:
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if self.last_at is None or time_stamp >= self.last_at:
+            self.last = value
+            self.last_at = time_stamp
+
+    def merge(self, other: "Accumulator") -> None:
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if other.last_at is not None and (self.last_at is None or other.last_at >= self.last_at):
+            self.last = other.last
+            self.last_at = other.last_at
+
+class RollupEngine:
+    """
+    Keeps min/max/sum/count/last per host, metric and bucket for every rollup tier.
+
+    Samples are folded into in-memory deltas; `flush()` merges the deltas into
+    the `rollup_*` tables with an upsert, so a bucket can be flushed many
+    times while it is still open and the process can restart at any point.
+
+    The `SKETCH_METRICS` also get a `DDSketch` per bucket in the
+    `SKETCH_RESOLUTIONS` tiers, merged into the `sketch_*` tables the same
+    way, for quantiles over any window without reading raw rows.
+    """
+    def __init__(
+        self,
+        session_factory=AsyncSessionLocal,
+        resolutions: dict[str, int] | None = None,
+        sketch_metrics: str | list[str] | None = None,
+        sketch_resolutions: str | list[str] | None = None,
+    ):
+        self.session_factory = session_factory
+        self.resolutions = resolutions or ROLLUP_RESOLUTIONS
+        self._pending: dict[str, dict[tuple[str, str, datetime], Accumulator]] = {res: {} for res in self.resolutions}
+        sketch_metrics = settings.SKETCH_METRICS if sketch_metrics is None else sketch_metrics
+        sketch_resolutions = settings.SKETCH_RESOLUTIONS if sketch_resolutions is None else sketch_resolutions
+        self.sketch_metrics = tuple(_names(sketch_metrics) if isinstance(sketch_metrics, str) else sketch_metrics)
+        if isinstance(sketch_resolutions, str):
+            sketch_resolutions = _names(sketch_resolutions)
+        unknown = (set(self.sketch_metrics) - set(NUMERIC_COLUMNS)) | (set(sketch_resolutions) - set(self.resolutions))
+        if unknown:
+            raise ValueError(f"Unknown sketch metric(s) or resolution(s) {sorted(unknown)}")
+        self.sketch_resolutions = {res: self.resolutions[res] for res in sketch_resolutions} if self.sketch_metrics else {}
+        self._sketches: dict[str, dict[tuple[str, str, datetime], DDSketch]] = {res: {} for res in self.sketch_resolutions}
+
+    def add(self, sample: MetricSample) -> None:
+        host, time_stamp = sample.host or UNKNOWN_HOST, sample.time_stamp
+        for resolution, seconds in self.resolutions.items():
+            bucket = bucket_start(time_stamp, seconds)
+            pending = self._pending[resolution]
+            for metric in NUMERIC_COLUMNS:
+                value = getattr(sample, metric)
+                if value is None:
+                    continue
+                acc = pending.get((host, metric, bucket))
+                if acc is None:
+                    acc = pending[(host, metric, bucket)] = Accumulator()
+                acc.add(float(value), time_stamp)
+            if resolution in self._sketches:
+                sketches = self._sketches[resolution]
+                for metric in self.sketch_metrics:
+                    value = getattr(sample, metric)
+                    if value is None:
+                        continue
+                    sketch = sketches.get((host, metric, bucket))
+                    if sketch is None:
+                        sketch = sketches[(host, metric, bucket)] = DDSketch()
+                    sketch.add(float(value))
+
+    def add_many(self, items: list[MetricSample]) -> None:
+        for item in items:
+            self.add(item)
+
+    def pending(self) -> int:
+        return sum(len(pending) for pending in (*self._pending.values(), *self._sketches.values()))
+
+    def _restore(self, pending: dict, sketches: dict) -> None:
+        """Fold the deltas of a failed flush back in, so the next flush writes them."""
+        for resolution, accumulators in pending.items():
+            current = self._pending[resolution]
+            for key, acc in accumulators.items():
+                if key in current:
+                    acc.merge(current[key])
+                current[key] = acc
+        for resolution, bucket_sketches in sketches.items():
+            current = self._sketches[resolution]
+            for key, sketch in bucket_sketches.items():
+                if key in current:
+                    sketch.merge(current[key])
+                current[key] = sketch
+
+    @staticmethod
+    def _upsert(model, dialect_name: str):
+        insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+        stmt = insert(model)
+        new, old = stmt.excluded, model.__table__.c
+        return stmt.on_conflict_do_update(
+            index_elements=[old.host, old.metric, old.bucket],
+            set_={
+                "count": old.count + new.count,
+                "sum": old.sum + new.sum,
+                "min": case((new.min < old.min, new.min), else_=old.min),
+                "max": case((new.max > old.max, new.max), else_=old.max),
+                "last": case((new.last_at >= old.last_at, new.last), else_=old.last),
+                "last_at": case((new.last_at >= old.last_at, new.last_at), else_=old.last_at),
+            }
+        )
+
+    @staticmethod
+    def _insert_missing(model, dialect_name: str):
+        insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+        old = model.__table__.c
+        return insert(model).on_conflict_do_nothing(index_elements=[old.host, old.metric, old.bucket])
+
+    async def _flush_sketches(self, session, resolution: str, sketches: dict[tuple[str, str, datetime], DDSketch]) -> int:
+        """
+        Merge pending sketches with the stored ones (read under a row lock)
+        and write them back. Missing rows are inserted empty first, so there
+        is always a row to lock and a concurrent first flush of the same
+        bucket waits for this one instead of overwriting it. The pending
+        sketches are left untouched, so a failed flush can put them back.
+        """
+        model = SKETCH_MODELS[resolution]
+        empty = DDSketch().to_bytes()
+        await session.execute(
+            self._insert_missing(model, session.bind.dialect.name),
+            [{"host": host, "metric": metric, "bucket": bucket, "count": 0, "sketch": empty}
+             for host, metric, bucket in sorted(sketches)], # one lock order for every flush
+        )
+        hosts, metrics, buckets = (set(key[i] for key in sketches) for i in range(3))
+        stored = await session.execute(
+            select(model)
+            .where(model.host.in_(hosts), model.metric.in_(metrics), model.bucket.in_(buckets))
+            .order_by(model.host, model.metric, model.bucket)
+            .with_for_update()
+        )
+        merged = dict(sketches)
+        for row in stored.scalars().all():
+            key = (row.host, row.metric, row.bucket)
+            if key not in sketches:
+                continue
+            try:
+                merged[key] = DDSketch.from_bytes(row.sketch).merge(sketches[key])
+            except ValueError as e: # SKETCH_RELATIVE_ACCURACY changed while the bucket was open
+                logger.warning(f"Replacing {resolution} sketch of {row.host} {row.metric} at {row.bucket}: {e}")
+        rows = [
+            {"host": host, "metric": metric, "bucket": bucket, "count": sketch.count, "sketch": sketch.to_bytes()}
+            for (host, metric, bucket), sketch in merged.items()
+        ]
+        await session.execute(update(model), rows) # bulk UPDATE by primary key
+        return len(rows)
+
+    async def flush(self) -> int:
+        if not self.pending():
+            return 0
+        pending, self._pending = self._pending, {res: {} for res in self.resolutions}
+        sketches, self._sketches = self._sketches, {res: {} for res in self.sketch_resolutions}
+        written = 0
+        try:
+            async with self.session_factory() as session:
+                dialect_name = session.bind.dialect.name
+                for resolution, accumulators in pending.items():
+                    if not accumulators:
+                        continue
+                    rows = [
+                        {"host": host, "metric": metric, "bucket": bucket, "count": acc.count, "min": acc.min,
+                         "max": acc.max, "sum": acc.sum, "last": acc.last, "last_at": acc.last_at}
+                        for (host, metric, bucket), acc in accumulators.items()
+                    ]
+                    await session.execute(self._upsert(ROLLUP_MODELS[resolution], dialect_name), rows)
+                    written += len(rows)
+                for resolution, bucket_sketches in sketches.items():
+                    if bucket_sketches:
+                        written += await self._flush_sketches(session, resolution, bucket_sketches)
+                await session.commit()
+        except Exception as e:
+            logger.error(f"Failed to flush rollups, keeping the deltas for the next flush: {e}")
+            self._restore(pending, sketches)
+            return 0
+        logger.info(f"{written} rollup buckets updated")
+        return written
+
+    async def query(
+        self,
+        db: AsyncSession,
+        resolution: str,
+        start: datetime,
+        end: datetime,
+        metrics: list[str] | None = None,
+        host: str | None = None
+    ) -> list[dict]:
+        """Buckets of one tier overlapping [start, end), ordered by host, metric then time."""
+        model = ROLLUP_MODELS[resolution]
+        first_bucket = bucket_start(to_naive_utc(start), ROLLUP_RESOLUTIONS[resolution])
+        query = (
+            select(model)
+            .where(model.bucket >= first_bucket, model.bucket < to_naive_utc(end))
+            .order_by(model.host, model.metric, model.bucket)
+        )
+        if host is not None:
+            query = query.where(model.host == host)
+        if metrics:
+            query = query.where(model.metric.in_(metrics))
+        try:
+            result = await db.execute(query)
+        except Exception as e:
+            logger.error(f"Error fetching rollups from DB: {e}")
+            return []
+        return [
+            {"host": row.host, "metric": row.metric, "bucket": row.bucket, "count": row.count, "min": row.min,
+             "max": row.max, "avg": row.sum / row.count, "last": row.last}
+            for row in result.scalars().all()
+        ]
+
+    async def quantiles(
+        self,
+        db: AsyncSession,
+        metric: str,
+        quantiles: list[float],
+        start: datetime,
+        end: datetime,
+        host: str | None = None
+    ) -> dict | None:
+        """
+        Quantiles of `metric` over [start, end), from the merged bucket
+        sketches of one host or of every host. Whole days come from the 1d
+        sketches, the edges from finer tiers, so the window is widened to
+        the finest sketch tier's buckets. None if the sketches can't be read.
+        """
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        finest = min(self.sketch_resolutions.values())
+        merged = None
+        read = 0
+        try:
+            for resolution, first_bucket, range_end in cover_range(start, end, self.sketch_resolutions):
+                model = SKETCH_MODELS[resolution]
+                query = select(model.sketch).where(model.metric == metric, model.bucket >= first_bucket, model.bucket < range_end)
+                if host is not None:
+                    query = query.where(model.host == host)
+                for data in (await db.execute(query)).scalars().all():
+                    sketch = DDSketch.from_bytes(data)
+                    merged = sketch if merged is None else merged.merge(sketch)
+                    read += 1
+        except Exception as e:
+            logger.error(f"Error reading sketches from DB: {e}")
+            return None
+        if merged is None:
+            merged = DDSketch()
+        last_bucket = bucket_start(end, finest)
+        return {
+            "metric": metric,
+            "host": host,
+            "start": bucket_start(start, finest),
+            "end": last_bucket if last_bucket == end else last_bucket + timedelta(seconds=finest),
+            "count": merged.count,
+            "sketches": read,
+            "relative_accuracy": merged.relative_accuracy,
+            "values": {f"p{q * 100:g}": merged.quantile(q) for q in quantiles},
+        }
+
+rollups = RollupEngine()
@@ -0,0 +1,551 @@
+# Third-party imports
+from sqlalchemy import BigInteger
+from sqlalchemy.orm import configure_mappers
+
+# Built-in imports
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import accumulate, dropwhile, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import AsyncIterator, Iterator, Sequence
+import asyncio
+import fcntl
+import heapq
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+# local imports
+from app.config import settings
+from app.models.models import NUMERIC_COLUMNS, MetricsModel
+from app.models.sample import MetricSample, from_ns, to_ns
+from app.storage.storage import Storage
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MAGIC = b"SHMSEG01"
+# footer length, MAGIC again: a file cut short by a crash has no valid trailer
+TRAILER = struct.Struct("<Q8s")
+SEGMENT_SUFFIX = ".seg"
+STATE_FILE = "state.json"
+LOCK_FILE = "lock"
+
+# the columns of a segment, in row-tuple order; rows sort on (time_stamp, id)
+FIELDS = ("time_stamp", "id", "host", "tags", *NUMERIC_COLUMNS)
+KEY = itemgetter(0, 1)
+# int64 columns stored as deltas: sorted timestamps and ids compress to almost nothing
+SEQUENCE_COLUMNS = ("time_stamp", "id")
+# text columns stored as codes into a dictionary kept in the footer
+DICTIONARY_COLUMNS = ("host", "tags")
+# numeric column -> array typecode: BigInteger columns are int64, the rest float64
+VALUE_TYPES = {
+    column: "q" if isinstance(MetricsModel.__table__.c[column].type, BigInteger) else "d"
+    for column in NUMERIC_COLUMNS
+}
+
+def _encode(name: str, values: list, dictionary: dict | None) -> bytes:
+    if name in SEQUENCE_COLUMNS:
+        data = array("q", [value - previous for previous, value in zip([0, *values], values)]).tobytes()
+    elif name in DICTIONARY_COLUMNS:
+        data = array("I", [dictionary.setdefault(value, len(dictionary)) for value in values]).tobytes()
+    else: # one presence byte per row, then the values with 0 in place of NULL
+        cast = int if VALUE_TYPES[name] == "q" else float
+        data = bytes(value is not None for value in values) + array(
+            VALUE_TYPES[name], [0 if value is None else cast(value) for value in values]
+        ).tobytes()
+    return zlib.compress(data)
+
+def _decode(name: str, data: bytes, rows: int, dictionary: list | None, positions: Sequence[int] | None = None) -> list:
+    """A column of a block, or only its values at `positions`."""
+    if name in SEQUENCE_COLUMNS:
+        deltas = array("q")
+        deltas.frombytes(data)
+        values = list(accumulate(deltas))
+        return values if positions is None else [values[row] for row in positions]
+    if name in DICTIONARY_COLUMNS:
+        codes = array("I")
+        codes.frombytes(data)
+        if positions is None:
+            return [dictionary[code] for code in codes]
+        return [dictionary[codes[row]] for row in positions]
+    values = array(VALUE_TYPES[name])
+    values.frombytes(data[rows:])
+    if positions is None:
+        return [value if present else None for value, present in zip(values, data[:rows])]
+    return [values[row] if data[row] else None for row in positions]
+
+def _stats(values: list) -> list:
+    """[count, sum, min, max] of the non-NULL values."""
+    present = [value for value in values if value is not None]
+    if not present:
+        return [0, 0, None, None]
+    return [len(present), sum(present), min(present), max(present)]
+
+def _merge_stats(a: list, b: list) -> list:
+    if not b[0]:
+        return a
+    if not a[0]:
+        return list(b)
+    return [a[0] + b[0], a[1] + b[1], min(a[2], b[2]), max(a[3], b[3])]
+
+def _ns(value: datetime | str | None) -> int | None:
+    return None if value is None else to_ns(value)
+
+def to_row(sample: MetricSample, record_id: int) -> tuple:
+    """The segment row of a sample, its timestamp cut to the microseconds a database keeps."""
+    row = sample.to_row()
+    tags = json.dumps(row["tags"], sort_keys=True) if row["tags"] else None
+    return (sample.ts_ns // 1000 * 1000, record_id, row["host"], tags, *(row[column] for column in NUMERIC_COLUMNS))
+
+configure_mappers() # instances are built without __init__, which would otherwise configure them
+_new_record = MetricsModel.__mapper__.class_manager.new_instance
+
+def to_record(row: tuple) -> MetricsModel:
+    """A detached `MetricsModel`, the record type `Storage` returns."""
+    time_stamp, record_id, host, tags, *values = row
+    record = _new_record()
+    # filled in like an ORM load, without the per-attribute change tracking of __init__
+    record.__dict__.update(zip(NUMERIC_COLUMNS, values))
+    record.__dict__.update(id=record_id, host=host, tags=json.loads(tags) if tags else None, time_stamp=from_ns(time_stamp))
+    return record
+
+def write_segment(path: Path, rows: list[tuple], block_rows: int, sources: Sequence[str] = ()) -> None:
+    """Write rows sorted on (time_stamp, id) as per-column compressed blocks and a JSON footer, atomically."""
+    dictionaries: dict[str, dict] = {name: {} for name in DICTIONARY_COLUMNS}
+    blocks = []
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, "wb") as file:
+        file.write(MAGIC)
+        for first in range(0, len(rows), block_rows):
+            chunk = rows[first:first + block_rows]
+            columns = dict(zip(FIELDS, map(list, zip(*chunk))))
+            block = {
+                "rows": len(chunk), "min_ts": chunk[0][0], "max_ts": chunk[-1][0],
+                "min_id": min(columns["id"]), "max_id": max(columns["id"]), "columns": {},
+                "stats": {column: _stats(columns[column]) for column in NUMERIC_COLUMNS},
+            }
+            for name in FIELDS:
+                data = _encode(name, columns[name], dictionaries.get(name))
+                block["columns"][name] = [file.tell(), len(data)]
+                file.write(data)
+            blocks.append(block)
+        footer = json.dumps({
+            "rows": len(rows),
+            "min_ts": rows[0][0],
+            "max_ts": rows[-1][0],
+            "min_id": min(block["min_id"] for block in blocks),
+            "max_id": max(block["max_id"] for block in blocks),
+            "sources": list(sources),
+            "dictionaries": {name: list(values) for name, values in dictionaries.items()},
+            "blocks": blocks,
+        }).encode()
+        file.write(footer)
+        file.write(TRAILER.pack(len(footer), MAGIC))
+    os.replace(temp, path)
+
+class Segment:
+    """One memory-mapped segment file; a column of a block is decompressed only when a query needs it."""
+    def __init__(self, path: Path, bytes_read: Counter):
+        self.name = path.name
+        self.bytes_read = bytes_read
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < len(MAGIC) + TRAILER.size:
+                raise ValueError("too short for a segment")
+            self.view = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) # stays valid after close
+        end = len(self.view) - TRAILER.size
+        length, magic = TRAILER.unpack_from(self.view, end)
+        if self.view[:len(MAGIC)] != MAGIC or magic != MAGIC:
+            raise ValueError("bad magic, not a complete segment")
+        footer = json.loads(self.view[end - length:end])
+        self.rows = footer["rows"]
+        self.min_ts, self.max_ts = footer["min_ts"], footer["max_ts"]
+        self.min_id, self.max_id = footer["min_id"], footer["max_id"]
+        self.sources = footer["sources"]
+        self.dictionaries = footer["dictionaries"]
+        self.blocks = footer["blocks"]
+        # the sparse time index: blocks are in time order, so a range maps to a run of them
+        self.block_min_ts = [block["min_ts"] for block in self.blocks]
+        self.block_max_ts = [block["max_ts"] for block in self.blocks]
+
+    def column(self, index: int, name: str, positions: Sequence[int] | None = None) -> list:
+        offset, length = self.blocks[index]["columns"][name]
+        self.bytes_read[name] += length
+        data = zlib.decompress(self.view[offset:offset + length])
+        return _decode(name, data, self.blocks[index]["rows"], self.dictionaries.get(name), positions)
+
+    def block_range(self, start: int | None, end: int | None) -> range:
+        first = 0 if start is None else bisect_left(self.block_max_ts, start)
+        last = len(self.blocks) if end is None else bisect_left(self.block_min_ts, end)
+        return range(first, last)
+
+    @staticmethod
+    def covers(block: dict, start: int | None, end: int | None) -> bool:
+        """Whether every row of a block is within [start, end)."""
+        return (start is None or block["min_ts"] >= start) and (end is None or block["max_ts"] < end)
+
+    def _filters(self, start: int | None, end: int | None, host: str | None) -> tuple[bool, bool]:
+        """(whether any row can match, whether rows must be checked against `host`)."""
+        overlaps = (start is None or self.max_ts >= start) and (end is None or self.min_ts < end)
+        if not overlaps or (host is not None and host not in self.dictionaries["host"]):
+            return False, False
+        return True, host is not None and self.dictionaries["host"] != [host]
+
+    def _block_rows(self, index: int, fields: Sequence[str], start, end, host, by_host: bool) -> Iterator[tuple]:
+        decoded = {}
+        positions = None
+        if not self.covers(self.blocks[index], start, end):
+            # rows are in time order within a block: the range is one run of positions
+            stamps = decoded["time_stamp"] = self.column(index, "time_stamp")
+            positions = range(
+                0 if start is None else bisect_left(stamps, start), len(stamps) if end is None else bisect_left(stamps, end)
+            )
+        if by_host:
+            hosts = decoded["host"] = self.column(index, "host")
+            positions = [row for row in (range(len(hosts)) if positions is None else positions) if hosts[row] == host]
+        if positions is not None:
+            if not positions:
+                return iter(())
+            decoded = {name: [values[row] for row in positions] for name, values in decoded.items()}
+        return zip(*(decoded[name] if name in decoded else self.column(index, name, positions) for name in fields))
+
+    def scan(self, fields: Sequence[str], start: int | None, end: int | None, host: str | None) -> Iterator[tuple]:
+        """`fields` of the rows within [start, end), of `host` if given, in (time_stamp, id) order."""
+        matches, by_host = self._filters(start, end, host)
+        if not matches:
+            return
+        for index in self.block_range(start, end):
+            yield from self._block_rows(index, fields, start, end, host, by_host)
+
+    def aggregate(self, metric: str, start: int | None, end: int | None, host: str | None) -> list:
+        """[count, sum, min, max] of `metric`; blocks wholly in range are answered from the footer."""
+        total = [0, 0, None, None]
+        matches, by_host = self._filters(start, end, host)
+        if not matches:
+            return total
+        for index in self.block_range(start, end):
+            block = self.blocks[index]
+            if not by_host and self.covers(block, start, end):
+                stats = block["stats"][metric]
+            else:
+                stats = _stats([value for (value,) in self._block_rows(index, (metric,), start, end, host, by_host)])
+            total = _merge_stats(total, stats)
+        return total
+
+    def get(self, record_id: int) -> tuple | None:
+        if not self.min_id <= record_id <= self.max_id:
+            return None
+        for index, block in enumerate(self.blocks):
+            if block["min_id"] <= record_id <= block["max_id"]:
+                ids = self.column(index, "id")
+                if record_id in ids:
+                    position = ids.index(record_id)
+                    return tuple(record_id if name == "id" else self.column(index, name, (position,))[0] for name in FIELDS)
+        return None
+
+class SegmentStore:
+    """
+    Embedded columnar store for raw samples: a directory of immutable segment files.
+
+    Each write becomes a segment of rows sorted on (time_stamp, id), stored
+    column by column in zlib-compressed blocks of `block_rows` rows. The
+    footer keeps every block's time and id range (a sparse index) and the
+    count/sum/min/max of each metric. Reads memory-map the files and
+    decompress only the blocks and columns a query touches; an aggregate over
+    whole blocks reads no column bytes at all. `fanout` segments of the same
+    size tier are merged into one, up to `max_rows`, so a stream of small
+    batches leaves a logarithmic number of files. Processes may share a
+    directory: writes hold an exclusive file lock, and a merged segment names
+    its sources so a reader never sees a row twice.
+    """
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        block_rows: int | None = None,
+        max_rows: int | None = None,
+        fanout: int | None = None,
+    ):
+        self.directory = Path(directory)
+        self.block_rows = block_rows or settings.SEGMENT_BLOCK_ROWS
+        self.max_rows = max_rows or settings.SEGMENT_MAX_ROWS
+        self.fanout = max(2, fanout or settings.SEGMENT_FANOUT)
+        self.bytes_read: Counter = Counter() # compressed bytes decoded, per column
+        self.merges = 0
+        self._segments: dict[str, Segment | None] = {} # open segments by file name, None if unreadable
+        self._mutex = threading.Lock() # `_segments` is shared by the to_thread workers
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive lock on the directory, across processes."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / LOCK_FILE, "a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _load(self) -> list[Segment]:
+        if not self.directory.is_dir():
+            return []
+        names = sorted(path.name for path in self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+        with self._mutex:
+            for name in names:
+                if name not in self._segments:
+                    try:
+                        self._segments[name] = Segment(self.directory / name, self.bytes_read)
+                    except FileNotFoundError:
+                        raise
+                    except Exception as e: # e.g. cut short by a crash before it was renamed into place
+                        logger.error(f"Skipping unreadable segment {self.directory / name}: {e}")
+                        self._segments[name] = None
+            for name in self._segments.keys() - set(names):
+                del self._segments[name]
+            segments = [segment for name in names if (segment := self._segments[name]) is not None]
+        replaced = {source for segment in segments for source in segment.sources}
+        return [segment for segment in segments if segment.name not in replaced]
+
+    def segments(self) -> list[Segment]:
+        """The current segments, oldest first, without the ones a merge has replaced."""
+        for _ in range(3):
+            try:
+                return self._load()
+            except FileNotFoundError: # merged away between listing and opening
+                continue
+        return self._load()
+
+    def _state(self, segments: list[Segment]) -> dict:
+        path = self.directory / STATE_FILE
+        if path.exists():
+            return json.loads(path.read_text())
+        # first write, or the state file was lost: carry on after what the segments hold
+        return {
+            "next_id": max((segment.max_id for segment in segments), default=0) + 1,
+            "next_segment": max((int(Path(segment.name).stem) for segment in segments), default=0) + 1,
+        }
+
+    def _save_state(self, state: dict) -> None:
+        temp = self.directory / f"{STATE_FILE}.tmp"
+        temp.write_text(json.dumps(state))
+        os.replace(temp, self.directory / STATE_FILE)
+
+    def _write(self, rows: list[tuple], state: dict, sources: Sequence[str] = ()) -> None:
+        name = f"{state['next_segment']:012d}{SEGMENT_SUFFIX}"
+        state["next_segment"] += 1
+        self._save_state(state) # before the segment, so a crash can skip ids but never reuse them
+        write_segment(self.directory / name, rows, self.block_rows, sources)
+
+    def _remove_replaced(self, live: list[Segment]) -> None:
+        """Delete merge sources left behind by a crash between a merge and its cleanup."""
+        names = {segment.name for segment in live}
+        with self._mutex:
+            leftovers = [name for name, segment in self._segments.items() if segment is not None and name not in names]
+        for name in leftovers:
+            (self.directory / name).unlink(missing_ok=True)
+
+    def _tier(self, rows: int) -> int:
+        tier = 0
+        while rows >= self.fanout ** (tier + 1):
+            tier += 1
+        return tier
+
+    def _compact(self, state: dict) -> None:
+        """Merge `fanout` segments of one size tier until no tier is full; segments of `max_rows` are final."""
+        while True:
+            tiers: dict[int, list[Segment]] = {}
+            for segment in self.segments():
+                if segment.rows < self.max_rows:
+                    tiers.setdefault(self._tier(segment.rows), []).append(segment)
+            group = next((group for _, group in sorted(tiers.items()) if len(group) >= self.fanout), None)
+            if group is None:
+                return
+            rows = list(heapq.merge(*(segment.scan(FIELDS, None, None, None) for segment in group), key=KEY))
+            sources = [segment.name for segment in group]
+            for first in range(0, len(rows), self.max_rows):
+                self._write(rows[first:first + self.max_rows], state, sources)
+            for name in sources:
+                (self.directory / name).unlink(missing_ok=True)
+            self.merges += 1
+
+    def append(self, samples: Sequence[MetricSample]) -> list[int]:
+        """Store a batch as a new segment, merging segments as needed; returns the ids given to the samples."""
+        if not samples:
+            return []
+        with self._locked():
+            segments = self.segments()
+            self._remove_replaced(segments)
+            state = self._state(segments)
+            first = state["next_id"]
+            state["next_id"] += len(samples)
+            rows = sorted((to_row(sample, first + offset) for offset, sample in enumerate(samples)), key=KEY)
+            self._write(rows, state)
+            self._compact(state)
+        return list(range(first, first + len(samples)))
+
+    def _merged(self, fields: Sequence[str], start: int | None, end: int | None, host: str | None) -> Iterator[tuple]:
+        # segments overlap in time once late samples arrive, so their sorted runs are merged
+        key = KEY if fields[1] == "id" else itemgetter(0)
+        return heapq.merge(*(segment.scan(fields, start, end, host) for segment in self.segments()), key=key)
+
+    def rows(
+        self,
+        start: datetime | str | None = None,
+        end: datetime | str | None = None,
+        host: str | None = None,
+        after: tuple[datetime, int] | None = None,
+    ) -> Iterator[tuple]:
+        """Full rows within [start, end) in (time_stamp, id) order, after the (time_stamp, id) key `after`."""
+        start, end = _ns(start), _ns(end)
+        if after is not None:
+            after = (to_ns(after[0]), after[1])
+            start = after[0] if start is None else max(start, after[0])
+        rows = self._merged(FIELDS, start, end, host)
+        return rows if after is None else dropwhile(lambda row: KEY(row) <= after, rows)
+
+    def get(self, record_id: int) -> tuple | None:
+        for segment in self.segments():
+            row = segment.get(record_id)
+            if row is not None:
+                return row
+        return None
+
+    @staticmethod
+    def _check_metric(metric: str) -> None:
+        if metric not in VALUE_TYPES:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {list(VALUE_TYPES)}")
+
+    def column(
+        self, metric: str, start: datetime | str | None = None, end: datetime | str | None = None, host: str | None = None
+    ) -> list[tuple[int, float | int | None]]:
+        """(epoch ns, value) of one metric within [start, end), in time order; reads no other metric's bytes."""
+        self._check_metric(metric)
+        return list(self._merged(("time_stamp", metric), _ns(start), _ns(end), host))
+
+    def aggregate(
+        self, metric: str, start: datetime | str | None = None, end: datetime | str | None = None, host: str | None = None
+    ) -> dict:
+        """count/sum/min/max/avg of one metric within [start, end), NULLs left out."""
+        self._check_metric(metric)
+        start, end = _ns(start), _ns(end)
+        total = [0, 0, None, None]
+        for segment in self.segments():
+            total = _merge_stats(total, segment.aggregate(metric, start, end, host))
+        count, value_sum, low, high = total
+        return {"count": count, "sum": value_sum, "min": low, "max": high, "avg": value_sum / count if count else None}
+
+    def drop_before(self, cutoff: datetime | str) -> int:
+        """Delete the segments whose rows are all older than `cutoff`; returns the rows dropped."""
+        cutoff = to_ns(cutoff)
+        dropped = 0
+        with self._locked():
+            segments = self.segments()
+            self._remove_replaced(segments)
+            for segment in segments:
+                if segment.max_ts < cutoff:
+                    (self.directory / segment.name).unlink(missing_ok=True)
+                    dropped += segment.rows
+        return dropped
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        return {
+            "segments": len(segments),
+            "rows": sum(segment.rows for segment in segments),
+            "bytes": sum(len(segment.view) for segment in segments),
+            "merges": self.merges,
+            "bytes_read": dict(self.bytes_read),
+        }
+
+def _records(rows: Iterator[tuple], limit: int | None) -> list[MetricsModel]:
+    return [to_record(row) for row in islice(rows, limit)]
+
+class SegmentStorage(Storage):
+    """
+    `Storage` over an embedded `SegmentStore` instead of a database (`STORAGE_BACKEND=segments`).
+
+    Same methods and results as `Storage`, records come back as detached
+    `MetricsModel` instances. The `db` arguments are accepted and ignored.
+    File work runs in a worker thread, off the event loop.
+    """
+    def __init__(self, directory: str | os.PathLike | None = None, **options):
+        self.store = SegmentStore(directory or settings.SEGMENT_DIR, **options)
+
+    async def save_to_db(self, sample: MetricSample, db=None):
+        await self.save_many_to_db([sample], db)
+
+    async def save_many_to_db(self, items: list[MetricSample], db=None) -> list[int]:
+        if not items:
+            return []
+        try:
+            ids = await asyncio.to_thread(self.store.append, items)
+            logger.info(f"{len(ids)} records saved to segments")
+            return ids
+        except Exception as e:
+            logger.error(f"Segment store error: {e}")
+            return []
+
+    async def copy_to_db(self, items: list[MetricSample], db=None) -> int:
+        return len(await self.save_many_to_db(items, db))
+
+    async def get_data_from_db(
+        self,
+        db=None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        limit: int | None = None,
+        after: tuple[datetime, int] | None = None,
+        host: str | None = None
+    ):
+        try:
+            rows = await asyncio.to_thread(self.store.rows, start, end, host, after)
+            return await asyncio.to_thread(_records, rows, limit)
+        except Exception as e:
+            logger.error(f'Error fetching data from segments: {e}')
+            return []
+
+    async def get_latest_from_db(self, db, start: datetime, limit: int, host: str | None = None):
+        try:
+            rows = await asyncio.to_thread(lambda: deque(self.store.rows(start, None, host), maxlen=limit))
+            return await asyncio.to_thread(_records, iter(rows), None)
+        except Exception as e:
+            logger.error(f'Error fetching latest data from segments: {e}')
+            return []
+
+    async def stream_data_from_db(
+        self,
+        db=None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        chunk_size: int = 1000,
+        host: str | None = None
+    ) -> AsyncIterator[Sequence[MetricsModel]]:
+        rows = await asyncio.to_thread(self.store.rows, start, end, host)
+        while True:
+            chunk = await asyncio.to_thread(_records, rows, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    async def get_record_from_db(self, db, record_id: int):
+        row = await asyncio.to_thread(self.store.get, record_id)
+        if row is None:
+            logger.warning("record could not be retrieved!")
+            return None
+        logger.info("Record has been retrieved!")
+        return to_record(row)
+
+    async def aggregate(self, metric: str, start=None, end=None, host: str | None = None) -> dict:
+        return await asyncio.to_thread(self.store.aggregate, metric, start, end, host)
+
+    async def drop_before(self, cutoff: datetime) -> int:
+        dropped = await asyncio.to_thread(self.store.drop_before, cutoff)
+        if dropped:
+            logger.info(f"Dropped {dropped} rows in whole segments before {cutoff}")
+        return dropped
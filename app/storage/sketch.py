@@ -0,0 +1,163 @@
+# Built-in imports
+import math
+import struct
+
+# local imports
+from app.config import settings
+
+# version, relative accuracy, count, min, max, sum
+HEADER = struct.Struct("<BdQddd")
+VERSION = 1
+
+# below this magnitude a value is counted as zero
+MIN_VALUE = 1e-9
+
+def _put_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+class DDSketch:
+    """
+    Quantile sketch with a relative error bound (DDSketch, Masson et al., 2019).
+
+    Values are counted in logarithmic bins of ratio gamma = (1 + a) / (1 - a),
+    so any quantile is returned within `relative_accuracy` (a) of the exact
+    value of that rank: at a = 0.01, a p99 of 80 % CPU reads 79.2..80.8.
+    Sketches with the same accuracy merge exactly by adding bin counts,
+    across buckets and hosts alike. Size grows with log(max / min) of the
+    values, not with their count; past `max_bins` the lowest bins are
+    collapsed, which only coarsens the lowest quantiles.
+    """
+    __slots__ = ("relative_accuracy", "max_bins", "_multiplier", "_gamma", "positive", "negative",
+                 "zero_count", "count", "min", "max", "sum")
+
+    def __init__(self, relative_accuracy: float | None = None, max_bins: int | None = None):
+        self.relative_accuracy = settings.SKETCH_RELATIVE_ACCURACY if relative_accuracy is None else relative_accuracy
+        if not 0 < self.relative_accuracy < 1:
+            raise ValueError("relative_accuracy must be between 0 and 1")
+        self.max_bins = settings.SKETCH_MAX_BINS if max_bins is None else max_bins
+        self._gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        self._multiplier = 1 / math.log(self._gamma)
+        self.positive: dict[int, int] = {}
+        self.negative: dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.sum = 0.0
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) * self._multiplier)
+
+    def _value(self, key: int) -> float:
+        # the bin (gamma^(key-1), gamma^key] is represented by the point within a of both ends
+        return 2 * self._gamma ** key / (1 + self._gamma)
+
+    def add(self, value: float, count: int = 1) -> None:
+        if value > MIN_VALUE:
+            store, key = self.positive, self._key(value)
+        elif value < -MIN_VALUE:
+            store, key = self.negative, self._key(-value)
+        else:
+            store = None
+            self.zero_count += count
+        if store is not None:
+            store[key] = store.get(key, 0) + count
+            if len(store) > self.max_bins:
+                self._collapse(store)
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def _collapse(self, store: dict[int, int]) -> None:
+        """Fold the lowest bins into one so at most `max_bins` remain."""
+        keys = sorted(store)
+        excess = keys[:len(keys) - self.max_bins + 1]
+        target = excess[-1]
+        for key in excess[:-1]:
+            store[target] += store.pop(key)
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        """Add the counts of `other` into this sketch and return it."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches of different relative accuracy")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+            if len(store) > self.max_bins:
+                self._collapse(store)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float | None:
+        """Value at quantile `q` (0..1), None for an empty sketch."""
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        if self.count == 0:
+            return None
+        if q == 0 or q == 1: # tracked exactly
+            return self.min if q == 0 else self.max
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._value(key), self.max)
+        return self.max
+
+    def to_bytes(self) -> bytes:
+        """Compact encoding: a fixed header, then each store's bins as varint key deltas and counts."""
+        out = bytearray(HEADER.pack(VERSION, self.relative_accuracy, self.count, self.min, self.max, self.sum))
+        _put_varint(out, self.zero_count)
+        for store in (self.negative, self.positive):
+            _put_varint(out, len(store))
+            previous = 0
+            for key in sorted(store):
+                delta = key - previous
+                _put_varint(out, delta << 1 if delta >= 0 else (-delta << 1) - 1) # zigzag
+                _put_varint(out, store[key])
+                previous = key
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes, max_bins: int | None = None) -> "DDSketch":
+        version, relative_accuracy, count, min_value, max_value, total = HEADER.unpack_from(data)
+        if version != VERSION:
+            raise ValueError(f"Unsupported sketch version {version}")
+        sketch = cls(relative_accuracy, max_bins)
+        sketch.count, sketch.min, sketch.max, sketch.sum = count, min_value, max_value, total
+        sketch.zero_count, pos = _get_varint(data, HEADER.size)
+        for store in (sketch.negative, sketch.positive):
+            size, pos = _get_varint(data, pos)
+            key = 0
+            for _ in range(size):
+                delta, pos = _get_varint(data, pos)
+                key += delta >> 1 if not delta & 1 else -((delta + 1) >> 1)
+                store[key], pos = _get_varint(data, pos)
+        return sketch
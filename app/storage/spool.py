@@ -0,0 +1,202 @@
+# Built-in imports
+from pathlib import Path
+from typing import Awaitable, Callable
+import mmap
+import os
+import struct
+import zlib
+
+# local imports
+from app.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# payload length, CRC-32 of the payload
+FRAME = struct.Struct("<II")
+SEGMENT_SUFFIX = ".seg"
+ACK_FILE = "ack"
+
+class Spool:
+    """
+    Append-only on-disk queue for samples a sink could not take.
+
+    Records are framed as (length, CRC-32, payload) and appended to segment
+    files named after the offset of their first byte; offsets only grow.
+    Reads map a segment with `mmap` and walk the frames without copying the
+    file into memory. `ack(offset)` persists the replay position and deletes
+    the segments before it, so a restart resumes from the last acknowledged
+    record. A torn record at the tail (crash mid-write) is truncated on
+    open; a corrupt record elsewhere ends its segment. Past `max_bytes` of
+    unacknowledged data the oldest segment is dropped.
+
+    Nothing touches the disk until the first append.
+    """
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        segment_bytes: int | None = None,
+        max_bytes: int | None = None,
+        fsync: bool | None = None,
+    ):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes or settings.SPOOL_SEGMENT_BYTES
+        self.max_bytes = max_bytes or settings.SPOOL_MAX_BYTES
+        self.fsync = settings.SPOOL_FSYNC if fsync is None else fsync
+        self._segments: list[int] = [] # base offsets, oldest first
+        self._end = 0 # offset after the last record
+        self._acked = 0 # offset after the last acknowledged record
+        self._opened = False
+        self._roll = False # start a new segment on the next append
+        self.appended = 0
+        self.replayed = 0
+        self.dropped_bytes = 0
+
+    def _path(self, base: int) -> Path:
+        return self.directory / f"{base:020d}{SEGMENT_SUFFIX}"
+
+    def _open(self) -> None:
+        """Load the segments and ack offset left by an earlier run, repairing a torn tail."""
+        if self._opened:
+            return
+        self._opened = True
+        if not self.directory.is_dir():
+            return
+        self._segments = sorted(int(path.stem) for path in self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+        ack = self.directory / ACK_FILE
+        if ack.exists():
+            self._acked = int(ack.read_text() or 0)
+        if self._segments:
+            last = self._segments[-1]
+            path = self._path(last)
+            size = path.stat().st_size
+            valid = self._scan(last, 0, None)[1] - last
+            self._end = last + size
+            if valid < size and self._torn(path, valid, size):
+                logger.warning(f"Truncating {size - valid} torn bytes at the end of spool segment {path}")
+                os.truncate(path, valid)
+                self._end = last + valid
+            elif valid < size: # corrupt, not torn: leave it for `read` to skip and append elsewhere
+                logger.error(f"Spool segment {path} has a corrupt record at byte {valid}")
+                self._roll = True
+        self._end = max(self._end, self._acked)
+
+    @staticmethod
+    def _torn(path: Path, position: int, size: int) -> bool:
+        """Whether the bytes from `position` are a record cut short by a crash: a frame reaching past the end."""
+        if size - position < FRAME.size:
+            return True
+        with open(path, "rb") as file:
+            file.seek(position)
+            length, _ = FRAME.unpack(file.read(FRAME.size))
+        return position + FRAME.size + length > size
+
+    def _scan(self, base: int, position: int, limit: int | None, out: list[bytes] | None = None) -> tuple[int, int]:
+        """Walk the frames of one segment from `position`; returns (records, offset after the last good one)."""
+        count = 0
+        with open(self._path(base), "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return 0, base
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                size = len(view)
+                while position + FRAME.size <= size and (limit is None or count < limit):
+                    length, crc = FRAME.unpack_from(view, position)
+                    start = position + FRAME.size
+                    if start + length > size:
+                        break
+                    payload = view[start:start + length]
+                    if zlib.crc32(payload) != crc:
+                        break
+                    if out is not None:
+                        out.append(payload)
+                    count += 1
+                    position = start + length
+        return count, base + position
+
+    def _segment_end(self, index: int) -> int:
+        return self._segments[index + 1] if index + 1 < len(self._segments) else self._end
+
+    def append(self, payloads: list[bytes]) -> int:
+        """Append records, returning the offset after them."""
+        if not payloads:
+            return self._end
+        self._open()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if not self._segments or self._roll or self._end - self._segments[-1] >= self.segment_bytes:
+            self._segments.append(self._end)
+            self._roll = False
+        data = b"".join(FRAME.pack(len(payload), zlib.crc32(payload)) + payload for payload in payloads)
+        with open(self._path(self._segments[-1]), "ab") as file:
+            file.write(data)
+            file.flush()
+            if self.fsync:
+                os.fsync(file.fileno())
+        self._end += len(data)
+        self.appended += len(payloads)
+        while self.pending() > self.max_bytes and len(self._segments) > 1:
+            dropped = self._segments[1] - max(self._acked, self._segments[0])
+            self.dropped_bytes += dropped
+            logger.warning(f"Spool over {self.max_bytes} bytes, dropping its oldest {dropped} bytes")
+            self.ack(self._segments[1])
+        return self._end
+
+    def read(self, max_records: int) -> tuple[list[bytes], int]:
+        """Up to `max_records` unacknowledged records and the offset to `ack` once they are handled."""
+        self._open()
+        records: list[bytes] = []
+        offset = self._acked
+        for index, base in enumerate(self._segments):
+            end = self._segment_end(index)
+            if end <= offset:
+                continue
+            count, position = self._scan(base, offset - base, max_records - len(records), records)
+            if len(records) >= max_records:
+                return records, position
+            if position < end: # a corrupt record: the rest of the segment can't be framed
+                logger.error(f"Skipping {end - position} unreadable bytes in spool segment {self._path(base)}")
+                self.dropped_bytes += end - position
+            offset = end
+        return records, offset
+
+    def ack(self, offset: int) -> None:
+        """Persist `offset` as replayed and delete the segments wholly before it."""
+        self._open()
+        self._acked = max(self._acked, min(offset, self._end))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temp = self.directory / f"{ACK_FILE}.tmp"
+        temp.write_text(str(self._acked))
+        os.replace(temp, self.directory / ACK_FILE)
+        while self._segments and self._segment_end(0) <= self._acked and (len(self._segments) > 1 or self._acked == self._end):
+            self._path(self._segments.pop(0)).unlink(missing_ok=True)
+
+    def pending(self) -> int:
+        """Bytes appended but not yet acknowledged."""
+        self._open()
+        return self._end - self._acked
+
+    async def replay(self, write: Callable[[list[bytes]], Awaitable[bool]], batch_size: int | None = None) -> int:
+        """
+        Hand the spooled records to `write` in batches, oldest first, acking
+        each batch it accepts; stops at the first batch it refuses (the sink
+        is still down). Returns the number of records replayed.
+        """
+        batch_size = batch_size or settings.SPOOL_REPLAY_BATCH
+        replayed = 0
+        while self.pending():
+            records, offset = self.read(batch_size)
+            if records and not await write(records):
+                break
+            self.ack(offset)
+            replayed += len(records)
+        if replayed:
+            self.replayed += replayed
+            logger.info(f"Replayed {replayed} spooled records from {self.directory}")
+        return replayed
+
+    def stats(self) -> dict:
+        return {
+            "pending_bytes": self.pending(),
+            "appended": self.appended,
+            "replayed": self.replayed,
+            "dropped_bytes": self.dropped_bytes,
+        }
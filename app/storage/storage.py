@@ -3,31 +3,37 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.future import select
+from sqlalchemy import insert, tuple_
 
 # Built-in imports
+from datetime import datetime, timezone
 import json
+from typing import AsyncIterator, Sequence
 
 # local imports
 from app.config import settings
 from app.utils.logger import get_logger
 from app.models.models import MetricsModel
+from app.models.sample import MetricSample
 
 logger = get_logger(__name__)
 
+def to_naive_utc(value: datetime | str) -> datetime:
+    """Normalise a timestamp to the naive UTC datetimes stored in the DB."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 class Storage:
     def __init__(self):
         pass
     
-    async def save_to_db(self, data: dict, db: AsyncSession):
+    async def save_to_db(self, sample: MetricSample, db: AsyncSession):
         try:
-            record = MetricsModel(
-                time_stamp = data['time_stamp'],
-                cpu_percent = float(data['cpu_percent']),
-                memory = json.dumps(data['memory']),
-                disk = json.dumps(data['disk']),
-                net_io = json.dumps(data['net_io'])
-            )
-            await db.add(record)
+            record = MetricsModel(**sample.to_row())
+            db.add(record)
             await db.commit()
             logger.info(f"Record saved to DB")
         except SQLAlchemyError as e:
@@ -37,14 +43,120 @@ class Storage:
             await db.rollback()
             logger.error(f"Unexpected error: {e}")
     
-    async def get_data_from_db(self, db: AsyncSession):
+    async def save_many_to_db(self, items: list[MetricSample], db: AsyncSession) -> list[int]:
+        """Insert a batch as one multi-row INSERT in a single transaction, returning the new ids in order."""
+        if not items:
+            return []
+        try:
+            rows = [item.to_row() for item in items]
+            result = await db.execute(
+                insert(MetricsModel).returning(MetricsModel.id, sort_by_parameter_order=True),
+                rows
+            )
+            ids = list(result.scalars().all())
+            await db.commit()
+            logger.info(f"{len(ids)} records saved to DB")
+            return ids
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Database error: {e}")
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Unexpected error: {e}")
+        return []
+    
+    async def copy_to_db(self, items: list[MetricSample], db: AsyncSession) -> int:
+        """Bulk load a batch with COPY on asyncpg, falling back to a multi-row INSERT elsewhere. Ids are not returned."""
+        if not items:
+            return 0
+        try:
+            conn = await db.connection() # raises while the database is unreachable
+            if conn.dialect.driver != "asyncpg":
+                return len(await self.save_many_to_db(items, db))
+            rows = [item.to_row() for item in items]
+            columns = list(rows[0])
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                MetricsModel.__tablename__,
+                # asyncpg's json codec takes text, SQLAlchemy serialises JSON columns only on INSERT
+                records=[tuple(json.dumps(row[c]) if c == "tags" and row[c] is not None else row[c] for c in columns) for row in rows],
+                columns=columns
+            )
+            await db.commit()
+            logger.info(f"{len(rows)} records copied to DB")
+            return len(rows)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"COPY failed: {e}")
+            return 0
+    
+    @staticmethod
+    def _range_query(start: datetime | None, end: datetime | None, host: str | None = None):
+        query = select(MetricsModel).order_by(MetricsModel.time_stamp, MetricsModel.id)
+        if host is not None: # served by the (host, time_stamp, id) index
+            query = query.where(MetricsModel.host == host)
+        if start is not None:
+            query = query.where(MetricsModel.time_stamp >= to_naive_utc(start))
+        if end is not None:
+            query = query.where(MetricsModel.time_stamp < to_naive_utc(end))
+        return query
+    
+    async def get_data_from_db(
+        self,
+        db: AsyncSession,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        limit: int | None = None,
+        after: tuple[datetime, int] | None = None,
+        host: str | None = None
+    ):
+        """
+        Records ordered by (time_stamp, id) within [start, end).
+
+        `after` is the (time_stamp, id) of the last row of the previous page;
+        seeking past it on the composite index keeps every page equally cheap.
+        `host` narrows the result to one host.
+        """
         try:
-            result = await db.execute(select(MetricsModel))
+            query = self._range_query(start, end, host)
+            if after is not None:
+                after_ts, after_id = after
+                query = query.where(tuple_(MetricsModel.time_stamp, MetricsModel.id) > tuple_(to_naive_utc(after_ts), after_id))
+            if limit is not None:
+                query = query.limit(limit)
+            result = await db.execute(query)
             return result.scalars().all()
         except Exception as e:
             logger.error(f'Error fetching data from DB: {e}')
             return []
     
+    async def get_latest_from_db(self, db: AsyncSession, start: datetime, limit: int, host: str | None = None):
+        """The newest `limit` records from `start` on, oldest first."""
+        try:
+            query = select(MetricsModel).where(MetricsModel.time_stamp >= to_naive_utc(start))
+            if host is not None:
+                query = query.where(MetricsModel.host == host)
+            query = query.order_by(MetricsModel.time_stamp.desc(), MetricsModel.id.desc()).limit(limit)
+            result = await db.execute(query)
+            return result.scalars().all()[::-1]
+        except Exception as e:
+            logger.error(f'Error fetching latest data from DB: {e}')
+            return []
+
+    async def stream_data_from_db(
+        self,
+        db: AsyncSession,
+        start: datetime | None = None,
+        end: datetime | None = None,
+        chunk_size: int = 1000,
+        host: str | None = None
+    ) -> AsyncIterator[Sequence[MetricsModel]]:
+        """Yield records within [start, end) in chunks read from a server-side cursor."""
+        query = self._range_query(start, end, host).execution_options(yield_per=chunk_size)
+        result = await db.stream_scalars(query)
+        async for chunk in result.partitions():
+            yield chunk
+    
     async def get_record_from_db(self, db: AsyncSession, record_id: int):
         result = await db.execute(select(MetricsModel).where(MetricsModel.id == record_id))
         record = result.scalar_one_or_none()
@@ -54,4 +166,15 @@ class Storage:
         logger.info("Record has been retrieved!")
         return record
     
-storage = Storage()
\ No newline at end of file
+BACKENDS = ("sql", "segments")
+
+def create_storage() -> Storage:
+    """The raw-sample backend named by `STORAGE_BACKEND`."""
+    if settings.STORAGE_BACKEND not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{settings.STORAGE_BACKEND}', expected one of {BACKENDS}")
+    if settings.STORAGE_BACKEND == "segments":
+        from app.storage.segments import SegmentStorage # subclasses Storage, so it imports this module
+        return SegmentStorage()
+    return Storage()
+
+storage = create_storage()
\ No newline at end of file
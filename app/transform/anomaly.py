@@ -0,0 +1,144 @@
+# Built-in imports
+from datetime import timezone
+from typing import Dict, Iterable, List
+import math
+
+# local imports
+from app.config import settings
+from app.models.models import STORED_COLUMNS
+from app.models.sample import MetricSample
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# sample fields a detector can watch
+METRICS = ("cpu_percent", *STORED_COLUMNS)
+
+def parse_thresholds(text: str) -> dict[str, tuple[float, float]]:
+    """Parse `metric=fire:clear,...` static thresholds; `metric=fire` clears at the same value."""
+    thresholds = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, sep, limits = part.partition("=")
+        if not sep:
+            raise ValueError(f"Expected metric=fire:clear, got '{part}'")
+        fire, _, clear = limits.partition(":")
+        fire = float(fire)
+        clear = float(clear) if clear else fire
+        if clear > fire:
+            raise ValueError(f"Clear level of '{name.strip()}' is above its fire level")
+        thresholds[name.strip()] = (fire, clear)
+    return thresholds
+
+def parse_metrics(text: str) -> list[str]:
+    return [name.strip() for name in text.split(",") if name.strip()]
+
+class SeriesState:
+    """Constant-size rolling state of one (host, metric) series."""
+    __slots__ = ("count", "mean", "var", "z_firing", "threshold_firing")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.z_firing = False
+        self.threshold_firing = False
+
+class AnomalyDetector:
+    """
+    Streaming anomaly detection on transformed samples, O(1) per value.
+
+    Keeps an exponentially weighted mean and variance per host and metric
+    and scores each value against the statistics before it (z-score), after
+    `warmup` values. Static thresholds fire at `fire` and clear below
+    `clear`, the z-score fires at `z_threshold` and clears below `z_clear`,
+    so a value hovering at a limit does not flap. Only state changes come
+    out as alert events; None values (a degraded sample) are skipped.
+    """
+    def __init__(
+        self,
+        metrics: str | Iterable[str] | None = None,
+        thresholds: str | Dict[str, tuple] | None = None,
+        alpha: float | None = None,
+        z_threshold: float | None = None,
+        z_clear: float | None = None,
+        warmup: int | None = None,
+    ):
+        metrics = settings.ALERT_METRICS if metrics is None else metrics
+        thresholds = settings.ALERT_THRESHOLDS if thresholds is None else thresholds
+        self.metrics = tuple(parse_metrics(metrics) if isinstance(metrics, str) else metrics)
+        self.thresholds = parse_thresholds(thresholds) if isinstance(thresholds, str) else dict(thresholds)
+        unknown = (set(self.metrics) | set(self.thresholds)) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown alert metric(s) {sorted(unknown)}, expected some of {list(METRICS)}")
+        self.alpha = settings.ALERT_EWMA_ALPHA if alpha is None else alpha
+        self.z_threshold = settings.ALERT_Z_THRESHOLD if z_threshold is None else z_threshold
+        self.z_clear = settings.ALERT_Z_CLEAR if z_clear is None else z_clear
+        self.warmup = settings.ALERT_WARMUP if warmup is None else warmup
+        # every metric that needs state, z-scored ones first
+        self.watched = self.metrics + tuple(name for name in self.thresholds if name not in self.metrics)
+        self.state: Dict[tuple, SeriesState] = {}
+        self.fired = 0
+
+    def observe(self, sample: MetricSample) -> List[dict]:
+        """Update the rolling state with one sample and return the alert events it raised or resolved."""
+        events = []
+        host = sample.host or ""
+        for metric in self.watched:
+            value = getattr(sample, metric)
+            if value is None:
+                continue
+            key = (host, metric)
+            state = self.state.get(key)
+            if state is None:
+                state = self.state[key] = SeriesState()
+            limits = self.thresholds.get(metric)
+            if limits is not None:
+                firing = value >= (limits[1] if state.threshold_firing else limits[0])
+                if firing != state.threshold_firing:
+                    state.threshold_firing = firing
+                    events.append(self._event("threshold", firing, sample, metric, value, threshold=limits[0]))
+            if metric in self.metrics:
+                self._score(state, sample, metric, value, events)
+        self.fired += sum(event["state"] == "firing" for event in events)
+        return events
+
+    def observe_many(self, samples: Iterable[MetricSample]) -> List[dict]:
+        events = []
+        for sample in samples:
+            events.extend(self.observe(sample))
+        return events
+
+    def _score(self, state: SeriesState, sample: MetricSample, metric: str, value: float, events: list) -> None:
+        delta = value - state.mean
+        if state.count >= self.warmup and state.var > 0.0:
+            z = delta / math.sqrt(state.var)
+            firing = abs(z) >= (self.z_clear if state.z_firing else self.z_threshold)
+            if firing != state.z_firing:
+                state.z_firing = firing
+                events.append(self._event("zscore", firing, sample, metric, value, z=round(z, 3), mean=state.mean))
+        if state.count == 0:
+            state.mean = float(value)
+        else:
+            # exponentially weighted mean and variance (West, 1979)
+            state.mean += self.alpha * delta
+            state.var = (1.0 - self.alpha) * (state.var + self.alpha * delta * delta)
+        state.count += 1
+
+    @staticmethod
+    def _event(kind: str, firing: bool, sample: MetricSample, metric: str, value: float, **details) -> dict:
+        event = {
+            "type": kind,
+            "state": "firing" if firing else "resolved",
+            "host": sample.host,
+            "metric": metric,
+            "value": value,
+            "timestamp": sample.time_stamp.replace(tzinfo=timezone.utc).isoformat(),
+            **details,
+        }
+        log = logger.warning if firing else logger.info
+        log(f"Alert {event['state']}: {kind} on {sample.host or 'local'} {metric}={value}")
+        return event
+
+    def stats(self) -> dict:
+        firing = sum(state.z_firing or state.threshold_firing for state in self.state.values())
+        return {"series": len(self.state), "firing": firing, "fired": self.fired}
@@ -0,0 +1,130 @@
+# Third-party imports
+try:
+    import numpy as np
+except ImportError: # optional, only needed for the columnar batch transform
+    np = None
+
+# Built-in imports
+from typing import Any, Dict
+import warnings
+
+# local imports
+from app.models.models import STORED_COLUMNS
+from app.models.sample import GROUP_COLUMNS, to_ns
+from app.transform.rates import COUNTERS
+
+# nanoseconds per unit of numeric epoch timestamps
+TS_UNITS = {"s": 1_000_000_000, "ms": 1_000_000, "us": 1_000, "ns": 1}
+
+# gauges bounded to 0..100; every other stored value is a size, counter or rate and only bounded below
+PERCENT_COLUMNS = ("cpu_percent", *(column for column in STORED_COLUMNS if column.endswith("_percent")))
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("The columnar transform needs the 'numpy' package installed")
+
+def _parse_one(value: Any) -> int | None:
+    try:
+        return to_ns(value)
+    except Exception:
+        return None
+
+def timestamps_ns(values: Any, unit: str = "s") -> "tuple[np.ndarray, np.ndarray]":
+    """
+    Epoch nanoseconds of ISO 8601 strings, datetime64 values or numeric epochs in `unit`.
+
+    Returns (ts_ns, ok). Naive and UTC strings are parsed by NumPy in one
+    pass; a batch with other offsets or unparsable values falls back to
+    parsing element by element.
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in "iuf":
+        ok = np.isfinite(values)
+        return (np.where(ok, values, 0) * TS_UNITS[unit]).astype(np.int64), ok
+    if values.dtype.kind != "M":
+        text = np.char.replace(np.char.replace(values.astype(str), "+00:00", ""), "Z", "")
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", UserWarning) # NumPy's deprecated offset parsing
+                values = text.astype("datetime64[ns]")
+        except (ValueError, UserWarning): # another UTC offset, or garbage
+            parsed = [_parse_one(value) for value in values.tolist()]
+            ok = np.array([ts is not None for ts in parsed], dtype=bool)
+            return np.array([ts or 0 for ts in parsed], dtype=np.int64), ok
+    values = values.astype("datetime64[ns]")
+    ok = ~np.isnat(values)
+    return np.where(ok, values.astype(np.int64), 0), ok
+
+def counter_rates(
+    values: "np.ndarray", ts_ns: "np.ndarray", series: "np.ndarray", order: "np.ndarray | None" = None
+) -> "np.ndarray":
+    """
+    Per-second rates of a cumulative counter, `counter_delta` vectorised.
+
+    Rows are compared with the previous row of the same series in time
+    order (`order`, from `np.lexsort((ts_ns, series))`, can be shared by
+    the counters of one batch). The first row of a series, a reset and a
+    repeated timestamp give NaN. A batch has no memory of earlier batches.
+    """
+    rates = np.full(len(values), np.nan)
+    if order is None:
+        order = np.lexsort((ts_ns, series))
+    values, ts_ns, series = values[order], ts_ns[order], series[order]
+    previous, current = values[:-1], values[1:]
+    width = np.where(previous < 2.0 ** 32, 2.0 ** 32, 2.0 ** 64)
+    wrapped = (current < previous) & (previous >= width * 0.75) & (current < width * 0.25)
+    delta = np.where(current >= previous, current - previous, np.where(wrapped, width - previous + current, np.nan))
+    elapsed = (ts_ns[1:] - ts_ns[:-1]) / 1e9
+    same = (series[1:] == series[:-1]) & (elapsed > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates[order[1:]] = np.where(same, delta / elapsed, np.nan)
+    return rates
+
+def transform_columns(columns: Dict[str, Any], ts_unit: str = "s") -> "tuple[np.ndarray, Dict[str, np.ndarray]]":
+    """
+    Validate and clean a batch given as columns, in vectorised operations.
+
+    `columns` holds `timestamp` (ISO strings, datetime64 or numeric epochs in
+    `ts_unit`), `cpu_percent` and any of the stored columns (`mem_used`,
+    `net_bytes_sent`, …) as equal-length arrays, with NaN or None for
+    missing values; `host` and `degraded` are optional.
+
+    Returns a validity mask and the clean columns (`ts_ns` as int64, the
+    metrics as float64, all at full length so the mask indexes them). A row
+    is valid with a timestamp, a CPU value and, unless degraded, at least
+    one value of each memory/disk/net_io group; 0.0 is a value. Percentages
+    are clipped to 0..100 and other values to >= 0. Counter rates missing
+    from the input are derived within the batch, per host.
+    """
+    require_numpy()
+    ts_ns, mask = timestamps_ns(columns["timestamp"], ts_unit)
+    n = len(ts_ns)
+    clean: Dict[str, np.ndarray] = {"ts_ns": ts_ns}
+    for column in ("cpu_percent", *STORED_COLUMNS):
+        values = columns.get(column)
+        clean[column] = np.full(n, np.nan) if values is None else np.asarray(values, dtype=np.float64)
+
+    mask &= ~np.isnan(clean["cpu_percent"])
+    degraded = np.asarray(columns["degraded"], dtype=bool) if "degraded" in columns else np.zeros(n, dtype=bool)
+    for group_columns in GROUP_COLUMNS.values():
+        present = np.zeros(n, dtype=bool)
+        for column in group_columns:
+            present |= ~np.isnan(clean[column])
+        mask &= present | degraded
+
+    for column in ("cpu_percent", *STORED_COLUMNS):
+        if column in PERCENT_COLUMNS:
+            clean[column] = np.clip(clean[column], 0.0, 100.0)
+        else:
+            clean[column] = np.maximum(clean[column], 0.0)
+
+    hosts = np.asarray(columns["host"], dtype=object) if "host" in columns else np.full(n, "", dtype=object)
+    clean["host"] = hosts
+    valid = np.flatnonzero(mask)
+    _, series = np.unique(hosts[valid].astype(str), return_inverse=True)
+    order = np.lexsort((ts_ns[valid], series))
+    for column, rate_column in COUNTERS.items():
+        derived = counter_rates(clean[column][valid], ts_ns[valid], series, order)
+        given = clean[rate_column][valid]
+        clean[rate_column][valid] = np.where(np.isnan(given), derived, given)
+    return mask, clean
@@ -0,0 +1,90 @@
+# Built-in imports
+from typing import Dict
+
+# local imports
+from app.models.models import RATE_COLUMNS
+from app.models.sample import MetricSample
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# cumulative counter column -> the per-second rate column derived from it
+COUNTERS = {column.removesuffix("_rate"): column for column in RATE_COLUMNS}
+
+# per-device collector -> the cumulative counters of each device that get a `<key>_rate` next to them
+DEVICE_COUNTERS = {
+    "disk_io": ("read_bytes", "write_bytes"),
+    "per_nic": ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv"),
+}
+
+# widths a kernel or agent counter can wrap at
+COUNTER_LIMITS = (2 ** 32, 2 ** 64)
+
+def counter_delta(previous: int, current: int) -> int | None:
+    """
+    Increase of a cumulative counter, or None if it was reset.
+
+    A decrease is read as a wrap only when the counter fits a known width,
+    was in the top quarter of it and restarted in the bottom quarter; any
+    other decrease (reboot, interface re-created, agent restart without
+    psutil's nowrap state) is a reset.
+    """
+    if current >= previous:
+        return current - previous
+    for limit in COUNTER_LIMITS:
+        if previous < limit:
+            if previous >= limit * 3 // 4 and current < limit // 4:
+                return limit - previous + current
+            return None
+    return None
+
+class RateTracker:
+    """
+    Per-second rates of the cumulative counters in consecutive samples.
+
+    Keeps the previous (timestamp, value) per host and counter and sets the
+    matching `*_rate` field of the sample. The first sample, a counter
+    reset and an out-of-order timestamp give a None rate. `apply_devices`
+    does the same for the per-device groups, keyed per device.
+    """
+    def __init__(self, counters: Dict[str, str] | None = None):
+        self.counters = COUNTERS if counters is None else counters
+        self.previous: Dict[tuple, tuple] = {}
+        self.wraps = 0
+        self.resets = 0
+
+    def rate(self, counter: tuple, ts_ns: int, value: int) -> float | None:
+        previous = self.previous.get(counter)
+        if previous is not None and ts_ns <= previous[0]:
+            return None # duplicate or out-of-order sample, keep the newer baseline
+        self.previous[counter] = (ts_ns, value)
+        if previous is None:
+            return None
+        previous_ns, previous_value = previous
+        delta = counter_delta(previous_value, value)
+        if delta is None:
+            self.resets += 1
+            logger.warning(f"Counter {'.'.join(filter(None, counter))} reset ({previous_value} -> {value}), rate restarts")
+            return None
+        if value < previous_value:
+            self.wraps += 1
+        return delta * 1e9 / (ts_ns - previous_ns)
+
+    def apply(self, sample: MetricSample) -> MetricSample:
+        """Set the rate fields of `sample` in place and return it."""
+        for column, rate_column in self.counters.items():
+            value = getattr(sample, column)
+            if isinstance(value, int): # None when the group is missing from a degraded sample
+                setattr(sample, rate_column, self.rate((sample.host or "", column), sample.ts_ns, value))
+        return sample
+
+    def apply_devices(self, group: str, devices: dict, ts_ns: int, host: str | None = None) -> dict:
+        """Add `<key>_rate` next to the `DEVICE_COUNTERS` of every device of one group, in place, and return it."""
+        for device, values in devices.items():
+            if not isinstance(values, dict):
+                continue
+            for key in DEVICE_COUNTERS.get(group, ()):
+                value = values.get(key)
+                if isinstance(value, int):
+                    values[f"{key}_rate"] = self.rate((host or "", group, device, key), ts_ns, value)
+        return devices
@@ -1,49 +1,75 @@
 # Built-in imports
-from typing import Any, List, Dict
-from datetime import datetime, timezone
+from typing import Any, Dict, List
+import time
 
 # local imports
+from app.models.sample import MetricSample, to_ns
+from app.transform import columnar
+from app.transform.rates import RateTracker
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 class Transformer:
     """
-    Transforms and cleans data.
+    Transforms and cleans data into `MetricSample`s.
+
+    Stateful: valid items pass through a `RateTracker`, which adds per-second
+    rates of the cumulative counters, so one instance should see a host's
+    samples in order. `transform_columns` is the stateless batch path for
+    backfills and multi-host batches.
     """
     def __init__(self):
-        pass
+        self.rates = RateTracker()
     
-    def transform(self, data: Any) -> List[Dict[str, Any]]:
+    def transform(self, data: Any) -> List[MetricSample]:
         if not data:
             logger.warning("Warning: No data to transform.")
             return []
         clean_data = []
         for item in data:
             try:
-                cleaned = {
-                    "time_stamp": self.parse_datetime(item.get("timestamp")),
-                    "cpu_percent": item.get("cpu_percent"),
-                    "memory": item.get("memory"),
-                    "disk": item.get("disk"),
-                    "net_io": item.get("net_io")
-                }
+                sample = MetricSample.from_groups(
+                    self.parse_timestamp(item.get("timestamp")),
+                    item,
+                    host=item.get("host"),
+                    tags=item.get("tags") or None,
+                    # partial sample from a slow or failed collector
+                    missing=list(item.get("missing") or []) if item.get("degraded") else None
+                )
                 
-                if self.is_valid(cleaned):
-                    clean_data.append(cleaned)
+                if self.is_valid(sample):
+                    clean_data.append(self.rates.apply(sample))
                 else:
                     logger.warning("Warning: Item is not valid")
             except Exception as e:
                 logger.exception(f"Error: transforming item: {item}, Error: {e}")
         return clean_data
     
-    def parse_datetime(self, value: str) -> str:
+    def transform_columns(self, columns: Dict[str, Any], ts_unit: str = "s"):
+        """
+        Batch mode: validate and clean columns of NumPy arrays in vectorised
+        operations, returning (mask, clean columns). See
+        `columnar.transform_columns`; rates are derived within the batch and
+        the per-item rate state is left alone.
+        """
+        mask, clean = columnar.transform_columns(columns, ts_unit)
+        invalid = len(mask) - int(mask.sum())
+        if invalid:
+            logger.warning(f"Warning: {invalid} of {len(mask)} items are not valid")
+        return mask, clean
+    
+    def parse_timestamp(self, value: str) -> int:
+        """Epoch nanoseconds of an ISO 8601 timestamp, or of now if it does not parse."""
         try:
-            dt = datetime.fromisoformat(value)
-            return dt.isoformat()
+            return to_ns(value)
         except Exception as e:
             logger.warning(f"Warning: Failed to parse datetime from value: {value}")
-        return datetime.now(timezone.utc).isoformat()
+        return time.time_ns()
         
-    def is_valid(self, item: Dict[str, Any]) -> bool:
-        return bool(item['time_stamp'] and item['cpu_percent'] and item['memory'] and item['disk'] and item['net_io'])
\ No newline at end of file
+    def is_valid(self, sample: MetricSample) -> bool:
+        # a degraded sample may lack the groups it lists as missing, but never its timestamp or CPU
+        optional = set(sample.missing or []) - {"cpu_percent"}
+        return sample.ts_ns is not None and sample.cpu_percent is not None and all(
+            sample.has_group(group) for group in ("memory", "disk", "net_io") if group not in optional
+        )
@@ -0,0 +1,102 @@
+# Built-in imports
+import asyncio
+import json
+import signal
+
+# local imports
+from app.config import settings
+from app.ingest.stream import StreamConsumer
+from app.models.sample import MetricSample
+from app.pipeline import propagate_batch
+from app.storage.batch_writer import BatchWriter
+from app.storage.database import AsyncSessionLocal, engine, init_db
+from app.storage.redis_cache import CachePanel
+from app.storage.rollup import RollupEngine
+from app.storage.storage import create_storage
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+class StorageWorker:
+    """
+    Drains the ingest stream into the database: read a batch, bulk-write it,
+    then XACK it.
+
+    Run one per process (`python -m app.worker`) and start more to spread the
+    writes; the consumer group hands each entry to exactly one worker and
+    reclaims what a crashed worker left unacknowledged.
+    """
+    def __init__(self, consumer: StreamConsumer | None = None, session_factory=AsyncSessionLocal, cache: CachePanel | None = None):
+        self.consumer = consumer or StreamConsumer(settings.REDIS_URL)
+        self.storage = create_storage()
+        self.rollups = RollupEngine(session_factory)
+        self.cache = cache or CachePanel(settings.REDIS_URL)
+        self.writer = BatchWriter(
+            self.storage, session_factory, max_rows=self.consumer.batch_size, on_flush=self._after_flush
+        )
+        self.acked = 0
+        self.dropped = 0
+        self._stop = asyncio.Event()
+
+    async def _after_flush(self, items: list[MetricSample], ids: list[int]) -> None:
+        await propagate_batch(items, ids, self.rollups, self.cache)
+
+    async def run_batch(self) -> int:
+        """Store one batch from the stream; returns the number of entries acknowledged."""
+        entries = await self.consumer.read()
+        if not entries:
+            return 0
+        items, entry_ids = [], []
+        for entry_id, fields in entries:
+            entry_ids.append(entry_id)
+            try:
+                items.append(MetricSample.from_dict(json.loads(fields["data"])))
+            except Exception as e: # trimmed or malformed: retrying cannot help
+                self.dropped += 1
+                logger.error(f"Dropping unreadable stream entry {entry_id}: {e}")
+
+        failed = self.writer.failed
+        await self.writer.add_many(items)
+        await self.writer.flush()
+        if self.writer.failed > failed:
+            logger.error(f"Batch of {len(items)} not stored, leaving it pending for redelivery")
+            return 0
+        acked = await self.consumer.ack(entry_ids)
+        self.acked += acked
+        return acked
+
+    async def run(self) -> None:
+        await self.consumer.ensure_group()
+        logger.info(f"Storage worker '{self.consumer.consumer}' reading '{self.consumer.stream}'")
+        while not self._stop.is_set():
+            try:
+                await self.run_batch()
+            except Exception as e:
+                logger.error(f"Stream read failed: {e}")
+                await asyncio.sleep(1)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {"acked": self.acked, "dropped": self.dropped, **self.writer.stats()}
+
+async def main():
+    await init_db()
+    worker = StorageWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        await worker.run()
+    finally:
+        await worker.writer.close()
+        logger.info(f"Storage worker stopped: {worker.stats()}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,64 @@
+"""
+Cost of the anomaly detector per sample, next to the transform it follows,
+on synthetic samples from a few hosts with the default watched metrics and
+thresholds and occasional spikes:
+
+    python -m benchmarks.bench_anomaly [samples] [hosts]
+"""
+# Built-in imports
+import logging
+import random
+import sys
+import time
+
+# local imports
+from app.models.sample import MetricSample
+from app.transform.anomaly import AnomalyDetector
+from app.transform.transformer import Transformer
+
+SECOND = 1_000_000_000
+
+
+def make_samples(n: int, hosts: int) -> list[MetricSample]:
+    rng = random.Random(7)
+    samples = []
+    for i in range(n):
+        spike = 60.0 if rng.random() < 0.001 else 0.0
+        samples.append(MetricSample(
+            (i // hosts) * SECOND, 20.0 + rng.gauss(0, 3) + spike, host=f"host-{i % hosts}",
+            mem_percent=45.0 + rng.gauss(0, 1), disk_percent=44.5 + spike / 2,
+        ))
+    return samples
+
+
+def make_items(n: int) -> list[dict]:
+    return [
+        {"timestamp": f"2025-05-21T14:{i // 60 % 60:02d}:{i % 60:02d}+00:00", "cpu_percent": 20.0,
+         "memory": {"used": i, "percent": 45.0}, "disk": {"used": 5, "percent": 44.5}, "net_io": {"bytes_sent": 1000 * i}}
+        for i in range(n)
+    ]
+
+
+def main(n: int, hosts: int) -> None:
+    logging.disable(logging.WARNING)
+    samples = make_samples(n, hosts)
+    detector = AnomalyDetector()
+    start = time.perf_counter()
+    events = detector.observe_many(samples)
+    detect = (time.perf_counter() - start) / n
+
+    items = make_items(min(n, 100_000))
+    start = time.perf_counter()
+    Transformer().transform(items)
+    transform = (time.perf_counter() - start) / len(items)
+
+    print(f"samples={n} hosts={hosts} metrics={len(detector.watched)} events={len(events)} {detector.stats()}")
+    print(f"transform: {transform * 1e6:6.2f} µs/sample")
+    print(f"detector:  {detect * 1e6:6.2f} µs/sample ({detect / len(detector.watched) * 1e9:.0f} ns per metric)")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+    )
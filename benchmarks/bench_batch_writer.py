@@ -0,0 +1,87 @@
+"""
+Compare per-row commits (`Storage.save_to_db`) with `BatchWriter` bulk inserts.
+
+Runs against a throwaway SQLite file through aiosqlite:
+
+    python -m benchmarks.bench_batch_writer [rows] [batch_size]
+"""
+# Built-in imports
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# Third-party imports
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# local imports
+from app.models.models import Base
+from app.models.sample import MetricSample
+from app.storage.batch_writer import BatchWriter
+from app.storage.storage import Storage
+
+
+def make_items(n: int) -> list[MetricSample]:
+    return [
+        MetricSample.from_dict({
+            "time_stamp": f"2025-05-21T14:{(i // 60) % 60:02d}:{i % 60:02d}+00:00",
+            "cpu_percent": float(i % 100),
+            "memory": {"total": 16000, "used": 8000 + i % 100, "percent": 50.0},
+            "disk": {"total": 500000, "used": 250000, "percent": 50.0},
+            "net_io": {"bytes_sent": 1000 * i, "bytes_recv": 2000 * i},
+        })
+        for i in range(n)
+    ]
+
+
+async def make_session_factory(path: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def bench_per_row(path: str, items: list[MetricSample]) -> float:
+    engine, factory = await make_session_factory(path)
+    storage = Storage()
+    start = time.perf_counter()
+    async with factory() as session:
+        for item in items:
+            await storage.save_to_db(item, session)
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed
+
+
+async def bench_batched(path: str, items: list[MetricSample], batch_size: int) -> float:
+    engine, factory = await make_session_factory(path)
+    writer = BatchWriter(Storage(), factory, max_rows=batch_size, max_latency=60)
+    start = time.perf_counter()
+    for item in items:
+        await writer.add(item)
+    await writer.close()
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed
+
+
+async def main(rows: int, batch_size: int) -> None:
+    logging.disable(logging.INFO) # per-row logging would dominate the timings
+    items = make_items(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        per_row = await bench_per_row(path, items)
+        batched = await bench_batched(path, items, batch_size)
+    print(f"rows={rows} batch_size={batch_size}")
+    print(f"per-row commits : {per_row:8.3f} s  {rows / per_row:10.0f} rows/s")
+    print(f"batched inserts : {batched:8.3f} s  {rows / batched:10.0f} rows/s")
+    print(f"speedup         : {per_row / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    asyncio.run(main(rows, batch_size))
@@ -0,0 +1,40 @@
+"""
+Encoded size and encode/decode time per sample for each metrics-channel codec.
+
+    python -m benchmarks.bench_codec [iterations]
+"""
+# Built-in imports
+import sys
+import timeit
+
+# local imports
+from app.ingest.codec import CODECS, get_codec
+
+SAMPLE = {
+    "timestamp": "2025-05-21T14:00:00.123456+00:00",
+    "cpu_percent": 12.5,
+    "memory": {"total": 16_654_180_352, "available": 9_215_270_912, "percent": 44.7, "used": 6_764_961_792,
+               "free": 1_032_851_456, "active": 4_318_224_384, "inactive": 9_704_742_912, "buffers": 609_312_768,
+               "cached": 8_246_054_912, "shared": 1_053_929_472, "slab": 1_004_392_448},
+    "disk": {"total": 502_391_824_384, "used": 212_380_295_168, "free": 264_411_238_400, "percent": 44.5},
+    "net_io": {"bytes_sent": 1_234_567_890, "bytes_recv": 9_876_543_210, "packets_sent": 4_567_890,
+               "packets_recv": 7_890_123, "errin": 0, "errout": 0, "dropin": 12, "dropout": 0},
+}
+
+
+def main(iterations: int) -> None:
+    print(f"{'codec':8} {'bytes':>6} {'encode µs':>10} {'decode µs':>10}")
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except RuntimeError as e:
+            print(f"{name:8} skipped: {e}")
+            continue
+        payload = codec.encode(SAMPLE)
+        encode = timeit.timeit(lambda: codec.encode(SAMPLE), number=iterations) / iterations * 1e6
+        decode = timeit.timeit(lambda: codec.decode(payload), number=iterations) / iterations * 1e6
+        print(f"{name:8} {len(payload):6d} {encode:10.2f} {decode:10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,90 @@
+"""
+Per-item `Transformer.transform` against the columnar batch path on
+synthetic samples from a few hosts (ISO timestamps, psutil-shaped groups):
+
+    python -m benchmarks.bench_columnar [samples] [hosts]
+
+The per-item loop runs in chunks so its input dicts and outputs don't all
+have to fit in memory at once; the columnar path gets the same values as
+one set of arrays.
+"""
+# Built-in imports
+from datetime import datetime, timedelta, timezone
+import logging
+import sys
+import time
+
+# Third-party imports
+import numpy as np
+
+# local imports
+from app.transform.transformer import Transformer
+
+T0 = datetime(2025, 5, 21, tzinfo=timezone.utc)
+CHUNK = 100_000
+
+
+def make_items(start: int, stop: int, hosts: int) -> list[dict]:
+    return [
+        {
+            "timestamp": (T0 + timedelta(seconds=i // hosts)).isoformat(),
+            "host": f"host-{i % hosts}",
+            "cpu_percent": float(i % 101),
+            "memory": {"total": 16_654_180_352, "used": 6_764_961_792 + i, "available": 9_215_270_912, "percent": 44.7},
+            "disk": {"total": 502_391_824_384, "used": 212_380_295_168, "free": 264_411_238_400, "percent": 44.5},
+            "net_io": {"bytes_sent": 1000 * i, "bytes_recv": 2000 * i, "packets_sent": i, "packets_recv": 2 * i},
+        }
+        for i in range(start, stop)
+    ]
+
+
+def make_columns(n: int, hosts: int) -> dict:
+    i = np.arange(n)
+    ts = np.datetime64("2025-05-21T00:00:00", "s") + (i // hosts).astype("timedelta64[s]")
+    return {
+        "timestamp": np.datetime_as_string(ts, unit="us").astype(object) + "+00:00",
+        "host": np.array([f"host-{h}" for h in range(hosts)], dtype=object)[i % hosts],
+        "cpu_percent": (i % 101).astype(float),
+        "mem_total": np.full(n, 16_654_180_352.0), "mem_used": 6_764_961_792.0 + i,
+        "mem_available": np.full(n, 9_215_270_912.0), "mem_percent": np.full(n, 44.7),
+        "disk_total": np.full(n, 502_391_824_384.0), "disk_used": np.full(n, 212_380_295_168.0),
+        "disk_free": np.full(n, 264_411_238_400.0), "disk_percent": np.full(n, 44.5),
+        "net_bytes_sent": 1000.0 * i, "net_bytes_recv": 2000.0 * i,
+        "net_packets_sent": i.astype(float), "net_packets_recv": 2.0 * i,
+    }
+
+
+def bench_per_item(n: int, hosts: int) -> float:
+    transformer = Transformer()
+    elapsed = 0.0
+    for start in range(0, n, CHUNK):
+        items = make_items(start, min(start + CHUNK, n), hosts)
+        begin = time.perf_counter()
+        transformer.transform(items)
+        elapsed += time.perf_counter() - begin
+    return elapsed
+
+
+def bench_columnar(n: int, hosts: int) -> float:
+    columns = make_columns(n, hosts)
+    begin = time.perf_counter()
+    mask, _ = Transformer().transform_columns(columns)
+    elapsed = time.perf_counter() - begin
+    assert mask.all()
+    return elapsed
+
+
+def main(n: int, hosts: int) -> None:
+    logging.disable(logging.WARNING)
+    print(f"samples={n} hosts={hosts}")
+    per_item = bench_per_item(n, hosts)
+    columnar = bench_columnar(n, hosts)
+    print(f"per-item loop : {per_item:8.3f} s  {n / per_item:12,.0f} samples/s")
+    print(f"columnar      : {columnar:8.3f} s  {n / columnar:12,.0f} samples/s")
+    print(f"speedup       : {per_item / columnar:8.1f}x")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    hosts = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    main(n, hosts)
@@ -0,0 +1,120 @@
+"""
+Load test for `POST /ingest`: many simulated agents posting gzip batches at once.
+
+Without a URL the app runs in-process (httpx ASGI transport) against a
+throwaway SQLite file. SQLite takes one writer at a time, so concurrent
+agents queue on its lock and the numbers are a floor; pass the URL of a
+server backed by Postgres to load the real write path:
+
+    python -m benchmarks.bench_ingest [agents] [batches] [batch_size] [url]
+"""
+# Built-in imports
+import asyncio
+import gzip
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+# Third-party imports
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+# local imports
+from app.api.ingest import router
+from app.models.models import Base
+from app.storage.database import get_db_session
+from app.storage.rollup import RollupEngine
+
+
+async def make_session_factory(path: str):
+    # concurrent requests queue on SQLite's write lock instead of failing after the default 5 s
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}", connect_args={"timeout": 120})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine, async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class NullCache:
+    async def cache_many(self, records: list[dict]) -> None:
+        pass
+
+
+def make_batch(agent: int, batch: int, size: int) -> bytes:
+    samples = [
+        {
+            "host": f"agent-{agent:04d}",
+            "time_stamp": f"2025-05-21T{(batch * size + i) // 3600 % 24:02d}:{(batch * size + i) // 60 % 60:02d}:{(batch * size + i) % 60:02d}+00:00",
+            "cpu_percent": float((agent + i) % 100),
+            "memory": {"total": 16000, "used": 8000 + i, "percent": 50.0},
+            "disk": {"total": 500000, "used": 250000, "percent": 50.0},
+            "net_io": {"bytes_sent": 1000 * i, "bytes_recv": 2000 * i, "bytes_sent_rate": 1000.0},
+        }
+        for i in range(size)
+    ]
+    return gzip.compress(json.dumps({"samples": samples}).encode())
+
+
+async def run_agent(client: httpx.AsyncClient, url: str, agent: int, batches: int, size: int, latencies: list[float]) -> int:
+    failures = 0
+    for batch in range(batches):
+        body = make_batch(agent, batch, size)
+        start = time.perf_counter()
+        response = await client.post(url, content=body, headers={"Content-Encoding": "gzip", "Content-Type": "application/json"})
+        latencies.append(time.perf_counter() - start)
+        failures += response.status_code != 202
+    return failures
+
+
+async def main(agents: int, batches: int, size: int, url: str | None) -> None:
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = None
+        if url is None:
+            engine, factory = await make_session_factory(os.path.join(tmp, "bench.sqlite3"))
+
+            async def session():
+                async with factory() as db:
+                    yield db
+
+            app = FastAPI()
+            app.include_router(router)
+            app.dependency_overrides[get_db_session] = session
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url="http://bench")
+            url = "/ingest"
+            patches = [patch("app.api.ingest.cache_panel", NullCache()), patch("app.api.ingest.rollups", RollupEngine(factory))]
+        else:
+            client = httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=agents))
+            patches = []
+
+        for p in patches:
+            p.start()
+        latencies: list[float] = []
+        start = time.perf_counter()
+        failures = sum(await asyncio.gather(*(run_agent(client, url, a, batches, size, latencies) for a in range(agents))))
+        elapsed = time.perf_counter() - start
+        for p in patches:
+            p.stop()
+        await client.aclose()
+        if engine is not None:
+            await engine.dispose()
+
+    samples = agents * batches * size
+    latencies.sort()
+    print(f"agents={agents} batches={batches} batch_size={size}")
+    print(f"samples    : {samples} in {elapsed:.2f} s = {samples / elapsed:,.0f} samples/s")
+    print(f"requests   : {len(latencies)} ({failures} failed) = {len(latencies) / elapsed:,.0f} req/s")
+    print(f"latency ms : p50 {statistics.median(latencies) * 1000:.1f}  p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}")
+
+
+if __name__ == "__main__":
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    batches = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    size = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    url = sys.argv[4] if len(sys.argv) > 4 else None
+    asyncio.run(main(agents, batches, size, url))
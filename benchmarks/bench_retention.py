@@ -0,0 +1,100 @@
+"""
+Insert latency while old rows age out: one `DELETE ... WHERE time_stamp < X`
+against `RetentionManager`'s chunked deletes, on a throwaway SQLite file
+through aiosqlite:
+
+    python -m benchmarks.bench_retention [old_rows] [chunk_size]
+
+A writer inserts a batch of 50 samples every 20 ms while the delete runs;
+the slowest batches show how long writes queued behind the delete.
+"""
+# Built-in imports
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Third-party imports
+from sqlalchemy import delete
+
+# local imports
+from app.models.models import MetricsModel
+from app.models.sample import MetricSample, to_ns
+from app.storage.retention import RetentionManager
+from app.storage.storage import Storage
+from benchmarks.bench_batch_writer import make_session_factory
+
+NOW = datetime(2025, 5, 21)
+CHUNK = 50_000
+
+
+async def fill(factory, n: int) -> None:
+    storage = Storage()
+    async with factory() as session:
+        for offset in range(0, n, CHUNK):
+            items = [
+                MetricSample(to_ns(NOW - timedelta(days=60) + timedelta(seconds=i)), 10.0, host="web-1", mem_used=i)
+                for i in range(offset, min(n, offset + CHUNK))
+            ]
+            await storage.save_many_to_db(items, session)
+
+
+async def writer(factory, stop: asyncio.Event) -> list[float]:
+    storage = Storage()
+    latencies = []
+    while not stop.is_set():
+        items = [MetricSample(to_ns(NOW), 10.0, host="web-1") for _ in range(50)]
+        start = time.perf_counter()
+        async with factory() as session:
+            await storage.save_many_to_db(items, session)
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+async def run(path: str, old_rows: int, delete_old) -> tuple[float, list[float]]:
+    engine, factory = await make_session_factory(path)
+    await fill(factory, old_rows)
+    stop = asyncio.Event()
+    task = asyncio.create_task(writer(factory, stop))
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    await delete_old(factory)
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.2)
+    stop.set()
+    latencies = await task
+    await engine.dispose()
+    return elapsed, latencies
+
+
+async def main(old_rows: int, chunk_size: int) -> None:
+    logging.disable(logging.WARNING)
+    path = os.path.join(tempfile.mkdtemp(), "bench_retention.sqlite3")
+    cutoff = NOW - timedelta(days=30)
+
+    async def one_delete(factory):
+        async with factory() as session:
+            await session.execute(delete(MetricsModel).where(MetricsModel.time_stamp < cutoff))
+            await session.commit()
+
+    async def chunked(factory):
+        await RetentionManager(factory, raw_days=30, rollup_days={}, chunk_size=chunk_size).run_once(now=NOW)
+
+    print(f"old_rows={old_rows} chunk_size={chunk_size}")
+    print(f"{'strategy':10} {'delete s':>9} {'batches':>8} {'median ms':>10} {'max ms':>8}")
+    for name, delete_old in (("one DELETE", one_delete), ("chunked", chunked)):
+        elapsed, latencies = await run(path, old_rows, delete_old)
+        print(f"{name:10} {elapsed:9.2f} {len(latencies):8} {statistics.median(latencies) * 1000:10.1f} "
+              f"{max(latencies) * 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+    ))
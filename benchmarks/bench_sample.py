@@ -0,0 +1,130 @@
+"""
+Memory and allocations per transformed sample: the nested dicts the
+transformer used to emit against `MetricSample`.
+
+Both paths start from the same fetcher-shaped samples (full psutil groups,
+ISO timestamps) and keep their output in a list, as the batch writer and
+the agent buffer do. tracemalloc counts what each path leaves allocated
+once the fetched samples are dropped (the old items kept references to
+the full psutil groups);
+the timings (taken without tracemalloc) cover the transform and building
+the `resources` row that the insert and the hot cache need per sample:
+
+    python -m benchmarks.bench_sample [samples]
+"""
+# Built-in imports
+from datetime import datetime, timedelta, timezone
+import gc
+import logging
+import sys
+import time
+import tracemalloc
+
+# local imports
+from app.models.models import UNKNOWN_HOST, flatten_metrics
+from app.storage.storage import to_naive_utc
+from app.transform.rates import COUNTERS, counter_delta
+from app.transform.transformer import Transformer
+
+T0 = datetime(2025, 5, 21, 14, tzinfo=timezone.utc)
+
+
+def make_samples(n: int) -> list[dict]:
+    return [
+        {
+            "timestamp": (T0 + timedelta(seconds=i)).isoformat(),
+            "host": "web-1",
+            "cpu_percent": 12.5 + i % 50,
+            "memory": {"total": 16_654_180_352, "available": 9_215_270_912 + i, "percent": 44.7, "used": 6_764_961_792 + i,
+                       "free": 1_032_851_456, "active": 4_318_224_384, "inactive": 9_704_742_912, "buffers": 609_312_768,
+                       "cached": 8_246_054_912, "shared": 1_053_929_472, "slab": 1_004_392_448},
+            "disk": {"total": 502_391_824_384, "used": 212_380_295_168 + i, "free": 264_411_238_400 - i, "percent": 44.5},
+            "net_io": {"bytes_sent": 1_234_567_890 + 1000 * i, "bytes_recv": 9_876_543_210 + 2000 * i,
+                       "packets_sent": 4_567_890 + i, "packets_recv": 7_890_123 + 2 * i,
+                       "errin": 0, "errout": 0, "dropin": 12, "dropout": 0},
+        }
+        for i in range(n)
+    ]
+
+
+class DictTransformer:
+    """The previous transform: ISO timestamp round trip, nested groups copied to add the rates."""
+    def __init__(self):
+        self.previous = {}
+
+    def transform(self, data: list[dict]) -> list[dict]:
+        clean_data = []
+        for item in data:
+            cleaned = {
+                "host": item.get("host"),
+                "time_stamp": datetime.fromisoformat(item["timestamp"]).isoformat(),
+                "cpu_percent": item.get("cpu_percent"),
+                "memory": item.get("memory"),
+                "disk": item.get("disk"),
+                "net_io": item.get("net_io"),
+            }
+            at = datetime.fromisoformat(cleaned["time_stamp"])
+            values = dict(cleaned["net_io"])
+            for column in COUNTERS:
+                key = column.removeprefix("net_")
+                previous = self.previous.get(key)
+                self.previous[key] = (at, values[key])
+                delta = counter_delta(previous[1], values[key]) if previous else None
+                values[f"{key}_rate"] = delta / (at - previous[0]).total_seconds() if delta is not None else None
+            clean_data.append({**cleaned, "net_io": values})
+        return clean_data
+
+    @staticmethod
+    def to_row(data: dict) -> dict:
+        return {
+            "host": data.get("host") or UNKNOWN_HOST,
+            "tags": data.get("tags") or None,
+            "time_stamp": to_naive_utc(data["time_stamp"]),
+            "cpu_percent": float(data["cpu_percent"]),
+            **flatten_metrics(data),
+        }
+
+
+def measure(make_transformer, to_row, n: int) -> tuple[float, float, float, float]:
+    """Retained bytes and blocks per sample, then seconds per sample to transform and to build its row."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    samples = make_samples(n)
+    output = make_transformer().transform(samples)
+    del samples
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    size = sum(stat.size_diff for stat in diff)
+    blocks = sum(stat.count_diff for stat in diff)
+    del output
+
+    samples = make_samples(n)
+    start = time.perf_counter()
+    output = make_transformer().transform(samples)
+    transformed = time.perf_counter()
+    for item in output:
+        to_row(item)
+    done = time.perf_counter()
+    return size / n, blocks / n, (transformed - start) / n, (done - transformed) / n
+
+
+def main(n: int) -> None:
+    logging.disable(logging.WARNING)
+    print(f"samples={n}")
+    print(f"{'path':14} {'bytes/sample':>13} {'blocks/sample':>14} {'transform µs':>13} {'row µs':>7}")
+    results = {}
+    paths = (
+        ("nested dicts", DictTransformer, DictTransformer.to_row),
+        ("MetricSample", Transformer, lambda sample: sample.to_row()),
+    )
+    for name, make_transformer, to_row in paths:
+        results[name] = measure(make_transformer, to_row, n)
+        size, blocks, transform, row = results[name]
+        print(f"{name:14} {size:13.0f} {blocks:14.1f} {transform * 1e6:13.2f} {row * 1e6:7.2f}")
+    print(f"memory per buffered sample: {results['nested dicts'][0] / results['MetricSample'][0]:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,113 @@
+"""
+The embedded segment store against SQLite as the raw-sample backend:
+bulk writes, size on disk, a one-host page of records and a one-column
+aggregate over all rows and over one hour:
+
+    python -m benchmarks.bench_segments [samples] [hosts]
+
+Samples are 1 Hz from every host, 25 hosts by default.
+"""
+# Built-in imports
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Third-party imports
+from sqlalchemy import func, select
+
+# local imports
+from app.models.models import MetricsModel
+from app.models.sample import MetricSample, to_ns
+from app.storage.segments import SegmentStorage
+from app.storage.storage import Storage
+from benchmarks.bench_batch_writer import make_session_factory
+
+T0 = datetime(2025, 5, 21)
+BATCH = 5000
+
+
+def make_items(n: int, hosts: int) -> list[MetricSample]:
+    return [
+        MetricSample(
+            to_ns(T0 + timedelta(seconds=i // hosts)), float(i % 97), host=f"web-{i % hosts}", tags={"role": "web"},
+            mem_total=16_000_000_000, mem_used=8_000_000_000 + i % 1000, mem_percent=50.0 + i % 7,
+            disk_total=500_000_000_000, disk_used=250_000_000_000, disk_percent=50.0,
+            net_bytes_sent=1000 * i, net_bytes_recv=2000 * i, net_bytes_sent_rate=1000.0, net_bytes_recv_rate=2000.0,
+        )
+        for i in range(n)
+    ]
+
+
+async def timed(call, repeat: int = 5) -> tuple[float, object]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await call()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def size_of(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+async def main(n: int, hosts: int) -> None:
+    logging.disable(logging.WARNING)
+    directory = tempfile.mkdtemp()
+    items = make_items(n, hosts)
+    hour = (T0 + timedelta(hours=1), T0 + timedelta(hours=2))
+    results = {}
+
+    path = os.path.join(directory, "bench.sqlite3")
+    engine, factory = await make_session_factory(path)
+    storage = Storage()
+    async with factory() as session:
+        start = time.perf_counter()
+        for offset in range(0, n, BATCH):
+            await storage.save_many_to_db(items[offset:offset + BATCH], session)
+        write = time.perf_counter() - start
+
+        async def aggregate(start=None, end=None):
+            query = select(func.count(), func.sum(MetricsModel.cpu_percent), func.min(MetricsModel.cpu_percent),
+                           func.max(MetricsModel.cpu_percent))
+            if start is not None:
+                query = query.where(MetricsModel.time_stamp >= start, MetricsModel.time_stamp < end)
+            return (await session.execute(query)).one()
+
+        page, _ = await timed(lambda: storage.get_data_from_db(session, *hour, limit=1000, host="web-3"))
+        total, _ = await timed(aggregate)
+        window, _ = await timed(lambda: aggregate(*hour))
+    await engine.dispose()
+    results["sqlite"] = (write, size_of(path), page, total, window)
+
+    path = os.path.join(directory, "segments")
+    segments = SegmentStorage(path)
+    start = time.perf_counter()
+    for offset in range(0, n, BATCH):
+        await segments.save_many_to_db(items[offset:offset + BATCH])
+    write = time.perf_counter() - start
+    page, _ = await timed(lambda: segments.get_data_from_db(None, *hour, limit=1000, host="web-3"))
+    segments.store.bytes_read.clear()
+    total, _ = await timed(lambda: segments.aggregate("cpu_percent"))
+    window, _ = await timed(lambda: segments.aggregate("cpu_percent", *hour))
+    read = dict(segments.store.bytes_read)
+    results["segments"] = (write, size_of(path), page, total, window)
+
+    print(f"samples={n} hosts={hosts} batch={BATCH}")
+    print(f"{'backend':9} {'write s':>8} {'MiB':>7} {'page ms':>8} {'agg all ms':>11} {'agg 1h ms':>10}")
+    for name, (write, size, page, total, window) in results.items():
+        print(f"{name:9} {write:8.2f} {size / 1024 / 1024:7.1f} {page * 1000:8.1f} {total * 1000:11.1f} {window * 1000:10.1f}")
+    print(f"column bytes decoded by the segment aggregates: {read}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 25,
+    ))
@@ -0,0 +1,84 @@
+"""
+p50/p95/p99 of CPU over a week: sorting the raw rows against merging the
+per-bucket sketches, on a throwaway SQLite file through aiosqlite:
+
+    python -m benchmarks.bench_sketch [days] [interval_seconds] [hosts]
+
+Both paths read the same samples; the raw path selects the column and
+sorts it, the sketch path reads the 1d/1h sketches `RollupEngine` keeps.
+"""
+# Built-in imports
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Third-party imports
+from sqlalchemy import func, select
+
+# local imports
+from app.models.models import MetricsModel, SKETCH_MODELS
+from app.models.sample import MetricSample, to_ns
+from app.storage.rollup import RollupEngine
+from app.storage.storage import Storage
+from benchmarks.bench_batch_writer import make_session_factory
+
+START = datetime(2025, 5, 1)
+QUANTILES = [0.5, 0.95, 0.99]
+CHUNK = 20_000
+
+
+def make_items(start: int, stop: int, interval: int, hosts: int, rng: random.Random) -> list[MetricSample]:
+    return [
+        MetricSample(to_ns(START + timedelta(seconds=i // hosts * interval)), min(100.0, rng.lognormvariate(3, 0.6)),
+                     host=f"host-{i % hosts}")
+        for i in range(start, stop)
+    ]
+
+
+async def main(days: int, interval: int, hosts: int) -> None:
+    logging.disable(logging.WARNING)
+    path = os.path.join(tempfile.mkdtemp(), "bench_sketch.sqlite3")
+    engine, factory = await make_session_factory(path)
+    storage = Storage()
+    rollups = RollupEngine(factory, sketch_metrics="cpu_percent", sketch_resolutions="1h,1d")
+    n = days * 86400 // interval * hosts
+    rng = random.Random(7)
+    async with factory() as session:
+        for offset in range(0, n, CHUNK):
+            items = make_items(offset, min(n, offset + CHUNK), interval, hosts, rng)
+            await storage.save_many_to_db(items, session)
+            rollups.add_many(items)
+            await rollups.flush()
+
+    end = START + timedelta(days=days)
+    async with factory() as db:
+        start = time.perf_counter()
+        values = sorted((await db.execute(
+            select(MetricsModel.cpu_percent).where(MetricsModel.time_stamp >= START, MetricsModel.time_stamp < end)
+        )).scalars().all())
+        exact = {f"p{q * 100:g}": values[int(q * (len(values) - 1))] for q in QUANTILES}
+        raw = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = await rollups.quantiles(db, "cpu_percent", QUANTILES, START, end)
+        sketched = time.perf_counter() - start
+        stored = (await db.execute(select(func.sum(func.length(SKETCH_MODELS["1h"].sketch))))).scalar()
+
+    print(f"days={days} interval={interval}s hosts={hosts} rows={len(values)} sketches read={result['sketches']}")
+    print(f"raw rows:  {raw * 1000:8.1f} ms  {exact}")
+    print(f"sketches:  {sketched * 1000:8.1f} ms  { {k: round(v, 3) for k, v in result['values'].items()} }")
+    print(f"1h sketches stored: {stored / 1024:.0f} KiB, max relative error {result['relative_accuracy']}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 7,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 4,
+    ))
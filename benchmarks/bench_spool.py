@@ -0,0 +1,66 @@
+"""
+Recovery after a database outage: spooled samples replayed in bulk by
+`BatchWriter` against writing them back one row at a time, on a throwaway
+SQLite file through aiosqlite:
+
+    python -m benchmarks.bench_spool [samples] [batch_size]
+
+`samples` defaults to an hour of 1 Hz samples from 25 hosts. The spool is
+filled in `BATCH_MAX_ROWS`-sized appends, as failed flushes would.
+"""
+# Built-in imports
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+# local imports
+from app.models.sample import MetricSample
+from app.storage.batch_writer import BatchWriter
+from app.storage.spool import Spool
+from app.storage.storage import Storage
+from benchmarks.bench_batch_writer import make_items, make_session_factory
+
+
+async def main(n: int, batch_size: int) -> None:
+    logging.disable(logging.WARNING)
+    directory = tempfile.mkdtemp()
+    items = make_items(n)
+    payloads = [json.dumps(item.to_dict()).encode() for item in items]
+
+    spool = Spool(os.path.join(directory, "spool"))
+    start = time.perf_counter()
+    for offset in range(0, n, 500):
+        spool.append(payloads[offset:offset + 500])
+    appended = time.perf_counter() - start
+    size = spool.pending()
+
+    engine, factory = await make_session_factory(os.path.join(directory, "per_row.sqlite3"))
+    storage = Storage()
+    start = time.perf_counter()
+    async with factory() as session:
+        for payload in payloads:
+            await storage.save_to_db(MetricSample.from_dict(json.loads(payload)), session)
+    per_row = time.perf_counter() - start
+    await engine.dispose()
+
+    engine, factory = await make_session_factory(os.path.join(directory, "replay.sqlite3"))
+    writer = BatchWriter(storage, factory, spool=spool)
+    start = time.perf_counter()
+    replayed = await spool.replay(writer._write_spooled, batch_size)
+    bulk = time.perf_counter() - start
+    await engine.dispose()
+
+    print(f"samples={n} spool={size / 1024 / 1024:.1f} MiB appended in {appended:.2f}s")
+    print(f"row by row:   {per_row:7.2f}s  {n / per_row:9.0f} rows/s")
+    print(f"spool replay: {bulk:7.2f}s  {replayed / bulk:9.0f} rows/s ({per_row / bulk:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 90_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+    ))
@@ -0,0 +1,97 @@
+import gzip
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from app.agent import Agent
+from app.models.sample import MetricSample
+
+
+def make_item(i):
+    return MetricSample.from_dict({"time_stamp": f"2025-05-21T14:00:{i:02d}+00:00", "cpu_percent": 5.0,
+                                   "memory": {"used": i}, "disk": {"used": i}, "net_io": {"bytes_sent": i}})
+
+
+class Server:
+    """httpx transport recording the decoded batches it receives."""
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.batches = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert request.headers["content-encoding"] == "gzip"
+        self.batches.append(json.loads(gzip.decompress(request.content))["samples"])
+        return httpx.Response(self.statuses.pop(0) if self.statuses else 202, json={})
+
+
+@pytest.fixture
+def make_agent():
+    agents = []
+
+    def factory(server, **kwargs):
+        with patch("app.agent.settings.HOST_NAME", "web-1"):
+            agent = Agent(url="http://central/ingest", client=httpx.AsyncClient(transport=httpx.MockTransport(server)), **kwargs)
+        agents.append(agent)
+        return agent
+
+    yield factory
+    for agent in agents:
+        agent.fetcher.close()
+
+
+@pytest.mark.asyncio
+async def test_sends_full_batches_tagged_with_host(make_agent):
+    server = Server()
+    agent = make_agent(server, batch_size=2, flush_interval=60)
+    agent.add([make_item(i) for i in range(5)])
+
+    await agent.drain()
+    assert [len(batch) for batch in server.batches] == [2, 2]
+    assert server.batches[0][0]["host"] == "web-1"
+    assert len(agent.buffer) == 1 # waits for the next batch or the flush interval
+    assert agent.stats()["sent"] == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_post_keeps_buffer_and_backs_off(make_agent):
+    now = [100.0]
+    server = Server(statuses=[503])
+    agent = make_agent(server, batch_size=2, flush_interval=60, clock=lambda: now[0])
+    agent.add([make_item(0), make_item(1)])
+
+    assert await agent.send() is False
+    assert len(agent.buffer) == 2
+    assert not agent.due(now[0]) # backing off
+
+    now[0] += 60
+    assert agent.due(now[0])
+    assert await agent.send() is True
+    assert server.batches[0] == server.batches[1]
+    assert not agent.buffer
+
+
+@pytest.mark.asyncio
+async def test_rejected_batch_is_dropped(make_agent):
+    agent = make_agent(Server(statuses=[422]), batch_size=10)
+    agent.add([make_item(0)])
+    assert await agent.send() is False
+    assert not agent.buffer
+    assert agent.stats()["dropped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_buffer_is_bounded(make_agent):
+    agent = make_agent(Server(), buffer_size=3)
+    agent.add([make_item(i) for i in range(5)])
+    assert [item.net_bytes_sent for item in agent.buffer] == [2, 3, 4]
+    assert agent.dropped == 2
+
+
+@pytest.mark.asyncio
+async def test_flush_interval_sends_partial_batch(make_agent):
+    now = [0.0]
+    agent = make_agent(Server(), batch_size=100, flush_interval=10, clock=lambda: now[0])
+    agent.add([make_item(0)])
+    assert not agent.due(now[0])
+    now[0] = 10.0
+    assert agent.due(now[0])
@@ -0,0 +1,65 @@
+import pytest
+
+from app.models.sample import MetricSample
+from app.transform.anomaly import AnomalyDetector, parse_thresholds
+
+SECOND = 1_000_000_000
+
+
+def samples(values):
+    return [MetricSample(i * SECOND, value) for i, value in enumerate(values)]
+
+
+def test_parse_thresholds():
+    assert parse_thresholds("cpu_percent=90:80, mem_percent=95") == {"cpu_percent": (90.0, 80.0), "mem_percent": (95.0, 95.0)}
+    with pytest.raises(ValueError):
+        parse_thresholds("cpu_percent")
+    with pytest.raises(ValueError):
+        parse_thresholds("cpu_percent=80:90")
+    with pytest.raises(ValueError):
+        AnomalyDetector(metrics="cpu_percnt", thresholds="")
+
+
+def test_ewma_tracks_mean_and_variance():
+    detector = AnomalyDetector(metrics="cpu_percent", thresholds="", alpha=0.1, warmup=0)
+    detector.observe_many(samples([10.0, 20.0] * 500))
+    state = detector.state[("", "cpu_percent")]
+    assert state.mean == pytest.approx(15.0, abs=0.6)
+    assert state.var == pytest.approx(25.0, rel=0.1)
+    assert state.count == 1000
+
+
+def test_zscore_spike_fires_once_and_resolves():
+    detector = AnomalyDetector(metrics="cpu_percent", thresholds="", alpha=0.05, z_threshold=4.0, z_clear=2.0, warmup=30)
+    baseline = [20.0 + (i % 5) for i in range(100)]
+    assert detector.observe_many(samples(baseline)) == []
+
+    events = detector.observe_many(samples([80.0, 81.0, 22.0]))
+    assert [(event["type"], event["state"]) for event in events] == [("zscore", "firing"), ("zscore", "resolved")]
+    assert events[0]["metric"] == "cpu_percent" and events[0]["value"] == 80.0
+    assert events[0]["z"] >= 4.0 and events[0]["timestamp"] == "1970-01-01T00:00:00+00:00"
+    assert detector.stats() == {"series": 1, "firing": 0, "fired": 1}
+
+
+def test_no_zscore_during_warmup():
+    detector = AnomalyDetector(metrics="cpu_percent", thresholds="", warmup=30)
+    assert detector.observe_many(samples([20.0, 21.0] * 10 + [95.0])) == []
+
+
+def test_threshold_hysteresis_does_not_flap():
+    detector = AnomalyDetector(metrics="", thresholds="cpu_percent=90:80")
+    events = detector.observe_many(samples([85.0, 91.0, 89.0, 90.5, 85.0, 81.0, 79.0, 89.0]))
+    assert [(event["state"], event["value"]) for event in events] == [("firing", 91.0), ("resolved", 79.0)]
+    assert events[0]["threshold"] == 90.0
+
+
+def test_hosts_are_independent_and_missing_values_skipped():
+    detector = AnomalyDetector(metrics="", thresholds="mem_percent=90:80")
+    events = detector.observe_many([
+        MetricSample(0, 1.0, host="web-1", mem_percent=95.0),
+        MetricSample(0, 1.0, host="web-2", mem_percent=50.0),
+        MetricSample(SECOND, 1.0, host="web-2", missing=["memory"]),
+        MetricSample(SECOND, 1.0, host="web-1", mem_percent=92.0),
+    ])
+    assert [(event["host"], event["state"]) for event in events] == [("web-1", "firing")]
+    assert set(detector.state) == {("web-1", "mem_percent"), ("web-2", "mem_percent")}
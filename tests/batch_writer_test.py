@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+from sqlalchemy import func, select
+
+from app.models.models import MetricsModel
+from app.models.sample import MetricSample
+from app.storage.batch_writer import BatchWriter
+from app.storage.spool import Spool
+from app.storage.storage import Storage
+
+
+def make_item(i):
+    return MetricSample.from_dict({
+        "time_stamp": f"2025-05-21T14:00:{i % 60:02d}+00:00",
+        "cpu_percent": float(i),
+        "memory": {"used": i},
+        "disk": {"used": i},
+        "net_io": {"bytes_sent": i},
+    })
+
+
+async def count_rows(session_factory):
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(MetricsModel))
+
+
+@pytest.mark.asyncio
+async def test_save_many_to_db_returns_ids_in_order(session_factory):
+    async with session_factory() as session:
+        ids = await Storage().save_many_to_db([make_item(i) for i in range(5)], session)
+    assert ids == [1, 2, 3, 4, 5]
+    assert await count_rows(session_factory) == 5
+
+
+@pytest.mark.asyncio
+async def test_flushes_when_row_count_reached(session_factory):
+    on_flush = AsyncMock()
+    writer = BatchWriter(Storage(), session_factory, max_rows=3, max_latency=60, on_flush=on_flush)
+
+    for i in range(7):
+        await writer.add(make_item(i))
+
+    assert await count_rows(session_factory) == 6
+    assert len(writer) == 1
+    assert writer.flushes == 2
+    assert on_flush.await_count == 2
+    await writer.close()
+
+
+@pytest.mark.asyncio
+async def test_flushes_when_max_latency_elapsed(session_factory):
+    writer = BatchWriter(Storage(), session_factory, max_rows=100, max_latency=0.05)
+    await writer.add(make_item(1))
+    assert await count_rows(session_factory) == 0
+
+    await asyncio.sleep(0.2)
+    assert await count_rows(session_factory) == 1
+    assert len(writer) == 0
+
+
+@pytest.mark.asyncio
+async def test_close_flushes_remaining_items(session_factory):
+    writer = BatchWriter(Storage(), session_factory, max_rows=100, max_latency=60)
+    await writer.add_many([make_item(i) for i in range(4)])
+    await writer.close()
+    assert await count_rows(session_factory) == 4
+    assert writer.stats()["rows_written"] == 4
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_counted(session_factory):
+    writer = BatchWriter(Storage(), session_factory, max_rows=100, max_latency=60)
+    await writer.add(MetricSample(0, None)) # no CPU value, the row cannot be built
+    assert await writer.flush() == []
+    assert writer.failed == 1
+
+
+@pytest.mark.asyncio
+async def test_refused_batches_are_spooled_and_replayed_in_bulk(session_factory, tmp_path):
+    storage = Storage()
+    on_flush = AsyncMock()
+    writer = BatchWriter(storage, session_factory, max_rows=100, max_latency=60, on_flush=on_flush,
+                         spool=Spool(tmp_path / "spool"))
+    save_many_to_db = storage.save_many_to_db
+    storage.save_many_to_db = AsyncMock(return_value=[]) # the database is down
+
+    await writer.add_many([make_item(i) for i in range(3)])
+    await writer.flush()
+    await writer.add_many([make_item(i) for i in range(3, 5)])
+    await writer.flush()
+    assert writer.failed == 5 and writer.spool.pending() > 0
+    assert await count_rows(session_factory) == 0
+
+    storage.save_many_to_db = save_many_to_db # back up
+    await writer.add(make_item(5))
+    assert len(await writer.flush()) == 1 # returns before the spool is replayed
+    assert writer.spool.pending() > 0
+    await writer.close() # waits for the replay
+
+    assert await count_rows(session_factory) == 6
+    assert writer.spool.pending() == 0
+    assert writer.stats()["spool"]["replayed"] == 5
+    replayed, ids = on_flush.call_args.args
+    assert [item.cpu_percent for item in replayed] == [0.0, 1.0, 2.0, 3.0, 4.0] and ids == []
+
+
+class UnreachableSession:
+    """A session whose database refuses connections."""
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def connection(self):
+        raise ConnectionRefusedError("database is down")
+
+    async def rollback(self): # nothing to roll back without a connection
+        pass
+
+
+@pytest.mark.asyncio
+async def test_copy_batch_is_spooled_when_the_connection_fails(tmp_path):
+    assert await Storage().copy_to_db([make_item(0)], UnreachableSession()) == 0
+
+    writer = BatchWriter(Storage(), UnreachableSession, max_rows=100, max_latency=60, use_copy=True,
+                         spool=Spool(tmp_path / "spool"))
+    await writer.add_many([make_item(i) for i in range(3)])
+    assert await writer.flush() == []
+
+    assert len(writer) == 0
+    assert writer.failed == 3
+    assert writer.spool.pending() > 0
+
+    writer.storage.copy_to_db = AsyncMock(side_effect=OSError("disk full")) # any write error is a refusal too
+    pending = writer.spool.pending()
+    await writer.add(make_item(3))
+    assert await writer.flush() == []
+    assert writer.failed == 4 and writer.spool.pending() > pending
@@ -0,0 +1,80 @@
+import json
+import pytest
+from app.ingest.codec import JsonCodec, MsgpackCodec, StructCodec, decode_payload, get_codec
+
+SAMPLE = {
+    "timestamp": "2025-05-21T14:00:00.123456+00:00",
+    "cpu_percent": 12.5,
+    "memory": {"total": 16_000_000_000, "used": 8_000_000_000, "available": 8_000_000_000, "percent": 50.0},
+    "disk": {"total": 500_000_000_000, "used": 250_000_000_000, "free": 250_000_000_000, "percent": 50.0},
+    "net_io": {"bytes_sent": 123456789, "bytes_recv": 987654321, "packets_sent": 1000, "packets_recv": 2000},
+}
+
+
+def test_json_codec_matches_original_format():
+    codec = JsonCodec()
+    assert codec.encode(SAMPLE) == json.dumps(SAMPLE)
+    assert codec.decode(codec.encode(SAMPLE)) == SAMPLE
+    assert not codec.binary
+
+
+def test_struct_codec_roundtrip_and_size():
+    codec = StructCodec()
+    payload = codec.encode(SAMPLE)
+    assert payload[:2] == b"s\x02"
+    assert len(payload) == codec.layout.size < len(json.dumps(SAMPLE))
+    assert codec.decode(payload) == SAMPLE
+
+
+def test_struct_codec_missing_values():
+    sample = {"timestamp": "2025-05-21T14:00:00+00:00", "cpu_percent": 3.0, "memory": {"percent": 1.5}}
+    decoded = StructCodec().decode(StructCodec().encode(sample))
+    assert decoded == {"timestamp": "2025-05-21T14:00:00+00:00", "cpu_percent": 3.0,
+                       "memory": {"percent": 1.5}, "disk": {}, "net_io": {}}
+
+
+def test_struct_codec_carries_host_tags_and_rates():
+    sample = {
+        "host": "db-ü1", "tags": {"role": "db", "dc": "ams"}, **SAMPLE,
+        "net_io": {**SAMPLE["net_io"], "bytes_sent_rate": 1500.5, "packets_recv_rate": 0.0},
+        "per_cpu": [1.0, 2.0],
+    }
+    codec = StructCodec()
+    payload = codec.encode(sample)
+    assert len(payload) == codec.layout.size + len("db-ü1".encode()) + len(json.dumps(sample["tags"]))
+    decoded = codec.decode(payload)
+    assert decoded == {key: value for key, value in sample.items() if key != "per_cpu"}
+    assert decode_payload(payload) == decoded
+    with pytest.raises(ValueError):
+        codec.decode(payload[:-1])
+
+
+def test_msgpack_codec_roundtrip():
+    pytest.importorskip("msgpack")
+    codec = MsgpackCodec()
+    sample = {**SAMPLE, "per_cpu": [1.0, 2.0]}
+    payload = codec.encode(sample)
+    assert payload[:2] == b"m\x01"
+    assert codec.decode(payload) == sample
+    assert decode_payload(payload) == sample
+
+
+def test_decode_payload_detects_codec():
+    assert decode_payload(json.dumps(SAMPLE)) == SAMPLE
+    assert decode_payload(json.dumps(SAMPLE).encode()) == SAMPLE
+    assert decode_payload(StructCodec().encode(SAMPLE)) == SAMPLE
+
+
+def test_version_mismatch_is_rejected():
+    payload = bytearray(StructCodec().encode(SAMPLE))
+    payload[1] = 1 # a v1 payload, without host, tags and rates
+    with pytest.raises(ValueError):
+        StructCodec().decode(bytes(payload))
+    with pytest.raises(ValueError):
+        decode_payload(bytes(payload))
+
+
+def test_get_codec():
+    assert get_codec("struct").name == "struct"
+    with pytest.raises(ValueError):
+        get_codec("xml")
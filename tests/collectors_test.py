@@ -0,0 +1,63 @@
+import pytest
+from collections import namedtuple
+from unittest.mock import MagicMock, patch
+from app.ingest.collectors import COLLECTORS, CpuStat, build_collectors, parse_intervals, read_group, read_top_processes
+
+scputimes = namedtuple("scputimes", ["user", "system", "idle", "iowait"])
+
+
+def test_parse_intervals():
+    assert parse_intervals("top_processes=60, disk_io=2.5") == {"top_processes": 60.0, "disk_io": 2.5}
+    assert parse_intervals("") == {}
+    with pytest.raises(ValueError):
+        parse_intervals("top_processes")
+
+
+def test_build_collectors_keeps_registry_order_and_overrides():
+    collectors = build_collectors("top_processes,cpu_percent", {"top_processes": 60})
+    assert [c.name for c in collectors] == ["cpu_percent", "top_processes"]
+    assert collectors[1].interval == 60
+    # the registry defaults are untouched
+    assert COLLECTORS["top_processes"].interval == 30.0
+
+
+def test_build_collectors_rejects_unknown_names():
+    with pytest.raises(ValueError, match="Unknown collector"):
+        build_collectors("cpu_percent,gpu", {})
+    with pytest.raises(ValueError, match="Unknown collector"):
+        build_collectors("cpu_percent", {"gpu": 5})
+
+
+def test_read_group_skips_failed_reads():
+    collectors = build_collectors("cpu_percent,memory", {})
+    with patch("app.ingest.collectors.psutil") as psutil, patch("app.ingest.collectors.cpu_stat", CpuStat()):
+        psutil.cpu_times.return_value = [scputimes(1.0, 1.0, 8.0, 0.0)]
+        psutil.virtual_memory.side_effect = OSError("boom")
+        assert read_group(collectors) == {"cpu_percent": 0.0}
+
+
+def test_cpu_collectors_share_one_proc_stat_read_per_tick():
+    collectors = build_collectors("cpu_percent,per_cpu", {})
+    ticks = [
+        [scputimes(0.0, 0.0, 0.0, 0.0), scputimes(0.0, 0.0, 0.0, 0.0)],
+        [scputimes(1.0, 0.0, 1.0, 0.0), scputimes(0.0, 0.0, 1.0, 1.0)],
+    ]
+    with patch("app.ingest.collectors.psutil") as psutil, patch("app.ingest.collectors.cpu_stat", CpuStat()):
+        psutil.cpu_times.side_effect = ticks
+        assert read_group(collectors) == {"cpu_percent": 0.0, "per_cpu": [0.0, 0.0]} # no previous read yet
+        # core 0 was busy half of the tick, core 1 idle or waiting on I/O
+        assert read_group(collectors) == {"cpu_percent": 25.0, "per_cpu": [50.0, 0.0]}
+    assert psutil.cpu_times.call_count == 2
+
+
+def test_top_processes_sorted_and_truncated():
+    infos = [
+        {"pid": 1, "name": "idle", "cpu_percent": 0.0, "memory_percent": 0.1},
+        {"pid": 2, "name": "busy", "cpu_percent": 80.0, "memory_percent": 1.0},
+        {"pid": 3, "name": "denied", "cpu_percent": None, "memory_percent": None},
+        {"pid": 4, "name": "fat", "cpu_percent": 0.0, "memory_percent": 30.0},
+    ]
+    with patch("app.ingest.collectors.psutil") as psutil, patch("app.ingest.collectors.settings") as settings:
+        psutil.process_iter.return_value = [MagicMock(info=info) for info in infos]
+        settings.TOP_PROCESSES = 2
+        assert [p["name"] for p in read_top_processes()] == ["busy", "fat"]
@@ -0,0 +1,90 @@
+import pytest
+from datetime import datetime
+
+from app.models.sample import to_ns
+from app.transform.columnar import counter_rates, timestamps_ns
+from app.transform.transformer import Transformer
+
+np = pytest.importorskip("numpy")
+
+
+def make_columns(n, **overrides):
+    return {
+        "timestamp": [f"2025-05-21T14:00:{i:02d}+00:00" for i in range(n)],
+        "cpu_percent": np.full(n, 10.0),
+        "mem_used": np.arange(n, dtype=float),
+        "disk_used": np.full(n, 5.0),
+        "net_bytes_sent": np.arange(n, dtype=float) * 1000,
+        **overrides,
+    }
+
+
+def test_timestamps_in_every_input_form():
+    ts, ok = timestamps_ns(["2025-05-21T14:00:00", "2025-05-21T14:00:00Z", "2025-05-21T14:00:00+00:00"])
+    assert ok.all() and (ts == to_ns(datetime(2025, 5, 21, 14))).all()
+
+    # an offset NumPy can't represent and garbage fall back to parsing one by one
+    ts, ok = timestamps_ns(["2025-05-21T16:00:00+02:00", "not-a-date"])
+    assert ok.tolist() == [True, False]
+    assert ts[0] == to_ns(datetime(2025, 5, 21, 14))
+
+    ts, ok = timestamps_ns(np.array([1.5, np.nan]), unit="s")
+    assert ts[0] == 1_500_000_000 and ok.tolist() == [True, False]
+    ts, _ = timestamps_ns(np.array([1500]), unit="ms")
+    assert ts[0] == 1_500_000_000
+    ts, ok = timestamps_ns(np.array(["2025-05-21T14:00", "NaT"], dtype="datetime64[ns]"))
+    assert ok.tolist() == [True, False]
+
+
+def test_mask_accepts_zero_and_degraded_rows():
+    transformer = Transformer()
+    columns = make_columns(5)
+    columns["cpu_percent"] = np.array([0.0, np.nan, 10.0, 10.0, 10.0])
+    columns["disk_used"] = np.array([5.0, 5.0, np.nan, np.nan, 5.0])
+    columns["degraded"] = np.array([False, False, False, True, False])
+    columns["timestamp"][4] = "garbage"
+
+    mask, clean = transformer.transform_columns(columns)
+    assert mask.tolist() == [True, False, False, True, False]
+    assert clean["cpu_percent"][0] == 0.0
+    assert clean["ts_ns"].dtype == np.int64
+
+
+def test_values_are_clipped():
+    columns = make_columns(3, cpu_percent=np.array([-5.0, 50.0, 120.0]), mem_used=np.array([-1.0, 2.0, 3.0]))
+    mask, clean = Transformer().transform_columns(columns)
+    assert mask.all()
+    assert clean["cpu_percent"].tolist() == [0.0, 50.0, 100.0]
+    assert clean["mem_used"].tolist() == [0.0, 2.0, 3.0]
+
+
+def test_counter_rates_per_series_with_wrap_and_reset():
+    values = np.array([100.0, 5000.0, 300.0, 5500.0, 2.0 ** 32 - 1000, 1000.0, 10.0])
+    ts = np.array([0, 0, 2, 2, 4, 5, 6]) * 10 ** 9
+    series = np.array([0, 1, 0, 1, 0, 0, 0])
+    rates = counter_rates(values, ts, series)
+    assert np.isnan(rates[[0, 1]]).all() # first of each series
+    assert rates[2] == 100.0 and rates[3] == 250.0
+    assert rates[4] == (2 ** 32 - 1300) / 2
+    assert rates[5] == 2000.0 # 32-bit wrap
+    assert np.isnan(rates[6]) # reset
+
+
+def test_matches_the_per_item_transform():
+    n = 20
+    columns = make_columns(n, host=np.array(["a", "b"] * 10, dtype=object))
+    mask, clean = Transformer().transform_columns(columns)
+
+    items = [
+        {"timestamp": columns["timestamp"][i], "host": columns["host"][i], "cpu_percent": 10.0,
+         "memory": {"used": int(columns["mem_used"][i])}, "disk": {"used": 5},
+         "net_io": {"bytes_sent": int(columns["net_bytes_sent"][i])}}
+        for i in range(n)
+    ]
+    samples = Transformer().transform(items)
+    assert mask.all()
+    assert clean["ts_ns"].tolist() == [sample.ts_ns for sample in samples]
+    assert clean["mem_used"].tolist() == [sample.mem_used for sample in samples]
+    rates = [sample.net_bytes_sent_rate for sample in samples]
+    assert np.isnan(clean["net_bytes_sent_rate"][:2]).all() and rates[:2] == [None, None]
+    assert clean["net_bytes_sent_rate"][2:].tolist() == rates[2:]
@@ -0,0 +1,22 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.models.models import Base
+
+
+@pytest_asyncio.fixture
+async def sqlite_engine(tmp_path):
+    """A throwaway on-disk SQLite database, empty."""
+    pytest.importorskip("aiosqlite")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'metrics.sqlite3'}")
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def session_factory(sqlite_engine):
+    """Session factory bound to a SQLite database with every table created."""
+    async with sqlite_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(bind=sqlite_engine, class_=AsyncSession, expire_on_commit=False)
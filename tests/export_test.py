@@ -0,0 +1,62 @@
+import gzip
+import json
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient, ASGITransport
+from fastapi import FastAPI
+from unittest.mock import patch
+
+from app.api.export import router, gzip_chunks
+from app.models.sample import MetricSample
+from app.storage.storage import Storage
+
+test_app = FastAPI()
+test_app.include_router(router)
+
+
+@pytest_asyncio.fixture
+async def seeded_factory(session_factory):
+    items = [
+        MetricSample.from_dict({"time_stamp": f"2025-05-21T14:00:{i:02d}", "cpu_percent": float(i),
+                                "memory": {"used": i}, "disk": {"free": i}, "net_io": {"bytes_sent": i}})
+        for i in range(25)
+    ]
+    async with session_factory() as db:
+        await Storage().save_many_to_db(items, db)
+    with patch("app.api.export.AsyncSessionLocal", session_factory), \
+         patch("app.api.export.settings.EXPORT_CHUNK_SIZE", 10):
+        yield session_factory
+
+
+@pytest.mark.asyncio
+async def test_export_streams_ndjson(seeded_factory):
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/records/export", params={"from": "2025-05-21T14:00:05", "to": "2025-05-21T14:00:20"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == list(range(6, 21))
+    assert lines[0] == {
+        "id": 6, "host": "unknown", "tags": None, "timestamp": "2025-05-21T14:00:05", "cpu_percent": 5.0,
+        "memory": {"used": 5}, "disk": {"free": 5}, "net_io": {"bytes_sent": 5},
+    }
+
+
+@pytest.mark.asyncio
+async def test_export_gzip(seeded_factory):
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/records/export", params={"gzip": "true"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.text.splitlines()) == 25
+
+
+@pytest.mark.asyncio
+async def test_gzip_chunks_roundtrip():
+    async def chunks():
+        for i in range(3):
+            yield f'{{"id": {i}}}\n'.encode()
+
+    compressed = b"".join([chunk async for chunk in gzip_chunks(chunks())])
+    assert gzip.decompress(compressed) == b'{"id": 0}\n{"id": 1}\n{"id": 2}\n'
@@ -3,7 +3,9 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from datetime import datetime, timezone
 import json
-from app.ingest.fetcher import Fetcher, logger  # Adjust import path as needed
+import threading
+from app.ingest.fetcher import Fetcher, logger, parse_tags  # Adjust import path as needed
+from app.ingest.collectors import build_collectors
 
 class TestFetcher:
     @pytest.fixture
@@ -15,6 +17,11 @@ class TestFetcher:
             mock.REQUEST_TIMEOUT = 5
             mock.MAX_RETRIES = 3
             mock.RETRY_BACKOFF = 1
+            mock.METRICS_CODEC = "json"
+            mock.HOST_NAME = "web-1"
+            mock.HOST_TAGS = "role=api"
+            mock.COLLECTOR_THREADS = 2
+            mock.COLLECTOR_TIMEOUT = 0.2
             yield mock
 
     @pytest.fixture
@@ -25,11 +32,17 @@ class TestFetcher:
             yield mock
 
     @pytest.fixture
-    def mock_psutil(self):
+    def mock_cpu_stat(self):
+        """Mock the shared /proc/stat reader"""
+        with patch('app.ingest.collectors.cpu_stat') as mock:
+            mock.read.return_value = (25.5, [25.5])
+            yield mock
+
+    @pytest.fixture
+    def mock_psutil(self, mock_cpu_stat):
         """Mock psutil methods"""
-        with patch('app.ingest.fetcher.psutil') as mock:
+        with patch('app.ingest.collectors.psutil') as mock:
             # Setup return values
-            mock.cpu_percent.return_value = 25.5
             mock.virtual_memory.return_value = MagicMock(
                 _asdict=lambda: {"total": 100, "used": 50}
             )
@@ -44,15 +57,17 @@ class TestFetcher:
     @pytest.fixture
     def fetcher(self, mock_settings, mock_publisher, mock_psutil):
         """Fixture providing a Fetcher instance with mocked dependencies"""
-        return Fetcher()
+        fetcher = Fetcher(collectors=build_collectors("cpu_percent,memory,disk,net_io", {}))
+        yield fetcher
+        fetcher.close()
 
     @pytest.mark.asyncio
-    async def test_fetch_metrics_success(self, fetcher, mock_psutil, caplog):
+    async def test_fetch_metrics_success(self, fetcher, mock_psutil, mock_cpu_stat, caplog):
         """Test successful metrics collection"""
         metrics = await fetcher.fetch_metrics()
         
         # Verify psutil calls
-        mock_psutil.cpu_percent.assert_called_once_with(interval=None)
+        mock_cpu_stat.read.assert_called_once()
         mock_psutil.virtual_memory.assert_called_once()
         mock_psutil.disk_usage.assert_called_once_with('/')
         mock_psutil.net_io_counters.assert_called_once()
@@ -75,6 +90,9 @@ class TestFetcher:
         assert args[0] == "metrics-channel"
         published_data = json.loads(args[1])
         assert published_data["cpu_percent"] == 25.5
+        assert published_data["host"] == "web-1"
+        assert published_data["tags"] == {"role": "api"}
+        assert mock_publisher.publish.call_args.kwargs["host"] == "web-1"
         
         # Verify return value
         assert result == published_data
@@ -121,4 +139,91 @@ class TestFetcher:
         try:
             datetime.fromisoformat(metrics["timestamp"])
         except ValueError:
-            pytest.fail("Timestamp is not in valid ISO format")
\ No newline at end of file
+            pytest.fail("Timestamp is not in valid ISO format")
+
+    @pytest.mark.asyncio
+    async def test_psutil_runs_off_the_event_loop(self, fetcher, mock_psutil):
+        """Collectors run in the worker threads, not on the loop thread"""
+        threads = set()
+        mock_psutil.disk_usage.side_effect = lambda path: threads.add(threading.current_thread().name) or MagicMock(
+            _asdict=lambda: {"total": 500}
+        )
+        await fetcher.fetch_metrics()
+        assert threads and all(name.startswith("collector") for name in threads)
+
+    @pytest.mark.asyncio
+    async def test_slow_collector_yields_degraded_sample(self, fetcher, mock_psutil, caplog):
+        """A hung disk read times out into a partial, flagged sample"""
+        release = threading.Event()
+        mock_psutil.disk_usage.side_effect = lambda path: release.wait(5)
+        try:
+            metrics = await fetcher.fetch_metrics()
+            assert metrics["degraded"] is True
+            assert metrics["missing"] == ["disk"]
+            assert metrics["disk"] is None
+            assert metrics["memory"]["total"] == 100
+            assert "Collector group 'disk' timed out" in caplog.text
+
+            # the stuck group is skipped rather than given another thread
+            await fetcher.fetch_metrics()
+            assert mock_psutil.disk_usage.call_count == 1
+            assert "still blocked" in caplog.text
+        finally:
+            release.set()
+
+    @pytest.mark.asyncio
+    async def test_failing_collector_is_reported_missing(self, fetcher, mock_psutil):
+        """A collector raising leaves the rest of its group intact"""
+        mock_psutil.net_io_counters.side_effect = OSError("no /proc/net/dev")
+        metrics = await fetcher.fetch_metrics()
+        assert metrics["missing"] == ["net_io"]
+        assert metrics["cpu_percent"] == 25.5
+        assert fetcher.degraded == 1
+
+    @pytest.mark.asyncio
+    async def test_collectors_run_on_their_own_interval(self, mock_settings, mock_publisher, mock_psutil, mock_cpu_stat):
+        """Slow collectors are read on their interval and their latest value is merged into every sample"""
+        now = [0.0]
+        mock_psutil.process_iter.return_value = [MagicMock(info={"pid": 1, "name": "a", "cpu_percent": 1.0, "memory_percent": 1.0})]
+        collectors = build_collectors("cpu_percent,top_processes", {"top_processes": 30})
+        fetcher = Fetcher(collectors=collectors, clock=lambda: now[0])
+        try:
+            for tick in range(5):
+                now[0] = tick * 10.0
+                metrics = await fetcher.fetch_metrics()
+                assert metrics["top_processes"][0]["pid"] == 1
+                assert "degraded" not in metrics
+        finally:
+            fetcher.close()
+
+        assert mock_cpu_stat.read.call_count == 5
+        assert mock_psutil.process_iter.call_count == 2 # at t=0 and t=30
+
+    @pytest.mark.asyncio
+    async def test_device_counters_get_rates_on_fresh_reads(self, mock_settings, mock_publisher, mock_psutil):
+        """Per-disk rates are derived when disk_io is read, and carried unchanged between its reads"""
+        now = [0.0]
+        reads = iter([1000, 1000, 51000])
+        mock_psutil.disk_io_counters.side_effect = lambda perdisk: {
+            "sda": MagicMock(_asdict=lambda value=next(reads): {"read_bytes": value, "write_bytes": 0})
+        }
+        fetcher = Fetcher(collectors=build_collectors("cpu_percent,disk_io", {"disk_io": 5}), clock=lambda: now[0])
+        try:
+            samples = []
+            for tick in range(7): # disk_io is read at t=0, 6 and 12
+                now[0] = float(tick * 2)
+                samples.append(await fetcher.fetch_metrics())
+        finally:
+            fetcher.close()
+
+        rates = [sample["disk_io"]["sda"]["read_bytes_rate"] for sample in samples]
+        assert rates[:6] == [None, None, None, 0.0, 0.0, 0.0] # ticks between reads repeat the last read and its rate
+        assert rates[6] > 0
+        assert mock_psutil.disk_io_counters.call_count == 3
+
+
+def test_parse_tags():
+    assert parse_tags("role=api, dc = eu-1") == {"role": "api", "dc": "eu-1"}
+    assert parse_tags("") == {}
+    with pytest.raises(ValueError):
+        parse_tags("role")
@@ -0,0 +1,297 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.api.hub import BroadcastHub, WebSocketClient, parse_subscription, project
+
+
+class FakeSubscriber:
+    """Subscriber double whose listen() yields whatever the test publishes."""
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.subscribe = AsyncMock()
+        self.unsubscribe = AsyncMock()
+        self.close = AsyncMock()
+        self.listens = 0
+
+    async def listen(self):
+        self.listens += 1
+        while True:
+            yield await self.queue.get()
+
+    async def publish(self, channel, data):
+        await self.queue.put({"type": "message", "channel": channel, "data": data})
+        await asyncio.sleep(0.01)  # let the listener fan the message out
+
+
+def make_ws():
+    return MagicMock(send_text=AsyncMock(), send_bytes=AsyncMock())
+
+
+@pytest.fixture
+def subscriber():
+    return FakeSubscriber()
+
+
+@pytest.fixture
+def hub(subscriber):
+    return BroadcastHub(subscriber)
+
+
+@pytest.mark.asyncio
+async def test_one_subscription_fans_out_to_all_clients(hub, subscriber):
+    clients = [make_ws() for _ in range(3)]
+    for ws in clients:
+        await hub.join("metrics-channel", ws)
+
+    await subscriber.publish("metrics-channel", "tick")
+
+    subscriber.subscribe.assert_awaited_once_with("metrics-channel")
+    assert subscriber.listens == 1
+    for ws in clients:
+        ws.send_text.assert_awaited_once_with("tick")
+
+
+class DownSubscriber(FakeSubscriber):
+    """Redis is down for the first subscribe: the error is swallowed and listen() returns at once, like redis-py."""
+    def __init__(self):
+        super().__init__()
+        self.subscribed = False
+        self.subscribe = AsyncMock(side_effect=self._subscribe)
+
+    async def _subscribe(self, channel):
+        if self.subscribe.await_count > 1:
+            self.subscribed = True
+
+    async def listen(self):
+        self.listens += 1
+        if not self.subscribed:
+            if self.listens > 100: # break a busy loop so the test fails instead of hanging
+                raise RuntimeError("listener is spinning")
+            return
+        while True:
+            yield await self.queue.get()
+
+
+@pytest.mark.asyncio
+async def test_failed_subscribe_is_retried_without_blocking_the_loop():
+    subscriber = DownSubscriber()
+    hub = BroadcastHub(subscriber, retry_delay=0.01)
+    ws = make_ws()
+    await hub.join("metrics-channel", ws)
+
+    await asyncio.sleep(0.05)
+    await subscriber.publish("metrics-channel", "tick")
+
+    assert subscriber.listens == 2 # one empty listen, then the one after re-subscribing
+    subscriber.subscribe.assert_awaited_with("metrics-channel")
+    ws.send_text.assert_awaited_once_with("tick")
+    await hub.leave("metrics-channel", ws)
+
+
+@pytest.mark.asyncio
+async def test_leaving_client_does_not_affect_others(hub, subscriber):
+    first, second = make_ws(), make_ws()
+    await hub.join("metrics-channel", first)
+    await hub.join("metrics-channel", second)
+
+    await hub.leave("metrics-channel", first)
+    await subscriber.publish("metrics-channel", "tick")
+
+    subscriber.unsubscribe.assert_not_awaited()
+    first.send_text.assert_not_awaited()
+    second.send_text.assert_awaited_once_with("tick")
+
+    await hub.leave("metrics-channel", second)
+    subscriber.unsubscribe.assert_awaited_once_with("metrics-channel")
+    subscriber.close.assert_not_awaited()
+    assert hub._listener is None
+
+
+@pytest.mark.asyncio
+async def test_failed_send_drops_only_that_client(hub, subscriber):
+    broken, healthy = make_ws(), make_ws()
+    broken.send_text.side_effect = RuntimeError("socket closed")
+    await hub.join("metrics-channel", broken)
+    await hub.join("metrics-channel", healthy)
+
+    await subscriber.publish("metrics-channel", "one")
+    await subscriber.publish("metrics-channel", "two")
+
+    assert hub.client_count("metrics-channel") == 1
+    assert broken.send_text.await_count == 1
+    assert healthy.send_text.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_messages_are_routed_by_channel(hub, subscriber):
+    metrics_ws, alerts_ws = make_ws(), make_ws()
+    await hub.join("metrics-channel", metrics_ws)
+    await hub.join("alerts-channel", alerts_ws)
+
+    await subscriber.publish("alerts-channel", "alert")
+
+    metrics_ws.send_text.assert_not_awaited()
+    alerts_ws.send_text.assert_awaited_once_with("alert")
+    assert subscriber.listens == 1
+    await hub.leave("metrics-channel", metrics_ws)
+    await hub.leave("alerts-channel", alerts_ws)
+
+
+@pytest.mark.asyncio
+async def test_slow_client_does_not_delay_others(hub, subscriber):
+    release = asyncio.Event()
+    slow, fast = make_ws(), make_ws()
+
+    async def stuck_send(data):
+        await release.wait()
+
+    slow.send_text.side_effect = stuck_send
+    await hub.join("metrics-channel", slow, max_size=2, policy="drop_oldest")
+    await hub.join("metrics-channel", fast)
+
+    for i in range(5):
+        await subscriber.publish("metrics-channel", f"m{i}")
+
+    assert [c.args[0] for c in fast.send_text.await_args_list] == ["m0", "m1", "m2", "m3", "m4"]
+    slow_stats = hub.stats()["metrics-channel"][0]
+    # m0 is stuck in send_text, m1 and m2 were pushed out of the 2-slot queue by m3 and m4
+    assert slow_stats["queued"] == 2
+    assert slow_stats["dropped"] == 2
+
+    release.set()
+    await asyncio.sleep(0.01)
+    assert [c.args[0] for c in slow.send_text.await_args_list] == ["m0", "m3", "m4"]
+    await hub.leave("metrics-channel", slow)
+    await hub.leave("metrics-channel", fast)
+
+
+@pytest.mark.asyncio
+async def test_latest_policy_coalesces_to_newest_snapshot():
+    ws = make_ws()
+    client = WebSocketClient(ws, max_size=10, policy="latest")
+    for i in range(4):
+        client.offer(f"m{i}")
+
+    task = asyncio.create_task(client.run())
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    ws.send_text.assert_awaited_once_with("m3")
+    assert client.stats()["dropped"] == 3
+    assert client.stats()["sent"] == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        WebSocketClient(make_ws(), policy="block")
+
+
+SAMPLE = json.dumps({
+    "timestamp": "2025-05-21T14:00:00+00:00",
+    "cpu_percent": 12.5,
+    "memory": {"total": 100, "used": 50, "percent": 50.0},
+    "disk": {"percent": 10.0},
+})
+
+
+def test_parse_subscription():
+    assert parse_subscription('{"fields": ["memory.percent", "cpu_percent"], "max_rate": 2}') == (
+        ("cpu_percent", "memory.percent"), 2.0
+    )
+    assert parse_subscription("{}") == (None, None)
+    for bad in ('[]', '{"fields": []}', '{"fields": [1]}', '{"max_rate": 0}', '{"max_rate": true}', "not json"):
+        with pytest.raises(ValueError):
+            parse_subscription(bad)
+
+
+def test_project_keeps_requested_paths():
+    assert project(json.loads(SAMPLE), ("cpu_percent", "memory.percent", "net_io.bytes_sent")) == {
+        "timestamp": "2025-05-21T14:00:00+00:00",
+        "cpu_percent": 12.5,
+        "memory": {"percent": 50.0},
+    }  # net_io is missing from the sample, so it is left out
+
+
+def test_project_copies_groups_it_extends():
+    sample = json.loads(SAMPLE)
+    assert project(sample, ("memory", "memory.cached")) == {
+        "timestamp": "2025-05-21T14:00:00+00:00",
+        "memory": {"total": 100, "used": 50, "percent": 50.0, "cached": None},
+    }
+    assert sample["memory"] == {"total": 100, "used": 50, "percent": 50.0}
+
+
+def test_project_skips_null_groups():
+    sample = {**json.loads(SAMPLE), "memory": None}  # as in a degraded sample
+    assert project(sample, ("memory", "memory.percent", "disk.percent")) == {
+        "timestamp": "2025-05-21T14:00:00+00:00",
+        "disk": {"percent": 10.0},
+    }
+
+
+@pytest.mark.asyncio
+async def test_each_projection_is_encoded_once_per_message(hub, subscriber):
+    cpu_clients = [make_ws() for _ in range(3)]
+    full, mem = make_ws(), make_ws()
+    for ws in cpu_clients:
+        client = await hub.join("metrics-channel", ws)
+        client.subscribe(("cpu_percent",), None)
+    await hub.join("metrics-channel", full)
+    (await hub.join("metrics-channel", mem)).subscribe(("memory.used",), None)
+
+    await subscriber.publish("metrics-channel", SAMPLE)
+
+    assert hub.encodes == 2  # one per distinct projection, none for the full payload
+    for ws in cpu_clients:
+        assert json.loads(ws.send_text.await_args.args[0]) == {"timestamp": "2025-05-21T14:00:00+00:00", "cpu_percent": 12.5}
+    payloads = {ws.send_text.await_args.args[0] for ws in cpu_clients}
+    assert len(payloads) == 1
+    full.send_text.assert_awaited_once_with(SAMPLE)
+    assert json.loads(mem.send_text.await_args.args[0])["memory"] == {"used": 50}
+
+
+@pytest.mark.asyncio
+async def test_max_rate_downsamples_per_client(hub):
+    slow_ws, fast_ws = make_ws(), make_ws()
+    (await hub.join("metrics-channel", slow_ws)).subscribe(None, 1.0)
+    await hub.join("metrics-channel", fast_ws)
+
+    with patch("app.api.hub.time.monotonic") as monotonic:
+        for i in range(10):  # 4 Hz for 2.5 seconds
+            monotonic.return_value = 1000 + i * 0.25
+            await hub.broadcast("metrics-channel", f"m{i}")
+            await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+
+    assert [c.args[0] for c in slow_ws.send_text.await_args_list] == ["m0", "m4", "m8"]
+    assert fast_ws.send_text.await_count == 10
+    assert hub.stats()["metrics-channel"][0]["skipped"] == 7
+
+
+@pytest.mark.asyncio
+async def test_binary_payloads_are_relayed_or_decoded_once(hub, subscriber):
+    from app.ingest.codec import StructCodec
+    payload = StructCodec().encode(json.loads(SAMPLE))
+    raw_clients = [make_ws() for _ in range(2)]
+    json_ws, cpu_ws = make_ws(), make_ws()
+    for ws in raw_clients:
+        await hub.join("metrics-channel", ws, binary=True)
+    await hub.join("metrics-channel", json_ws)
+    (await hub.join("metrics-channel", cpu_ws)).subscribe(("cpu_percent",), None)
+
+    await subscriber.publish("metrics-channel", payload)
+
+    for ws in raw_clients:
+        ws.send_bytes.assert_awaited_once_with(payload)
+    assert json.loads(json_ws.send_text.await_args.args[0])["memory"]["used"] == 50
+    assert json.loads(cpu_ws.send_text.await_args.args[0])["cpu_percent"] == 12.5
+    assert hub.encodes == 2
+
+
+def test_binary_clients_cannot_project():
+    client = WebSocketClient(make_ws(), binary=True)
+    with pytest.raises(ValueError):
+        client.subscribe(("cpu_percent",), None)
+    client.subscribe(None, 2.0)
+    assert client.min_interval == 0.5
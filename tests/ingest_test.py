@@ -0,0 +1,98 @@
+import gzip
+import json
+import pytest
+from fastapi import FastAPI, status
+from httpx import AsyncClient, ASGITransport
+from unittest.mock import AsyncMock, patch
+
+from app.api.ingest import router
+from app.storage.database import get_db_session
+
+test_app = FastAPI()
+test_app.include_router(router)
+test_app.dependency_overrides[get_db_session] = lambda: None
+
+
+def make_sample(i, **overrides):
+    return {"host": "web-1", "time_stamp": f"2025-05-21T14:00:{i:02d}+00:00", "cpu_percent": 10.0,
+            "memory": {"used": i}, "disk": {"used": i}, "net_io": {"bytes_sent": i}, **overrides}
+
+
+@pytest.fixture
+def storage_mocks():
+    with patch("app.api.ingest.storage.save_many_to_db", new_callable=AsyncMock) as save, \
+            patch("app.api.ingest.propagate_batch", new_callable=AsyncMock) as propagate:
+        save.side_effect = lambda items, db: list(range(1, len(items) + 1))
+        yield save, propagate
+
+
+async def post(content: bytes, headers: dict | None = None):
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        return await ac.post("/ingest", content=content, headers=headers or {})
+
+
+@pytest.mark.asyncio
+async def test_ingest_gzip_batch(storage_mocks):
+    save, propagate = storage_mocks
+    body = gzip.compress(json.dumps({"samples": [make_sample(i) for i in range(3)]}).encode())
+    response = await post(body, {"Content-Encoding": "gzip"})
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json() == {"accepted": 3}
+    (items, _), _ = save.call_args
+    assert len(items) == 3 and items[0].host == "web-1"
+    propagate.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_one_invalid_sample_rejects_the_batch(storage_mocks):
+    save, _ = storage_mocks
+    samples = [make_sample(0), make_sample(1, cpu_percent=250.0)]
+    response = await post(json.dumps({"samples": samples}).encode())
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert response.json()["detail"][0]["loc"] == ["samples", 1, "cpu_percent"]
+    save.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_bad_gzip_and_oversized_batches(storage_mocks):
+    assert (await post(b"not gzip", {"Content-Encoding": "gzip"})).status_code == status.HTTP_400_BAD_REQUEST
+    with patch("app.api.ingest.settings.INGEST_MAX_BATCH", 2):
+        response = await post(json.dumps({"samples": [make_sample(i) for i in range(3)]}).encode())
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    with patch("app.api.ingest.settings.INGEST_MAX_BYTES", 100):
+        body = gzip.compress(json.dumps({"samples": [make_sample(i) for i in range(10)]}).encode())
+        response = await post(body, {"Content-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.asyncio
+async def test_storage_failure_asks_agent_to_retry(storage_mocks):
+    save, propagate = storage_mocks
+    save.side_effect = None
+    save.return_value = []
+    response = await post(json.dumps({"samples": [make_sample(0)]}).encode())
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    propagate.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_api_key_is_required_when_configured(storage_mocks):
+    body = json.dumps({"samples": [make_sample(0)]}).encode()
+    with patch("app.api.ingest.settings.API_KEY", "secret"):
+        assert (await post(body)).status_code == status.HTTP_401_UNAUTHORIZED
+        assert (await post(body, {"X-API-Key": "secret"})).status_code == status.HTTP_202_ACCEPTED
+
+
+@pytest.mark.asyncio
+async def test_ingest_publishes_per_host(storage_mocks):
+    with patch("app.api.ingest.publisher.publish_many", new_callable=AsyncMock) as publish_many:
+        samples = [make_sample(0), make_sample(1, host="web-2")]
+        response = await post(json.dumps({"samples": samples}).encode())
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    channel, messages = publish_many.await_args.args
+    assert channel == "metrics-channel"
+    assert [host for host, _ in messages] == ["web-1", "web-2"]
+    assert json.loads(messages[1][1])["timestamp"] == "2025-05-21T14:00:01+00:00"
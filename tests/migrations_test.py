@@ -0,0 +1,153 @@
+import json
+import pytest
+from sqlalchemy import inspect, select, text
+
+from app.models.models import MetricsModel
+from app.storage.migrations import migrate_blob_layout
+
+LEGACY_DDL = """
+CREATE TABLE resources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    time_stamp DATETIME NOT NULL,
+    cpu_percent VARCHAR NOT NULL,
+    memory VARCHAR NOT NULL,
+    disk VARCHAR NOT NULL,
+    net_io VARCHAR NOT NULL
+)
+"""
+
+
+@pytest.fixture
+def engine(sqlite_engine):
+    return sqlite_engine
+
+
+async def seed_legacy(engine, rows):
+    async with engine.begin() as conn:
+        await conn.execute(text(LEGACY_DDL))
+        await conn.execute(text("CREATE INDEX ix_resources_id ON resources (id)"))
+        for i in range(rows):
+            await conn.execute(
+                text("INSERT INTO resources (time_stamp, cpu_percent, memory, disk, net_io) VALUES (:ts, :cpu, :mem, :disk, :net)"),
+                {
+                    "ts": f"2025-05-21 14:00:{i:02d}.000000",
+                    "cpu": str(10.5 + i),
+                    "mem": json.dumps({"total": 16000, "used": 8000 + i, "percent": 50.0}),
+                    "disk": json.dumps({"total": 500000, "used": 250000, "free": 250000}),
+                    "net": json.dumps({"bytes_sent": 1000 * i, "bytes_recv": 2000 * i}),
+                }
+            )
+
+
+@pytest.mark.asyncio
+async def test_migrates_blob_rows_to_typed_columns(engine):
+    await seed_legacy(engine, 7)
+
+    migrated = await migrate_blob_layout(engine, chunk_size=3)
+    assert migrated == 7
+
+    async with engine.connect() as conn:
+        rows = (await conn.execute(select(MetricsModel).order_by(MetricsModel.id))).all()
+        tables = await conn.run_sync(lambda c: inspect(c).get_table_names())
+        indexes = await conn.run_sync(lambda c: {i["name"] for i in inspect(c).get_indexes("resources")})
+
+    assert [row.id for row in rows] == list(range(1, 8))
+    assert rows[2].cpu_percent == 12.5
+    assert rows[2].mem_used == 8002
+    assert rows[2].disk_free == 250000
+    assert rows[2].net_bytes_recv == 4000
+    assert rows[2].net_packets_sent is None
+    assert "resources_legacy" not in tables
+    assert "ix_resources_time_stamp_id" in indexes
+
+
+@pytest.mark.asyncio
+async def test_migration_is_noop_on_typed_layout(engine):
+    await seed_legacy(engine, 2)
+    await migrate_blob_layout(engine)
+    assert await migrate_blob_layout(engine) == 0
+
+
+@pytest.mark.asyncio
+async def test_migration_creates_fresh_schema(engine):
+    assert await migrate_blob_layout(engine) == 0
+    async with engine.connect() as conn:
+        columns = await conn.run_sync(lambda c: {col["name"] for col in inspect(c).get_columns("resources")})
+    assert {"mem_used", "disk_percent", "net_bytes_sent"} <= columns
+    assert "memory" not in columns
+
+
+@pytest.mark.asyncio
+async def test_migration_adds_new_columns_to_typed_layout(engine):
+    await migrate_blob_layout(engine)
+    async with engine.begin() as conn:
+        await conn.execute(text("ALTER TABLE resources DROP COLUMN net_bytes_sent_rate"))
+
+    assert await migrate_blob_layout(engine) == 0
+    async with engine.connect() as conn:
+        columns = await conn.run_sync(lambda c: {col["name"] for col in inspect(c).get_columns("resources")})
+    assert "net_bytes_sent_rate" in columns
+
+
+@pytest.mark.asyncio
+async def test_migration_keeps_rollup_rows_when_adding_the_host_key(engine):
+    await migrate_blob_layout(engine)
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP TABLE rollup_1d"))
+        await conn.execute(text(
+            "CREATE TABLE rollup_1d (metric VARCHAR(32), bucket DATETIME, count INTEGER NOT NULL, min FLOAT NOT NULL, "
+            "max FLOAT NOT NULL, sum FLOAT NOT NULL, last FLOAT NOT NULL, last_at DATETIME NOT NULL, PRIMARY KEY (metric, bucket))"
+        ))
+        await conn.execute(text(
+            "INSERT INTO rollup_1d VALUES ('cpu_percent', '2023-01-01 00:00:00.000000', 10, 1.0, 9.0, 50.0, 4.0, '2023-01-01 23:59:00.000000'),"
+            " ('mem_used', '2023-01-01 00:00:00.000000', 10, 5.0, 5.0, 50.0, 5.0, '2023-01-01 23:59:00.000000')"
+        ))
+
+    await migrate_blob_layout(engine)
+    async with engine.connect() as conn:
+        rows = (await conn.execute(text("SELECT host, metric, count, sum, last FROM rollup_1d ORDER BY metric"))).all()
+        indexes = await conn.run_sync(lambda c: {i["name"] for i in inspect(c).get_indexes("rollup_1d")})
+        tables = await conn.run_sync(lambda c: inspect(c).get_table_names())
+    assert [tuple(row) for row in rows] == [("unknown", "cpu_percent", 10, 50.0, 4.0), ("unknown", "mem_used", 10, 50.0, 5.0)]
+    assert "ix_rollup_1d_bucket" in indexes
+    assert "rollup_1d_legacy" not in tables
+
+
+@pytest.mark.asyncio
+async def test_migration_adds_bucket_indexes_for_retention(engine):
+    await migrate_blob_layout(engine)
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_rollup_1h_bucket"))
+        await conn.execute(text("DROP INDEX ix_sketch_1d_bucket"))
+
+    await migrate_blob_layout(engine)
+    async with engine.connect() as conn:
+        rollup = await conn.run_sync(lambda c: {i["name"] for i in inspect(c).get_indexes("rollup_1h")})
+        sketch = await conn.run_sync(lambda c: {i["name"] for i in inspect(c).get_indexes("sketch_1d")})
+        # retention's oldest-first chunk reads the index instead of sorting the table
+        plan = (await conn.execute(text(
+            "EXPLAIN QUERY PLAN SELECT host, metric, bucket FROM rollup_1h WHERE bucket < '2025-05-21' ORDER BY bucket LIMIT 10"
+        ))).all()
+    assert "ix_rollup_1h_bucket" in rollup and "ix_sketch_1d_bucket" in sketch
+    assert "ix_rollup_1h_bucket" in " ".join(row[-1] for row in plan)
+
+
+
+@pytest.mark.asyncio
+async def test_migration_adds_host_and_rebuilds_rollups(engine):
+    await seed_legacy(engine, 2)
+    await migrate_blob_layout(engine)
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_resources_host_time_stamp_id"))
+        await conn.execute(text("ALTER TABLE resources DROP COLUMN host"))
+        await conn.execute(text("DROP TABLE rollup_1m"))
+        await conn.execute(text("CREATE TABLE rollup_1m (metric VARCHAR(32), bucket DATETIME, count INTEGER, PRIMARY KEY (metric, bucket))"))
+
+    await migrate_blob_layout(engine)
+    async with engine.connect() as conn:
+        hosts = (await conn.execute(text("SELECT DISTINCT host FROM resources"))).scalars().all()
+        rollup_columns = await conn.run_sync(lambda c: {col["name"] for col in inspect(c).get_columns("rollup_1m")})
+        indexes = await conn.run_sync(lambda c: {i["name"] for i in inspect(c).get_indexes("resources")})
+    assert hosts == ["unknown"]
+    assert "host" in rollup_columns # a layout missing required columns can only be rebuilt empty
+    assert "ix_resources_host_time_stamp_id" in indexes
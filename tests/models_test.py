@@ -0,0 +1,33 @@
+from datetime import datetime
+from app.models.models import Metrics, MetricsModel, flatten_metrics
+
+
+def test_flatten_metrics_picks_typed_columns():
+    row = flatten_metrics({
+        "memory": {"total": 100, "used": 50, "percent": 50.0},
+        "disk": {"free": 10},
+        "net_io": None,
+    })
+    assert row["mem_total"] == 100
+    assert row["mem_percent"] == 50.0
+    assert row["disk_free"] == 10
+    assert row["disk_used"] is None
+    assert row["net_bytes_sent"] is None
+
+
+def test_metrics_schema_reads_nested_views_from_model():
+    record = MetricsModel(
+        id=3,
+        time_stamp=datetime(2025, 5, 21, 14, 0),
+        cpu_percent=12.5,
+        mem_used=8000,
+        mem_percent=50.0,
+        disk_free=250000,
+        net_bytes_sent=1000,
+    )
+    metrics = Metrics.model_validate(record)
+    assert metrics.cpu_percent == 12.5
+    assert metrics.memory == {"used": 8000, "percent": 50.0}
+    assert metrics.disk == {"free": 250000}
+    assert metrics.net_io == {"bytes_sent": 1000}
+    assert metrics.model_dump(by_alias=True)["timestamp"] == datetime(2025, 5, 21, 14, 0)
@@ -0,0 +1,139 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.models.sample import MetricSample
+from app.pipeline import Pipeline
+from app.storage.spool import Spool
+from app.transform.anomaly import AnomalyDetector
+
+
+@pytest.fixture
+def pipeline():
+    with patch("app.pipeline.CachePanel"):
+        pipeline = Pipeline(interval=0.5)
+    pipeline.fetcher = MagicMock(run=AsyncMock())
+    pipeline.writer = MagicMock(add_many=AsyncMock(), close=AsyncMock())
+    pipeline.cache = MagicMock(cache_many=AsyncMock(), forget_coverage=AsyncMock())
+    pipeline.rollups = MagicMock(flush=AsyncMock())
+    return pipeline
+
+
+@pytest.mark.asyncio
+async def test_tick_hands_sample_to_batch_writer(pipeline):
+    pipeline.fetcher.run.return_value = {
+        "timestamp": "2025-05-21T14:00:00+00:00",
+        "cpu_percent": 12.5,
+        "memory": {"used": 1},
+        "disk": {"used": 2},
+        "net_io": {"bytes_sent": 3},
+    }
+    await pipeline.tick()
+
+    pipeline.writer.add_many.assert_awaited_once()
+    (items,) = pipeline.writer.add_many.call_args.args
+    assert isinstance(items[0], MetricSample)
+    assert items[0].cpu_percent == 12.5
+
+
+@pytest.mark.asyncio
+async def test_tick_hands_sample_to_stream_transport(pipeline):
+    pipeline.stream = MagicMock(add_many=AsyncMock())
+    pipeline.fetcher.run.return_value = {
+        "timestamp": "2025-05-21T14:00:00+00:00",
+        "cpu_percent": 12.5,
+        "memory": {"used": 1},
+        "disk": {"used": 2},
+        "net_io": {"bytes_sent": 3},
+    }
+    await pipeline.tick()
+
+    pipeline.stream.add_many.assert_awaited_once()
+    pipeline.writer.add_many.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_tick_without_data_skips_storage(pipeline, caplog):
+    pipeline.fetcher.run.return_value = None
+    await pipeline.tick()
+    pipeline.writer.add_many.assert_not_awaited()
+    assert "No data fetched." in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_flushed_batch_is_rolled_up_and_cached(pipeline):
+    items = [
+        MetricSample.from_dict({"time_stamp": f"2025-05-21T14:00:0{i}", "cpu_percent": float(i), "memory": {"used": i}, "disk": {}, "net_io": {}})
+        for i in (1, 2)
+    ]
+    await pipeline._after_flush(items, [7, 8])
+    pipeline.rollups.add_many.assert_called_once_with(items)
+    pipeline.rollups.flush.assert_awaited_once()
+    (records,) = pipeline.cache.cache_many.call_args.args
+    assert records[1] == {"id": 8, "host": "unknown", "tags": None, "timestamp": "2025-05-21T14:00:02", "cpu_percent": 2.0,
+                          "memory": {"used": 2}, "disk": {}, "net_io": {}}
+
+
+@pytest.mark.asyncio
+async def test_copy_batches_are_not_cached(pipeline):
+    await pipeline._after_flush([MetricSample(0, 1.0)], [])
+    pipeline.cache.cache_many.assert_not_awaited()
+    pipeline.cache.forget_coverage.assert_awaited_once() # recent reads must not trust the hot window
+
+
+@pytest.mark.asyncio
+@patch("app.pipeline.init_db", new_callable=AsyncMock)
+async def test_run_once_flushes_writer(mock_init_db, pipeline):
+    pipeline.fetcher.run.return_value = None
+    await pipeline.run_once()
+    mock_init_db.assert_awaited_once()
+    pipeline.writer.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_tick_publishes_alerts(pipeline):
+    pipeline.detector = AnomalyDetector(metrics="", thresholds="cpu_percent=90:80")
+    pipeline.fetcher.run.return_value = {
+        "timestamp": "2025-05-21T14:00:00+00:00",
+        "host": "web-1",
+        "cpu_percent": 97.0,
+        "memory": {"used": 1},
+        "disk": {"used": 2},
+        "net_io": {"bytes_sent": 3},
+    }
+    with patch("app.pipeline.publisher", MagicMock(publish_many=AsyncMock())) as publisher:
+        await pipeline.tick()
+        await pipeline.tick() # still firing, nothing new
+
+    publisher.publish_many.assert_awaited_once()
+    channel, [(host, message)] = publisher.publish_many.call_args.args
+    assert (channel, host) == ("alerts-channel", "web-1")
+    assert json.loads(message) == {"type": "threshold", "state": "firing", "host": "web-1", "metric": "cpu_percent",
+                                   "value": 97.0, "timestamp": "2025-05-21T14:00:00+00:00", "threshold": 90.0}
+
+
+@pytest.mark.asyncio
+async def test_stream_outage_is_spooled_and_replayed(pipeline, tmp_path):
+    pipeline.stream = MagicMock(add_many=AsyncMock(return_value=[]))
+    pipeline.stream_spool = Spool(tmp_path)
+    pipeline.fetcher.run.return_value = {
+        "timestamp": "2025-05-21T14:00:00+00:00",
+        "cpu_percent": 12.5,
+        "memory": {"used": 1},
+        "disk": {"used": 2},
+        "net_io": {"bytes_sent": 3},
+    }
+    await pipeline.tick()
+    assert pipeline.stream_spool.pending() > 0
+
+    pipeline.stream.add_many.return_value = ["1-0"] # Redis is back
+    await pipeline.tick()
+    assert pipeline.stream_spool.pending() > 0 # the tick returns before the replay
+    replay = pipeline._stream_replay
+    await pipeline.tick() # no second replay while one runs
+    assert pipeline._stream_replay is replay
+    await replay
+
+    assert pipeline.stream_spool.pending() == 0
+    assert pipeline._stream_replay is None
+    replayed = pipeline.stream.add_many.call_args.args[0]
+    assert [item.cpu_percent for item in replayed] == [12.5]
@@ -1,7 +1,7 @@
 # test_publisher.py
 import pytest
 from unittest.mock import AsyncMock, patch
-from app.ingest.publisher import Publisher, logger  # Adjust import path as needed
+from app.ingest.publisher import Publisher, host_channel, logger  # Adjust import path as needed
 
 class TestPublisher:
     @pytest.fixture
@@ -22,7 +22,7 @@ class TestPublisher:
         mock_redis.publish.return_value = 1  # Return number of subscribers
         
         # Execute
-        await publisher.publish("test_channel", "test_message")
+        assert await publisher.publish("test_channel", "test_message") is True
         
         # Verify Redis interaction
         mock_redis.publish.assert_awaited_once_with("test_channel", "test_message")
@@ -37,7 +37,7 @@ class TestPublisher:
         mock_redis.publish.side_effect = Exception("Redis connection error")
         
         # Execute and verify exception is handled
-        await publisher.publish("test_channel", "test_message")
+        assert await publisher.publish("test_channel", "test_message") is False
         
         # Verify logging
         assert "Failed to publish message: Redis connection error" in caplog.text
@@ -65,4 +65,27 @@ class TestPublisher:
             mock_from_url.assert_called_once_with(
                 "redis://localhost:6379",
                 decode_responses=True
-            )
\ No newline at end of file
+            )
+
+    @pytest.mark.asyncio
+    async def test_publish_to_host_channel(self):
+        """A host's samples also go to its own channel"""
+        fakeredis = pytest.importorskip("fakeredis")
+        fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+        with patch('redis.asyncio.from_url', return_value=fake):
+            publisher = Publisher()
+        shared, own = fake.pubsub(), fake.pubsub()
+        await shared.subscribe("metrics-channel")
+        await own.subscribe(host_channel("metrics-channel", "web-1"))
+
+        await publisher.publish("metrics-channel", "a", host="web-1")
+        await publisher.publish_many("metrics-channel", [("web-2", "b"), ("web-1", "c")])
+
+        async def messages(pubsub):
+            received = []
+            while (message := await pubsub.get_message(timeout=0.1)) is not None:
+                if message["type"] == "message":
+                    received.append(message["data"])
+            return received
+        assert await messages(shared) == ["a", "b", "c"]
+        assert await messages(own) == ["a", "c"]
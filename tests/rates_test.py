@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime, timedelta
+from app.models.sample import MetricSample, to_ns
+from app.transform.rates import RateTracker, counter_delta
+from app.transform.transformer import Transformer
+
+T0 = datetime(2025, 5, 21, 14, 0)
+
+
+def sample(seconds, **net_io):
+    return MetricSample(to_ns(T0 + timedelta(seconds=seconds)), 1.0, **{f"net_{key}": value for key, value in net_io.items()})
+
+
+def test_counter_delta_handles_wraps_and_resets():
+    assert counter_delta(100, 250) == 150
+    assert counter_delta(2 ** 32 - 100, 50) == 150 # 32-bit wrap
+    assert counter_delta(2 ** 64 - 10, 5) == 15 # 64-bit wrap
+    assert counter_delta(5_000_000, 1_000) is None # reset, not near the top of the range
+    assert counter_delta(2 ** 32 - 100, 2 ** 31) is None # too far past zero to be a wrap
+
+
+def test_first_sample_has_no_rate_then_per_second():
+    tracker = RateTracker()
+    first = tracker.apply(sample(0, bytes_sent=1000))
+    second = tracker.apply(sample(2, bytes_sent=5000))
+    assert (first.net_bytes_sent, first.net_bytes_sent_rate) == (1000, None)
+    assert second.net_bytes_sent_rate == 2000.0
+
+
+def test_wrap_and_reset_are_counted():
+    tracker = RateTracker()
+    tracker.apply(sample(0, bytes_recv=2 ** 32 - 1000))
+    wrapped = tracker.apply(sample(1, bytes_recv=1000))
+    reset = tracker.apply(sample(2, bytes_recv=10))
+    after = tracker.apply(sample(3, bytes_recv=110))
+    assert wrapped.net_bytes_recv_rate == 2000.0
+    assert reset.net_bytes_recv_rate is None
+    assert after.net_bytes_recv_rate == 100.0
+    assert (tracker.wraps, tracker.resets) == (1, 1)
+
+
+def test_out_of_order_and_missing_groups_keep_baseline():
+    tracker = RateTracker()
+    tracker.apply(sample(10, bytes_sent=1000))
+    assert tracker.apply(sample(5, bytes_sent=500)).net_bytes_sent_rate is None
+    # a degraded sample without net_io does not disturb the state
+    assert tracker.apply(MetricSample(to_ns(T0), 1.0, missing=["net_io"])).net_bytes_sent_rate is None
+    assert tracker.apply(sample(20, bytes_sent=3000)).net_bytes_sent_rate == 200.0
+
+
+def test_rates_are_kept_per_host():
+    tracker = RateTracker()
+    rates = []
+    for seconds, host, value in ((0, "a", 100), (0, "b", 5000), (2, "a", 300), (2, "b", 5500)):
+        item = sample(seconds, bytes_sent=value)
+        item.host = host
+        rates.append(tracker.apply(item).net_bytes_sent_rate)
+    assert rates == [None, None, 100.0, 250.0]
+
+
+def test_device_rates_are_kept_per_device_with_wraps_and_resets():
+    tracker = RateTracker()
+    def disks(seconds, sda, sdb):
+        devices = {"sda": {"read_bytes": sda, "write_bytes": 0, "read_count": 7}, "sdb": {"read_bytes": sdb}}
+        return tracker.apply_devices("disk_io", devices, to_ns(T0 + timedelta(seconds=seconds)), host="web-1")
+
+    first = disks(0, 1000, 2 ** 32 - 100)
+    assert first["sda"] == {"read_bytes": 1000, "read_bytes_rate": None, "write_bytes": 0, "write_bytes_rate": None,
+                            "read_count": 7}
+    second = disks(2, 5000, 300) # sdb wraps at 32 bits
+    assert (second["sda"]["read_bytes_rate"], second["sda"]["write_bytes_rate"]) == (2000.0, 0.0)
+    assert second["sdb"]["read_bytes_rate"] == 200.0
+    assert disks(3, 10, 400)["sda"]["read_bytes_rate"] is None # sda reset
+    assert (tracker.wraps, tracker.resets) == (1, 1)
+
+    nics = tracker.apply_devices("per_nic", {"eth0": {"bytes_sent": 10}}, to_ns(T0), host="web-1")
+    assert nics["eth0"]["bytes_sent_rate"] is None # not sda's or another group's state
+    nics = tracker.apply_devices("per_nic", {"eth0": {"bytes_sent": 510}}, to_ns(T0 + timedelta(seconds=5)), host="web-1")
+    assert nics["eth0"]["bytes_sent_rate"] == 100.0
+
+
+def test_transformer_emits_rates_as_stored_columns():
+    transformer = Transformer()
+    items = [
+        {"timestamp": (T0 + timedelta(seconds=s)).isoformat(), "cpu_percent": 5.0,
+         "memory": {"used": 1}, "disk": {"used": 1}, "net_io": {"bytes_sent": 1000 * s, "packets_sent": 10 * s}}
+        for s in (1, 3)
+    ]
+    first, second = transformer.transform(items)
+    assert first.net_bytes_sent_rate is None
+    assert second.net_bytes_sent_rate == pytest.approx(1000.0)
+    assert second.net_packets_sent_rate == pytest.approx(10.0)
+
+    row = second.to_row()
+    assert row["net_bytes_sent"] == 3000
+    assert row["net_bytes_sent_rate"] == pytest.approx(1000.0)
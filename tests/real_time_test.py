@@ -1,10 +1,15 @@
 # test_real_time_ws.py
+import asyncio
+import json
+import threading
+import time
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from starlette.websockets import WebSocketDisconnect
-from unittest.mock import AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
+from app.api.hub import BroadcastHub
 from app.api.real_time_ws import router  # Replace with actual import path to your FastAPI app
 
 app = FastAPI()
@@ -15,27 +20,22 @@ client = TestClient(app)
 
 @pytest.fixture
 def mock_sub():
-    mock_pubsub = AsyncMock()
-    mock_pubsub.get_message = AsyncMock()
+    async def listen():
+        yield {'channel': 'metrics-channel', 'data': 'test message', 'type': 'message'}
+        await asyncio.Event().wait()  # no more messages
 
     mock_sub = MagicMock()
     mock_sub.subscribe = AsyncMock()
     mock_sub.unsubscribe = AsyncMock()
     mock_sub.close = AsyncMock()
-    mock_sub.pubsub = mock_pubsub
+    mock_sub.listen = listen
 
     return mock_sub
 
 
 def test_websocket_receives_message(mock_sub, monkeypatch):
-    # Simulate one message and then timeout
-    mock_sub.pubsub.get_message.side_effect = [
-        {'data': 'test message', 'type': 'message'},
-        None,
-        WebSocketDisconnect()
-    ]
-
-    monkeypatch.setattr("app.api.real_time_ws.sub", mock_sub)
+    hub = BroadcastHub(mock_sub)
+    monkeypatch.setattr("app.api.real_time_ws.hub", hub)
 
     with client.websocket_connect("/ws/metrics") as websocket:
         msg = websocket.receive_text()
@@ -43,4 +43,78 @@ def test_websocket_receives_message(mock_sub, monkeypatch):
 
     mock_sub.subscribe.assert_awaited_once_with("metrics-channel")
     mock_sub.unsubscribe.assert_awaited_once_with("metrics-channel")
-    mock_sub.close.assert_awaited_once()
+    # the shared connection stays open for other clients and future subscriptions
+    mock_sub.close.assert_not_awaited()
+    assert hub.client_count() == 0
+
+
+def test_websocket_accepts_overflow_policy(mock_sub, monkeypatch):
+    hub = BroadcastHub(mock_sub)
+    monkeypatch.setattr("app.api.real_time_ws.hub", hub)
+
+    with client.websocket_connect("/ws/metrics?policy=latest") as websocket:
+        assert websocket.receive_text() == "test message"
+        stats = client.get("/ws/stats").json()
+        assert stats["metrics-channel"][0]["policy"] == "latest"
+        assert stats["metrics-channel"][0]["sent"] == 1
+
+
+def test_websocket_rejects_unknown_policy(mock_sub, monkeypatch):
+    monkeypatch.setattr("app.api.real_time_ws.hub", BroadcastHub(mock_sub))
+
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/ws/metrics?policy=block") as websocket:
+            websocket.receive_text()
+    mock_sub.subscribe.assert_not_awaited()
+
+
+def test_websocket_subscription_message(monkeypatch):
+    subscribed = threading.Event()
+
+    async def listen():
+        while not subscribed.is_set():  # hold the sample back until the client has subscribed
+            await asyncio.sleep(0.01)
+        yield {'channel': 'metrics-channel', 'data': '{"timestamp": "t", "cpu_percent": 1.0, "memory": {}}', 'type': 'message'}
+        await asyncio.Event().wait()
+
+    mock_sub = MagicMock(subscribe=AsyncMock(), unsubscribe=AsyncMock(), listen=listen)
+    monkeypatch.setattr("app.api.real_time_ws.hub", BroadcastHub(mock_sub))
+
+    with client.websocket_connect("/ws/metrics") as websocket:
+        websocket.send_text('{"fields": 5}')
+        assert "Invalid subscription" in websocket.receive_text()
+        websocket.send_text('{"fields": ["cpu_percent"], "max_rate": 1}')
+        for _ in range(100):  # the server applies the subscription asynchronously
+            if client.get("/ws/stats").json()["metrics-channel"][0]["fields"] == ["cpu_percent"]:
+                break
+            time.sleep(0.01)
+        subscribed.set()
+        assert json.loads(websocket.receive_text()) == {"timestamp": "t", "cpu_percent": 1.0}
+
+
+def test_websocket_host_filter_subscribes_host_channel(mock_sub, monkeypatch):
+    hub = BroadcastHub(mock_sub)
+    monkeypatch.setattr("app.api.real_time_ws.hub", hub)
+    mock_sub.subscribe.side_effect = lambda channel: None
+
+    with client.websocket_connect("/ws/metrics?host=web-1"):
+        pass
+    mock_sub.subscribe.assert_awaited_once_with("metrics-channel:web-1")
+
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/ws/metrics?host=bad host!") as websocket:
+            websocket.receive_text()
+    assert mock_sub.subscribe.await_count == 1
+
+
+def test_alerts_websocket_subscribes_alerts_channel(mock_sub, monkeypatch):
+    hub = BroadcastHub(mock_sub)
+    monkeypatch.setattr("app.api.real_time_ws.hub", hub)
+    mock_sub.subscribe.side_effect = lambda channel: None
+
+    with client.websocket_connect("/ws/alerts"):
+        pass
+    with client.websocket_connect("/ws/alerts?host=web-1"):
+        pass
+    assert [call.args[0] for call in mock_sub.subscribe.await_args_list] == ["alerts-channel", "alerts-channel:web-1"]
+    assert hub.client_count() == 0
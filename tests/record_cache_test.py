@@ -0,0 +1,70 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from app.models.models import Metrics
+from app.storage.record_cache import LRUCache, RecordCache
+
+
+def make_metrics(record_id):
+    return Metrics(id=record_id, timestamp="2025-05-21T14:00:00", cpu_percent=12.5,
+                   memory={"used": 1}, disk={}, net_io={})
+
+
+@pytest.fixture
+def redis_cache():
+    return MagicMock(get_cache=AsyncMock(return_value=None), put_record=AsyncMock())
+
+
+@pytest.fixture
+def store():
+    return MagicMock(get_record_from_db=AsyncMock(side_effect=lambda db, record_id: make_metrics(record_id)))
+
+
+@pytest.fixture
+def record_cache(redis_cache, store):
+    return RecordCache(redis_cache, store, max_size=2)
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(2)
+    lru.put(1, "a")
+    lru.put(2, "b")
+    assert lru.get(1) == "a"  # 1 is now the most recent
+    lru.put(3, "c")
+    assert lru.get(2) is None
+    assert lru.get(1) == "a"
+    assert len(lru) == 2
+
+
+@pytest.mark.asyncio
+async def test_db_read_populates_upper_tiers(record_cache, redis_cache, store):
+    record = await record_cache.get(None, 1)
+    assert record["id"] == 1
+    assert record["timestamp"] == "2025-05-21T14:00:00"
+    redis_cache.put_record.assert_awaited_once_with(record)
+
+    assert await record_cache.get(None, 1) == record
+    store.get_record_from_db.assert_awaited_once()
+    assert redis_cache.get_cache.await_count == 1
+    assert record_cache.stats()["db_hits"] == 1
+    assert record_cache.stats()["lru_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_skips_db(record_cache, redis_cache, store):
+    redis_cache.get_cache.return_value = {"id": 5, "cpu_percent": 1.0}
+    assert (await record_cache.get(None, 5))["id"] == 5
+    store.get_record_from_db.assert_not_awaited()
+    assert record_cache.stats()["redis_hits"] == 1
+    assert record_cache.lru.get(5) is not None
+
+
+@pytest.mark.asyncio
+async def test_missing_record_is_not_cached(record_cache, store):
+    store.get_record_from_db.side_effect = None
+    store.get_record_from_db.return_value = None
+    assert await record_cache.get(None, 9) is None
+    assert await record_cache.get(None, 9) is None
+    assert store.get_record_from_db.await_count == 2
+    stats = record_cache.stats()
+    assert stats["misses"] == 2
+    assert stats["hit_ratio"] == 0.0
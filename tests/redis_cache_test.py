@@ -1,67 +1,119 @@
 import pytest
-import json
-from unittest.mock import AsyncMock, patch
-from app.storage.redis_cache import CachePanel
+import time
+from datetime import datetime, timezone
+from unittest.mock import patch
+from app.storage.redis_cache import CachePanel, INDEX_KEY
+
+fakeredis = pytest.importorskip("fakeredis")
+
 
 @pytest.fixture
-def mock_redis():
-    mock = AsyncMock()
-    mock.ttl.return_value = -1
-    return mock
+def fake_redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
 
 @pytest.fixture
-def cache_panel(mock_redis):
-    with patch("app.storage.redis_cache.redis.from_url", return_value=mock_redis):
-        return CachePanel()
+def cache_panel(fake_redis):
+    with patch("app.storage.redis_cache.redis.from_url", return_value=fake_redis):
+        return CachePanel(max_entries=5, window_seconds=600)
 
 
-@pytest.mark.asyncio
-async def test_cache_stores_data_and_sets_ttl(cache_panel):
-    
-    data = {"cpu": 10, "mem": 20}
-    await cache_panel.cache(data)
-    
-    cache_panel.redis.rpush.assert_awaited_with("records", json.dumps(data))
-    cache_panel.redis.ttl.assert_awaited_with("records")
-    cache_panel.redis.expire.assert_awaited_with("records", 3600)
+def make_record(record_id, age_seconds=0.0):
+    time_stamp = datetime.fromtimestamp(time.time() - age_seconds, timezone.utc).replace(tzinfo=None)
+    return {"id": record_id, "timestamp": time_stamp.isoformat(), "cpu_percent": float(record_id)}
 
 
 @pytest.mark.asyncio
-async def test_get_cache_returns_data(cache_panel):
-    mock_data = {"cpu": 50}
-    cache_panel.redis.lindex.return_value = json.dumps(mock_data)
-    
-    result = await cache_panel.get_cache(0)
-    assert result == mock_data
-    cache_panel.redis.lindex.assert_awaited_with("records", 0)
+async def test_cache_keys_records_by_id(cache_panel, fake_redis):
+    await cache_panel.cache(make_record(42))
+
+    assert (await cache_panel.get_cache(42))["cpu_percent"] == 42.0
+    assert await fake_redis.zscore(INDEX_KEY, "42") is not None
+    assert 0 < await fake_redis.ttl("metrics:record:42") <= 600
 
 
 @pytest.mark.asyncio
 async def test_get_cache_returns_none_if_not_found(cache_panel):
-    cache_panel.redis.lindex.return_value = None
-    result = await cache_panel.get_cache(5)
-    assert result is None
+    assert await cache_panel.get_cache(5) is None
+
+
+@pytest.mark.asyncio
+async def test_cache_trims_to_max_entries(cache_panel, fake_redis):
+    await cache_panel.cache_many([make_record(i, age_seconds=10 - i) for i in range(8)])
+
+    assert await cache_panel.cache_size() == 5
+    assert [r["id"] for r in await cache_panel.get_all_cache()] == [3, 4, 5, 6, 7]
+    # the oldest records are evicted together with their keys
+    assert await cache_panel.get_cache(0) is None
+    assert not await fake_redis.exists("metrics:record:2")
+
+
+@pytest.mark.asyncio
+async def test_cache_drops_records_outside_window(cache_panel):
+    await cache_panel.cache_many([make_record(1, age_seconds=900), make_record(2, age_seconds=30)])
+    assert [r["id"] for r in await cache_panel.get_all_cache()] == [2]
+
+
+@pytest.mark.asyncio
+async def test_get_recent_and_range(cache_panel):
+    await cache_panel.cache_many([make_record(1, 400), make_record(2, 200), make_record(3, 10)])
+
+    assert [r["id"] for r in await cache_panel.get_recent(300)] == [2, 3]
+    now = time.time()
+    assert [r["id"] for r in await cache_panel.get_range(now - 500, now - 100)] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_get_recent_needs_a_cache_warm_for_the_whole_span(cache_panel, fake_redis):
+    await cache_panel.cache_many([make_record(1, 100), make_record(2, 10)])
+    assert await cache_panel.get_recent(300) is None # started 100 s ago, older records are only in the DB
+    assert [r["id"] for r in await cache_panel.get_recent(50)] == [2]
+
+    await cache_panel.cache_many([make_record(i, 60 - i) for i in range(3, 8)]) # evicts 1 and 3
+    assert await cache_panel.get_recent(58) is None
+    assert [r["id"] for r in await cache_panel.get_recent(55.5)] == [5, 6, 7, 2]
+
+    await cache_panel.forget_coverage() # records were stored without being cached
+    assert await cache_panel.get_recent(55.5) is None
+    await cache_panel.cache(make_record(8, 5))
+    assert await cache_panel.get_recent(10) is None
+    assert await cache_panel.get_recent(4) == [] # warm, just nothing that recent
+
+    with patch.object(fake_redis, "get", side_effect=Exception("redis down")):
+        assert await cache_panel.get_recent(1) is None
 
 
 @pytest.mark.asyncio
-async def test_get_all_cache_returns_all_items(cache_panel):
-    raw = [json.dumps({"id": 1}), json.dumps({"id": 2})]
-    cache_panel.redis.lrange.return_value = raw
-    
-    result = await cache_panel.get_all_cache()
-    assert result == [{"id": 1}, {"id": 2}]
-    cache_panel.redis.lrange.assert_awaited_with("records", 0, -1)
+async def test_get_recent_limit_keeps_the_newest(cache_panel):
+    await cache_panel.cache_many([make_record(i, 50 - i) for i in range(1, 5)])
+    assert [r["id"] for r in await cache_panel.get_recent(48.5, limit=2)] == [3, 4]
+    assert [r["id"] for r in await cache_panel.get_recent(48.5)] == [2, 3, 4]
 
 
 @pytest.mark.asyncio
-async def test_cache_size_returns_length(cache_panel):
-    cache_panel.redis.llen.return_value = 3
-    result = await cache_panel.cache_size()
-    assert result == 3
-    cache_panel.redis.llen.assert_awaited_with("records")
+async def test_clear_cache_deletes_records(cache_panel, fake_redis):
+    await cache_panel.cache_many([make_record(1), make_record(2)])
+    await cache_panel.clear_cache()
+    assert await cache_panel.cache_size() == 0
+    assert await fake_redis.keys("metrics:*") == []
 
 
 @pytest.mark.asyncio
-async def test_clear_cache_deletes_records(cache_panel):
+async def test_errors_are_logged_not_raised(cache_panel, fake_redis, caplog):
+    with patch.object(fake_redis, "get", side_effect=Exception("redis down")):
+        assert await cache_panel.get_cache(1) is None
+    assert "Failed to get record from Redis: redis down" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_get_recent_filters_by_host(cache_panel, fake_redis):
+    await cache_panel.cache(make_record(0, 400)) # warms the cache past the 300 s span
+    records = [{**make_record(i, 30 - i), "host": "web-1" if i % 2 else "web-2"} for i in range(1, 5)]
+    await cache_panel.cache_many(records)
+
+    assert [r["id"] for r in await cache_panel.get_recent(300, host="web-1")] == [1, 3]
+    assert [r["id"] for r in await cache_panel.get_recent(300)] == [1, 2, 3, 4]
+    assert await fake_redis.smembers("metrics:hosts") == {"web-1", "web-2"}
+
     await cache_panel.clear_cache()
-    cache_panel.redis.delete.assert_awaited_with("records")
+    assert await fake_redis.keys("metrics:*") == []
@@ -0,0 +1,91 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+
+from app.models.models import MetricsModel, Rollup1h, Rollup1m, Sketch1h
+from app.models.sample import MetricSample, to_ns
+from app.storage.retention import RetentionManager, expired_partitions, parse_days
+from app.storage.rollup import RollupEngine
+from app.storage.storage import Storage
+
+NOW = datetime(2025, 5, 21, 12)
+
+
+async def count(session_factory, model) -> int:
+    async with session_factory() as db:
+        return (await db.execute(select(func.count()).select_from(model))).scalar()
+
+
+async def store(session_factory, ages_hours: list[float]) -> None:
+    items = [MetricSample(to_ns(NOW - timedelta(hours=hours)), 10.0, host="web-1") for hours in ages_hours]
+    async with session_factory() as db:
+        await Storage().save_many_to_db(items, db)
+    rollups = RollupEngine(session_factory, sketch_metrics="cpu_percent", sketch_resolutions="1h")
+    rollups.add_many(items)
+    await rollups.flush()
+
+
+def test_parse_days():
+    assert parse_days("1m=30, 1h=365,1d=0") == {"1m": 30.0, "1h": 365.0, "1d": 0.0}
+    with pytest.raises(ValueError):
+        parse_days("1m")
+    with pytest.raises(ValueError):
+        parse_days("5m=3")
+    with pytest.raises(ValueError):
+        RetentionManager(strategy="vacuum")
+
+
+def test_expired_partitions_are_whole_days_before_the_cutoff():
+    names = ["resources_p20250519", "resources_p20250520", "resources_p20250521", "resources_default"]
+    assert expired_partitions(names, datetime(2025, 5, 21)) == ["resources_p20250519", "resources_p20250520"]
+    assert expired_partitions(names, datetime(2025, 5, 20, 23)) == ["resources_p20250519"]
+
+
+@pytest.mark.asyncio
+async def test_raw_rows_are_deleted_in_chunks(session_factory):
+    # 25 rows older than a day, 5 within it
+    await store(session_factory, [24 + hour for hour in range(1, 26)] + [1, 2, 3, 4, 5])
+    manager = RetentionManager(session_factory, raw_days=1, rollup_days={}, strategy="chunked", chunk_size=10, chunk_pause=0)
+    chunks = []
+    delete_chunk = manager._delete_chunk
+
+    async def spy(*args):
+        chunks.append(await delete_chunk(*args))
+        return chunks[-1]
+    manager._delete_chunk = spy
+
+    report = await manager.run_once(now=NOW)
+
+    assert report["resources"] == 25
+    assert chunks == [10, 10, 5]
+    async with session_factory() as db:
+        oldest = (await db.execute(select(func.min(MetricsModel.time_stamp)))).scalar()
+    assert oldest >= NOW - timedelta(days=1)
+    assert await count(session_factory, MetricsModel) == 5
+    assert await count(session_factory, Rollup1m) == 30 # rollups outlive raw rows
+
+
+@pytest.mark.asyncio
+async def test_rollups_and_sketches_follow_their_tier_ttl(session_factory):
+    await store(session_factory, [1, 30, 24 * 10])
+    manager = RetentionManager(session_factory, raw_days=0, rollup_days={"1m": 1, "1h": 7}, chunk_size=2, chunk_pause=0)
+
+    report = await manager.run_once(now=NOW)
+
+    assert (report["rollup_1m"], report["rollup_1h"], report["sketch_1h"]) == (2, 1, 1)
+    assert await count(session_factory, MetricsModel) == 3 # raw_days=0 keeps raw samples
+    assert await count(session_factory, Rollup1m) == 1
+    assert await count(session_factory, Rollup1h) == 2
+    assert await count(session_factory, Sketch1h) == 2
+    assert manager.stats() == {"runs": 1, "deleted": 4, "dropped_partitions": 0}
+
+
+@pytest.mark.asyncio
+async def test_partitions_fall_back_to_chunked_deletes_on_sqlite(session_factory, caplog):
+    await store(session_factory, [48, 1])
+    manager = RetentionManager(session_factory, raw_days=1, rollup_days={}, strategy="partitions", chunk_pause=0)
+
+    report = await manager.run_once(now=NOW)
+
+    assert report == {"resources": 1, "partitions": 0}
+    assert "falls back to chunked deletes" in caplog.text
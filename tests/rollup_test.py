@@ -0,0 +1,264 @@
+import asyncio
+import pytest
+from datetime import datetime
+from httpx import AsyncClient, ASGITransport
+from fastapi import FastAPI, status
+from unittest.mock import AsyncMock, patch
+
+from app.api.routes import router
+from app.storage.database import get_db_session
+from app.models.sample import MetricSample
+from app.storage.rollup import RollupEngine, bucket_start, choose_resolution, cover_range
+
+test_app = FastAPI()
+test_app.include_router(router)
+
+
+def make_item(time_stamp, cpu, mem_used=None, host=None):
+    return MetricSample.from_dict({
+        "host": host,
+        "time_stamp": time_stamp,
+        "cpu_percent": cpu,
+        "memory": {"used": mem_used} if mem_used is not None else {},
+        "disk": {},
+        "net_io": {},
+    })
+
+
+def test_bucket_start_floors_to_resolution():
+    ts = datetime(2025, 5, 21, 14, 37, 12, 500)
+    assert bucket_start(ts, 60) == datetime(2025, 5, 21, 14, 37)
+    assert bucket_start(ts, 3600) == datetime(2025, 5, 21, 14, 0)
+    assert bucket_start(ts, 86400) == datetime(2025, 5, 21)
+
+
+def test_choose_resolution_picks_tier_within_point_budget():
+    start = datetime(2025, 5, 1)
+    assert choose_resolution(start, datetime(2025, 5, 1, 6), max_points=1000) == "1m"
+    assert choose_resolution(start, datetime(2025, 5, 8), max_points=1000) == "1h"
+    assert choose_resolution(start, datetime(2026, 5, 1), max_points=1000) == "1d"
+    assert choose_resolution(start, datetime(2030, 5, 1), max_points=100) == "1d"
+
+
+@pytest.mark.asyncio
+async def test_flush_merges_incrementally(session_factory):
+    engine = RollupEngine(session_factory)
+    engine.add_many([
+        make_item("2025-05-21T14:00:10", 10.0, 100),
+        make_item("2025-05-21T14:00:50", 30.0),
+        make_item("2025-05-21T14:01:05", 50.0),
+    ])
+    assert await engine.flush() > 0
+    assert engine.pending() == 0
+
+    # a later flush into the same, still open, buckets merges with what is stored
+    engine.add(make_item("2025-05-21T14:01:30", 5.0))
+    await engine.flush()
+
+    async with session_factory() as db:
+        minutes = await engine.query(db, "1m", datetime(2025, 5, 21, 14), datetime(2025, 5, 21, 15), ["cpu_percent"])
+        hours = await engine.query(db, "1h", datetime(2025, 5, 21, 14, 30), datetime(2025, 5, 21, 15))
+        days = await engine.query(db, "1d", datetime(2025, 5, 21), datetime(2025, 5, 22), ["mem_used"])
+
+    assert [(p["bucket"].minute, p["count"], p["min"], p["max"], p["avg"], p["last"]) for p in minutes] == [
+        (0, 2, 10.0, 30.0, 20.0, 30.0),
+        (1, 2, 5.0, 50.0, 27.5, 5.0),
+    ]
+    cpu_hour = next(p for p in hours if p["metric"] == "cpu_percent")
+    assert (cpu_hour["count"], cpu_hour["min"], cpu_hour["max"], cpu_hour["avg"]) == (4, 5.0, 50.0, 23.75)
+    assert days == [{"host": "unknown", "metric": "mem_used", "bucket": datetime(2025, 5, 21), "count": 1,
+                     "min": 100.0, "max": 100.0, "avg": 100.0, "last": 100.0}]
+
+
+@pytest.mark.asyncio
+async def test_late_sample_does_not_replace_last(session_factory):
+    engine = RollupEngine(session_factory)
+    engine.add(make_item("2025-05-21T14:00:40", 40.0))
+    await engine.flush()
+    engine.add(make_item("2025-05-21T14:00:20", 20.0))
+    await engine.flush()
+
+    async with session_factory() as db:
+        (point,) = await engine.query(db, "1m", datetime(2025, 5, 21, 14), datetime(2025, 5, 21, 14, 1), ["cpu_percent"])
+    assert point["last"] == 40.0
+    assert point["count"] == 2
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.rollups.query", new_callable=AsyncMock)
+async def test_get_aggregates_picks_resolution(mock_query):
+    mock_query.return_value = [{"host": "web-1", "metric": "cpu_percent", "bucket": "2025-05-21T00:00:00", "count": 60,
+                                "min": 1.0, "max": 9.0, "avg": 5.0, "last": 2.0}]
+
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/aggregates", params={"from": "2025-05-01T00:00:00", "to": "2025-05-08T00:00:00", "metric": "cpu_percent"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["resolution"] == "1h"
+    assert response.json()["points"][0]["avg"] == 5.0
+    _, resolution, start, end, metrics = mock_query.call_args.args
+    assert resolution == "1h"
+    assert metrics == ["cpu_percent"]
+
+
+@pytest.mark.asyncio
+async def test_get_aggregates_rejects_bad_input():
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        bad_resolution = await ac.get("/aggregates", params={"resolution": "5m"})
+        bad_range = await ac.get("/aggregates", params={"from": "2025-05-08T00:00:00", "to": "2025-05-01T00:00:00"})
+
+    assert bad_resolution.status_code == status.HTTP_400_BAD_REQUEST
+    assert bad_range.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.rollups.query", new_callable=AsyncMock, return_value=[])
+async def test_get_aggregates_mixes_naive_and_aware_bounds(mock_query):
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        until_now = await ac.get("/aggregates", params={"from": "2025-05-21T14:00:00"})
+        aware = await ac.get("/aggregates", params={"from": "2025-05-21T14:00:00", "to": "2025-05-21T18:00:00+02:00"})
+
+    assert until_now.status_code == aware.status_code == status.HTTP_200_OK
+    _, _, start, end, _ = mock_query.call_args.args
+    assert (start, end) == (datetime(2025, 5, 21, 14), datetime(2025, 5, 21, 16))
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_kept_per_host(session_factory):
+    engine = RollupEngine(session_factory)
+    engine.add_many([
+        make_item("2025-05-21T14:00:10", 10.0, host="web-1"),
+        make_item("2025-05-21T14:00:20", 30.0, host="web-2"),
+        make_item("2025-05-21T14:00:30", 20.0, host="web-1"),
+    ])
+    await engine.flush()
+
+    async with session_factory() as db:
+        start, end = datetime(2025, 5, 21, 14), datetime(2025, 5, 21, 15)
+        both = await engine.query(db, "1m", start, end, ["cpu_percent"])
+        one = await engine.query(db, "1m", start, end, ["cpu_percent"], host="web-2")
+
+    assert [(p["host"], p["count"], p["avg"]) for p in both] == [("web-1", 2, 15.0), ("web-2", 1, 30.0)]
+    assert [(p["host"], p["avg"]) for p in one] == [("web-2", 30.0)]
+
+
+def test_cover_range_uses_whole_days_and_hours_at_the_edges():
+    tiers = {"1h": 3600, "1d": 86400}
+    assert cover_range(datetime(2025, 5, 1, 22, 30), datetime(2025, 5, 4, 2), tiers) == [
+        ("1h", datetime(2025, 5, 1, 22), datetime(2025, 5, 2)),
+        ("1d", datetime(2025, 5, 2), datetime(2025, 5, 4)),
+        ("1h", datetime(2025, 5, 4), datetime(2025, 5, 4, 2)),
+    ]
+    assert cover_range(datetime(2025, 5, 1, 6), datetime(2025, 5, 1, 9), tiers) == [
+        ("1h", datetime(2025, 5, 1, 6), datetime(2025, 5, 1, 9)),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_quantiles_merge_sketches_across_flushes_buckets_and_hosts(session_factory):
+    engine = RollupEngine(session_factory, sketch_metrics="cpu_percent", sketch_resolutions="1h,1d")
+    values = [float(i % 100) for i in range(1000)]
+    items = [
+        make_item(f"2025-05-{20 + i // 400:02d}T{i % 24:02d}:00:{i % 60:02d}", value, host=f"web-{i % 2}")
+        for i, value in enumerate(values)
+    ]
+    engine.add_many(items[:500])
+    await engine.flush()
+    engine.add_many(items[500:]) # reopens stored buckets
+    await engine.flush()
+
+    async with session_factory() as db:
+        fleet = await engine.quantiles(db, "cpu_percent", [0.5, 0.99], datetime(2025, 5, 19), datetime(2025, 5, 23))
+        host = await engine.quantiles(db, "cpu_percent", [0.5], datetime(2025, 5, 19), datetime(2025, 5, 23), host="web-1")
+        partial = await engine.quantiles(db, "cpu_percent", [0.5], datetime(2025, 5, 20, 0, 30), datetime(2025, 5, 20, 2))
+
+    assert fleet["count"] == 1000
+    assert fleet["sketches"] == 3 * 2 # one 1d sketch per day and host
+    assert fleet["values"]["p50"] == pytest.approx(sorted(values)[499], rel=0.01)
+    assert fleet["values"]["p99"] == pytest.approx(sorted(values)[989], rel=0.01)
+    assert host["count"] == 500
+    assert (partial["start"], partial["end"]) == (datetime(2025, 5, 20), datetime(2025, 5, 20, 2))
+    assert partial["count"] == sum(1 for item in items if item.time_stamp < datetime(2025, 5, 20, 2)
+                                   and item.time_stamp.day == 20)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_first_flushes_of_a_sketch_bucket_are_merged(session_factory):
+    workers = [RollupEngine(session_factory, sketch_metrics="cpu_percent", sketch_resolutions="1h") for _ in range(8)]
+    for i, engine in enumerate(workers):
+        engine.add_many([make_item(f"2025-05-21T14:{i:02d}:{second:02d}", float(second)) for second in range(10)])
+
+    async def flush_sketches(engine):
+        # only the sketch write: on SQLite the rollup upsert before it would serialize the flushes
+        async with session_factory() as session:
+            await engine._flush_sketches(session, "1h", engine._sketches["1h"])
+            await session.commit()
+
+    await asyncio.gather(*(flush_sketches(engine) for engine in workers)) # all find the hour bucket missing
+
+    async with session_factory() as db:
+        sketch = await workers[0].quantiles(db, "cpu_percent", [0.5], datetime(2025, 5, 21, 14), datetime(2025, 5, 21, 15))
+    assert sketch["count"] == 80
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_its_deltas_for_the_next_one(session_factory):
+    engine = RollupEngine(session_factory, sketch_metrics="cpu_percent", sketch_resolutions="1h")
+    engine.add(make_item("2025-05-21T14:00:10", 10.0))
+    await engine.flush() # the hour sketch is stored
+
+    engine.add(make_item("2025-05-21T14:00:20", 20.0))
+    with patch("sqlalchemy.ext.asyncio.AsyncSession.commit", side_effect=OSError("connection reset")):
+        assert await engine.flush() == 0 # after the stored sketch was read and merged
+    assert engine.pending() > 0
+    engine.add(make_item("2025-05-21T14:00:30", 30.0)) # arrives while the flush is failing
+    assert await engine.flush() > 0
+
+    async with session_factory() as db:
+        minutes = await engine.query(db, "1m", datetime(2025, 5, 21, 14), datetime(2025, 5, 21, 15), ["cpu_percent"])
+        sketch = await engine.quantiles(db, "cpu_percent", [1.0], datetime(2025, 5, 21, 14), datetime(2025, 5, 21, 15))
+    assert [(p["count"], p["min"], p["max"], p["last"]) for p in minutes] == [(3, 10.0, 30.0, 30.0)]
+    assert sketch["count"] == 3
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.rollups.quantiles", new_callable=AsyncMock)
+async def test_get_percentiles(mock_quantiles):
+    mock_quantiles.return_value = {"metric": "cpu_percent", "host": None, "start": "2025-05-01T00:00:00",
+                                   "end": "2025-05-08T00:00:00", "count": 60, "sketches": 7,
+                                   "relative_accuracy": 0.01, "values": {"p95": 80.4}}
+
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/percentiles", params={"metric": "cpu_percent", "q": [0.95],
+                                                        "from": "2025-05-01T00:00:00", "to": "2025-05-08T00:00:00"})
+        unknown = await ac.get("/percentiles", params={"metric": "mem_total"})
+        bad_q = await ac.get("/percentiles", params={"metric": "cpu_percent", "q": [95]})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["values"] == {"p95": 80.4}
+    _, metric, quantiles, start, end = mock_quantiles.call_args.args
+    assert (metric, quantiles) == ("cpu_percent", [0.95])
+    assert unknown.status_code == bad_q.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_get_percentiles_with_naive_from_and_no_to(session_factory):
+    engine = RollupEngine(session_factory, sketch_metrics="cpu_percent", sketch_resolutions="1h")
+    engine.add(make_item("2025-05-21T14:30:00", 42.0))
+    await engine.flush()
+
+    async def db_session():
+        async with session_factory() as session:
+            yield session
+
+    test_app.dependency_overrides[get_db_session] = db_session
+    try:
+        with patch("app.api.routes.rollups", engine):
+            async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+                response = await ac.get("/percentiles", params={"metric": "cpu_percent", "from": "2025-05-21T14:00:00"})
+    finally:
+        test_app.dependency_overrides.clear()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["count"] == 1
+    assert response.json()["start"] == "2025-05-21T14:00:00"
@@ -4,6 +4,7 @@ from fastapi import status, FastAPI
 from unittest.mock import AsyncMock, patch
 
 from app.api.routes import router   # Or whatever your FastAPI app instance is named
+from app.config import settings
 
 from app.models.models import Metrics
 
@@ -54,3 +55,96 @@ async def test_get_record_not_found(mock_get_record):
 
     assert response.status_code == status.HTTP_404_NOT_FOUND
     assert response.json() == {"detail": "Record not found!"}
+
+
+@pytest.mark.asyncio
+@patch("app.storage.storage.storage.get_data_from_db", new_callable=AsyncMock)
+async def test_get_records_pages_with_cursor(mock_get_data):
+    mock_get_data.return_value = [
+        Metrics(id=i, timestamp=f"2025-05-21T14:00:0{i}", cpu_percent=12.5,
+                memory={}, disk={}, net_io={})
+        for i in (1, 2)
+    ]
+
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        first = await ac.get("/records", params={"from": "2025-05-21T00:00:00", "to": "2025-05-22T00:00:00", "limit": 2})
+        cursor = first.headers["X-Next-Cursor"]
+        mock_get_data.return_value = mock_get_data.return_value[:1]
+        second = await ac.get("/records", params={"limit": 2, "cursor": cursor})
+
+    assert first.status_code == status.HTTP_200_OK
+    kwargs = mock_get_data.call_args_list[0].kwargs
+    assert kwargs["start"].isoformat() == "2025-05-21T00:00:00"
+    assert kwargs["limit"] == 2
+    assert kwargs["after"] is None
+
+    assert second.status_code == status.HTTP_200_OK
+    after_ts, after_id = mock_get_data.call_args_list[1].kwargs["after"]
+    assert (after_ts.isoformat(), after_id) == ("2025-05-21T14:00:02", 2)
+    assert "X-Next-Cursor" not in second.headers
+
+
+@pytest.mark.asyncio
+async def test_get_records_rejects_bad_cursor():
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/records", params={"cursor": "not-a-cursor"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.cache_panel.get_recent", new_callable=AsyncMock)
+@patch("app.storage.storage.storage.get_data_from_db", new_callable=AsyncMock)
+async def test_get_recent_records_served_from_cache(mock_get_data, mock_get_recent):
+    mock_get_recent.return_value = [
+        {"id": 7, "timestamp": "2025-05-21T14:00:00", "cpu_percent": 1.0, "memory": {}, "disk": {}, "net_io": {}}
+    ]
+
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/records/recent", params={"seconds": 300})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()[0]["id"] == 7
+    mock_get_recent.assert_awaited_once_with(300, host=None, limit=settings.RECORDS_MAX_PAGE_SIZE)
+    mock_get_data.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.cache_panel.get_recent", new_callable=AsyncMock)
+@patch("app.storage.storage.storage.get_latest_from_db", new_callable=AsyncMock)
+async def test_get_recent_records_falls_back_to_db(mock_get_latest, mock_get_recent):
+    mock_get_recent.return_value = None # the hot window does not cover the span
+    mock_get_latest.return_value = []
+
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/records/recent")
+
+    assert response.status_code == status.HTTP_200_OK
+    mock_get_latest.assert_awaited_once()
+    assert mock_get_latest.call_args.args[2] == settings.RECORDS_MAX_PAGE_SIZE # the newest rows, like the cache
+
+
+@pytest.mark.asyncio
+async def test_get_cache_stats():
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        response = await ac.get("/cache/stats")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {"lru_hits", "redis_hits", "db_hits", "misses", "hit_ratio"} <= response.json().keys()
+
+
+@pytest.mark.asyncio
+@patch("app.api.routes.cache_panel.get_recent", new_callable=AsyncMock)
+@patch("app.storage.storage.storage.get_latest_from_db", new_callable=AsyncMock)
+@patch("app.storage.storage.storage.get_data_from_db", new_callable=AsyncMock)
+async def test_records_filter_by_host(mock_get_data, mock_get_latest, mock_get_recent):
+    mock_get_recent.return_value = None
+    mock_get_data.return_value = mock_get_latest.return_value = []
+
+    async with AsyncClient(transport=ASGITransport(test_app), base_url="http://test") as ac:
+        assert (await ac.get("/records", params={"host": "web-1"})).status_code == status.HTTP_200_OK
+        assert (await ac.get("/records/recent", params={"host": "web-1"})).status_code == status.HTTP_200_OK
+
+    assert all(call.kwargs["host"] == "web-1" for call in mock_get_data.await_args_list)
+    assert mock_get_latest.call_args.kwargs["host"] == "web-1"
+    mock_get_recent.assert_awaited_once_with(300, host="web-1", limit=settings.RECORDS_MAX_PAGE_SIZE)
@@ -0,0 +1,61 @@
+import pytest
+from datetime import datetime
+
+from app.models.sample import MetricSample, from_ns, to_ns
+
+
+def wire_item(**overrides):
+    return {
+        "host": "web-1",
+        "time_stamp": "2025-05-21T14:00:00.123456+00:00",
+        "cpu_percent": 12.5,
+        "memory": {"total": 100, "used": 40, "free": 60, "active": 10},
+        "disk": {"used": 5},
+        "net_io": {"bytes_sent": 1000, "bytes_sent_rate": 25.0, "errin": 0},
+        **overrides,
+    }
+
+
+def test_to_ns_and_back():
+    assert to_ns("1970-01-01T00:00:01") == 1_000_000_000
+    assert to_ns("2025-05-21T16:00:00+02:00") == to_ns(datetime(2025, 5, 21, 14))
+    assert from_ns(to_ns("2025-05-21T14:00:00.123456")) == datetime(2025, 5, 21, 14, 0, 0, 123456)
+
+
+def test_from_dict_keeps_only_stored_columns():
+    sample = MetricSample.from_dict(wire_item())
+
+    assert sample.ts_ns == to_ns(datetime(2025, 5, 21, 14, 0, 0, 123456))
+    assert (sample.mem_total, sample.mem_used, sample.disk_used) == (100, 40, 5)
+    assert sample.net_bytes_sent_rate == 25.0
+    assert sample.disk_free is None
+    assert not hasattr(sample, "__dict__")
+    assert sample.to_dict() == {
+        "host": "web-1", "time_stamp": "2025-05-21T14:00:00.123456+00:00", "cpu_percent": 12.5,
+        "memory": {"total": 100, "used": 40}, "disk": {"used": 5},
+        "net_io": {"bytes_sent": 1000, "bytes_sent_rate": 25.0},
+    }
+    assert MetricSample.from_dict(sample.to_dict()) == sample
+
+
+def test_degraded_round_trip():
+    sample = MetricSample.from_dict(wire_item(disk=None, degraded=True, missing=["disk"], tags={"role": "db"}))
+
+    assert sample.degraded and sample.missing == ["disk"]
+    assert not sample.has_group("disk") and sample.has_group("memory")
+    item = sample.to_dict()
+    assert (item["disk"], item["degraded"], item["missing"], item["tags"]) == (None, True, ["disk"], {"role": "db"})
+
+
+def test_to_row_matches_resources_columns():
+    row = MetricSample(to_ns("2025-05-21T14:00:00"), 3, mem_used=7).to_row()
+
+    assert row["host"] == "unknown"
+    assert row["time_stamp"] == datetime(2025, 5, 21, 14)
+    assert row["cpu_percent"] == 3.0 and isinstance(row["cpu_percent"], float)
+    assert row["mem_used"] == 7 and row["net_bytes_sent_rate"] is None
+
+
+def test_unknown_columns_are_rejected():
+    with pytest.raises(TypeError):
+        MetricSample(0, 1.0, mem_usd=7)
@@ -0,0 +1,81 @@
+import pytest
+from unittest.mock import AsyncMock
+from app.ingest.scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.mark.asyncio
+async def test_ticks_fire_on_grid(clock):
+    fired = []
+
+    async def callback():
+        fired.append(clock.now)
+        clock.now += 0.03  # work takes some time every tick
+
+    scheduler = Scheduler(0.25, callback, clock=clock, sleep=clock.sleep)
+    await scheduler.run(max_ticks=5)
+
+    # no drift: each tick fires exactly on its slot despite the work time
+    assert fired == pytest.approx([100.0, 100.25, 100.5, 100.75, 101.0])
+    assert scheduler.missed == 0
+    assert scheduler.late == 0
+
+
+@pytest.mark.asyncio
+async def test_slow_tick_skips_missed_slots_without_bunching(clock):
+    fired = []
+
+    async def callback():
+        fired.append(clock.now)
+        if len(fired) == 2:
+            clock.now += 3.5  # a stall spanning several intervals
+
+    scheduler = Scheduler(1.0, callback, clock=clock, sleep=clock.sleep)
+    await scheduler.run(max_ticks=4)
+
+    # slot 1 stalls until 104.5: slots 2-3 are missed, slot 4 fires late once, slot 5 is back on grid
+    assert fired == pytest.approx([100.0, 101.0, 104.5, 105.0])
+    assert scheduler.missed == 2
+    assert scheduler.late == 1
+    assert scheduler.max_lag == pytest.approx(0.5)
+
+
+@pytest.mark.asyncio
+async def test_callback_errors_do_not_stop_the_loop(clock):
+    callback = AsyncMock(side_effect=[Exception("boom"), None, None])
+    scheduler = Scheduler(0.5, callback, clock=clock, sleep=clock.sleep)
+    await scheduler.run(max_ticks=3)
+    assert callback.await_count == 3
+    assert scheduler.stats()["ticks"] == 3
+
+
+@pytest.mark.asyncio
+async def test_stop_ends_run(clock):
+    scheduler = None
+
+    async def callback():
+        scheduler.stop()
+
+    scheduler = Scheduler(0.1, callback, clock=clock, sleep=clock.sleep)
+    await scheduler.run()
+    assert scheduler.ticks == 1
+
+
+def test_interval_must_be_positive():
+    with pytest.raises(ValueError):
+        Scheduler(0, AsyncMock())
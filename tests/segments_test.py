@@ -0,0 +1,138 @@
+import pytest
+import shutil
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from app.models.sample import MetricSample, to_ns
+from app.storage.retention import RetentionManager
+from app.storage.segments import SegmentStorage, SegmentStore
+from app.storage.storage import Storage, create_storage
+
+T0 = datetime(2025, 5, 21, 12)
+
+
+def sample(second, host="web-1", cpu=None, **columns):
+    return MetricSample(to_ns(T0 + timedelta(seconds=second)), float(second) if cpu is None else cpu, host=host, **columns)
+
+
+def test_create_storage_follows_storage_backend(tmp_path):
+    with patch("app.storage.storage.settings.STORAGE_BACKEND", "segments"), \
+         patch("app.storage.segments.settings.SEGMENT_DIR", str(tmp_path)):
+        assert isinstance(create_storage(), SegmentStorage)
+    with patch("app.storage.storage.settings.STORAGE_BACKEND", "sql"):
+        assert type(create_storage()) is Storage
+    with patch("app.storage.storage.settings.STORAGE_BACKEND", "sqlite"), pytest.raises(ValueError):
+        create_storage()
+
+
+@pytest.mark.asyncio
+async def test_records_round_trip_with_nulls_tags_and_ids(tmp_path):
+    storage = SegmentStorage(tmp_path)
+    assert not tmp_path.joinpath("state.json").exists()
+    items = [
+        MetricSample(to_ns("2025-05-21T12:00:00.123456+02:00"), 12.5, host="db-1", tags={"role": "db"},
+                     mem_used=1000, mem_percent=None, net_bytes_sent_rate=1.5),
+        MetricSample(to_ns(T0), 3.0),
+    ]
+
+    assert await storage.save_many_to_db(items, None) == [1, 2]
+    assert await storage.save_many_to_db([sample(1)], None) == [3]
+
+    record = await storage.get_record_from_db(None, 1)
+    assert record.to_dict() == {
+        "id": 1, "host": "db-1", "tags": {"role": "db"}, "timestamp": "2025-05-21T10:00:00.123456", "cpu_percent": 12.5,
+        "memory": {"used": 1000}, "disk": {}, "net_io": {"bytes_sent_rate": 1.5},
+    }
+    assert isinstance(record.mem_used, int)
+    assert (await storage.get_record_from_db(None, 2)).host == "unknown"
+    assert await storage.get_record_from_db(None, 99) is None
+    # sorted on time, not on id
+    assert [record.id for record in await storage.get_data_from_db(None)] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_small_segments_are_merged_in_tiers_without_losing_order(tmp_path):
+    storage = SegmentStorage(tmp_path, block_rows=4, fanout=2, max_rows=8)
+    seconds = [5, 1, 9, 3, 7, 0, 8, 2, 6, 4, 11, 10]
+    for second in seconds: # one out-of-order sample per write
+        await storage.save_many_to_db([sample(second)], None)
+
+    stats = storage.store.stats()
+    assert stats["rows"] == 12 and stats["merges"] > 0
+    assert stats["segments"] < len(seconds)
+    assert len(list(tmp_path.glob("*.seg"))) == stats["segments"] # merged sources are deleted
+    records = await storage.get_data_from_db(None, start=T0 + timedelta(seconds=2), end=T0 + timedelta(seconds=10))
+    assert [record.cpu_percent for record in records] == [2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0]
+    chunks = [chunk async for chunk in storage.stream_data_from_db(None, chunk_size=5)]
+    assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+    assert [record.cpu_percent for chunk in chunks for record in chunk] == [float(i) for i in range(12)]
+
+
+@pytest.mark.asyncio
+async def test_aggregates_read_only_their_column(tmp_path):
+    storage = SegmentStorage(tmp_path, block_rows=10)
+    await storage.save_many_to_db([sample(i, host=f"web-{i % 2}", mem_used=i) for i in range(100)], None)
+    store = storage.store
+    store.bytes_read.clear()
+
+    # blocks 2..5 are wholly inside the range and answered from the footer
+    result = await storage.aggregate("cpu_percent", T0 + timedelta(seconds=20), T0 + timedelta(seconds=60))
+    assert result == {"count": 40, "sum": sum(range(20, 60)), "min": 20.0, "max": 59.0, "avg": 39.5}
+    assert store.bytes_read == {}
+
+    result = await storage.aggregate("cpu_percent", T0 + timedelta(seconds=25), T0 + timedelta(seconds=35))
+    assert (result["count"], result["min"], result["max"]) == (10, 25.0, 34.0)
+    assert set(store.bytes_read) == {"time_stamp", "cpu_percent"}
+
+    store.bytes_read.clear()
+    assert store.column("mem_used", T0 + timedelta(seconds=98)) == [(to_ns(T0) + 98 * 10**9, 98), (to_ns(T0) + 99 * 10**9, 99)]
+    assert set(store.bytes_read) == {"time_stamp", "mem_used"}
+
+    result = await storage.aggregate("cpu_percent", T0 + timedelta(seconds=25), T0 + timedelta(seconds=35), host="web-1")
+    assert (result["count"], result["sum"]) == (5, 25 + 27 + 29 + 31 + 33)
+    result = await storage.aggregate("cpu_percent", host="web-1")
+    assert (result["count"], result["sum"]) == (50, sum(range(1, 100, 2)))
+    assert (await storage.aggregate("cpu_percent", host="db-9"))["count"] == 0
+    with pytest.raises(ValueError):
+        store.aggregate("nope")
+
+
+@pytest.mark.asyncio
+async def test_reopened_store_continues_ids_and_hides_replaced_segments(tmp_path):
+    storage = SegmentStorage(tmp_path, fanout=2)
+    await storage.save_many_to_db([sample(0)], None)
+    first = next(tmp_path.glob("*.seg"))
+    shutil.copy(first, tmp_path / "saved")
+    await storage.save_many_to_db([sample(1)], None) # merges the two
+    shutil.copy(tmp_path / "saved", first) # a source a crash left behind
+
+    reopened = SegmentStorage(tmp_path, fanout=2)
+    assert [record.id for record in await reopened.get_data_from_db(None)] == [1, 2] # no duplicate
+    (tmp_path / "state.json").unlink()
+    assert await reopened.save_many_to_db([sample(2)], None) == [3]
+    assert not first.exists() # cleaned up by the next write
+
+
+@pytest.mark.asyncio
+async def test_unreadable_segments_are_skipped(tmp_path, caplog):
+    storage = SegmentStorage(tmp_path)
+    await storage.save_many_to_db([sample(0)], None)
+    (tmp_path / "000000000099.seg").write_bytes(b"SHMSEG01 torn")
+
+    assert len(await storage.get_data_from_db(None)) == 1
+    assert "Skipping unreadable segment" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_retention_drops_whole_segments(tmp_path):
+    storage = SegmentStorage(tmp_path)
+    await storage.save_many_to_db([sample(-3 * 86400 + i) for i in range(3)], None)
+    await storage.save_many_to_db([sample(-86400 * 2), sample(0)], None) # straddles the cutoff, kept whole
+    await storage.save_many_to_db([sample(1)], None)
+    manager = RetentionManager(raw_days=1, rollup_days={}, storage=storage)
+
+    report = await manager.run_once(now=T0)
+
+    assert report["resources"] == 3
+    assert len(await storage.get_data_from_db(None)) == 3
+    assert SegmentStore(tmp_path).stats()["segments"] == 2
@@ -0,0 +1,89 @@
+import math
+import random
+import pytest
+
+from app.storage.sketch import DDSketch
+
+QUANTILES = (0.01, 0.25, 0.5, 0.9, 0.95, 0.99, 0.999)
+
+
+def exact(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+@pytest.mark.parametrize("distribution", [
+    lambda rng: rng.uniform(0, 100),
+    lambda rng: rng.lognormvariate(3, 1.5),
+    lambda rng: rng.expovariate(0.01),
+    lambda rng: min(100.0, max(0.0, rng.gauss(35, 10))),
+])
+def test_quantiles_are_within_relative_accuracy(distribution):
+    rng = random.Random(42)
+    values = [distribution(rng) for _ in range(50_000)]
+    sketch = DDSketch(relative_accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+
+    for q in QUANTILES:
+        expected = exact(values, q)
+        assert abs(sketch.quantile(q) - expected) <= 0.01 * abs(expected) + 1e-12, q
+    assert sketch.quantile(0) == min(values) and sketch.quantile(1) == max(values)
+    assert len(sketch.positive) < 1000
+
+
+def test_zero_and_negative_values():
+    sketch = DDSketch(relative_accuracy=0.02)
+    values = [-50.0, -5.0, 0.0, 0.0, 5.0, 50.0, 500.0]
+    for value in values:
+        sketch.add(value)
+    for q in (0, 1 / 6, 2 / 6, 0.5, 4 / 6, 5 / 6, 1):
+        assert sketch.quantile(q) == pytest.approx(exact(values, q), rel=0.02)
+    assert DDSketch().quantile(0.5) is None
+
+
+def test_merge_equals_one_sketch_of_everything():
+    rng = random.Random(1)
+    parts = [[rng.uniform(0, 100) for _ in range(1000)] for _ in range(5)]
+    whole = DDSketch()
+    for value in (value for part in parts for value in part):
+        whole.add(value)
+
+    merged = DDSketch()
+    for part in parts:
+        sketch = DDSketch()
+        for value in part:
+            sketch.add(value)
+        merged.merge(sketch)
+
+    assert merged.positive == whole.positive and merged.count == whole.count
+    assert merged.min == whole.min and merged.max == whole.max
+    assert all(merged.quantile(q) == whole.quantile(q) for q in QUANTILES)
+    with pytest.raises(ValueError):
+        merged.merge(DDSketch(relative_accuracy=0.05))
+
+
+def test_encoding_round_trip_is_compact():
+    rng = random.Random(3)
+    sketch = DDSketch()
+    for _ in range(3600): # an hour of 1 Hz CPU samples
+        sketch.add(max(0.0, rng.gauss(30, 8)))
+    sketch.add(0.0)
+    sketch.add(-1.5)
+
+    data = sketch.to_bytes()
+    decoded = DDSketch.from_bytes(data)
+    assert (decoded.positive, decoded.negative, decoded.zero_count) == (sketch.positive, sketch.negative, sketch.zero_count)
+    assert (decoded.count, decoded.min, decoded.max, decoded.sum) == (sketch.count, sketch.min, sketch.max, sketch.sum)
+    assert len(data) < 400
+
+
+def test_bins_are_bounded():
+    sketch = DDSketch(relative_accuracy=0.01, max_bins=100)
+    for exponent in range(-6, 7):
+        for step in range(50):
+            sketch.add(10 ** exponent * (1 + step / 50))
+    assert len(sketch.positive) <= 100
+    # collapsing only folds the lowest bins, the upper quantiles keep their bound
+    assert sketch.quantile(0.99) == pytest.approx(exact([10 ** e * (1 + s / 50) for e in range(-6, 7) for s in range(50)], 0.99), rel=0.01)
+    assert not math.isnan(sketch.quantile(0.01))
@@ -1,28 +1,38 @@
 import pytest
 from unittest.mock import AsyncMock, MagicMock
+from app.models.sample import MetricSample
+from app.storage.segments import SegmentStorage
 from app.storage.storage import Storage
+from datetime import datetime
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
 @pytest.fixture
 def storage():
     return Storage()
 
 
+@pytest.fixture(params=["sql", "segments"])
+def any_storage(request, tmp_path):
+    """Each raw-sample backend; the segment store ignores the sessions it is handed."""
+    return Storage() if request.param == "sql" else SegmentStorage(tmp_path / "segments")
+
+
 @pytest.fixture
 def fake_data():
-    return {
+    return MetricSample.from_dict({
         "time_stamp": "2023-01-01T00:00:00",
         "cpu_percent": 75,
         "memory": {"used": 1000},
         "disk": {"read": 100},
         "net_io": {"sent": 500}
-    }
+    })
 
 
 @pytest.mark.asyncio
 async def test_save_to_db_success(storage, fake_data):
     db = AsyncMock()
     await storage.save_to_db(fake_data, db)
-    db.add.assert_awaited()
+    db.add.assert_called_once()
     db.commit.assert_awaited()
 
 
@@ -76,3 +86,108 @@ async def test_get_record_from_db_not_found(storage):
 
     record = await storage.get_record_from_db(db, 1)
     assert record is None
+
+
+@pytest.mark.asyncio
+async def test_get_data_from_db_keyset_pages(any_storage, session_factory):
+    storage = any_storage
+    items = [
+        MetricSample.from_dict({"time_stamp": f"2023-01-01T00:00:{i // 2:02d}", "cpu_percent": i, "memory": {}, "disk": {}, "net_io": {}})
+        for i in range(10)
+    ]
+    async with session_factory() as db:
+        await storage.save_many_to_db(items, db)
+
+        start, end = datetime(2023, 1, 1, 0, 0, 1), datetime(2023, 1, 1, 0, 0, 4)
+        pages, after = [], None
+        while True:
+            page = await storage.get_data_from_db(db, start=start, end=end, limit=4, after=after)
+            pages.append([record.id for record in page])
+            if len(page) < 4:
+                break
+            after = (page[-1].time_stamp, page[-1].id)
+
+    # seconds 1..3 hold ids 3..8; equal timestamps are ordered by id across page boundaries
+    assert pages == [[3, 4, 5, 6], [7, 8]]
+
+
+@pytest.mark.asyncio
+async def test_get_data_from_db_filters_by_host(any_storage, session_factory):
+    storage = any_storage
+    items = [
+        MetricSample.from_dict({"host": f"web-{i % 2}", "tags": {"role": "api"}, "time_stamp": f"2023-01-01T00:00:{i:02d}",
+                                "cpu_percent": i, "memory": {}, "disk": {}, "net_io": {}})
+        for i in range(6)
+    ]
+    async with session_factory() as db:
+        await storage.save_many_to_db(items, db)
+        records = await storage.get_data_from_db(db, start=datetime(2023, 1, 1), host="web-1")
+
+    assert [(record.host, record.cpu_percent) for record in records] == [("web-1", 1), ("web-1", 3), ("web-1", 5)]
+    assert records[0].tags == {"role": "api"}
+
+
+@pytest.mark.asyncio
+async def test_get_latest_from_db_keeps_the_newest_rows(any_storage, session_factory):
+    storage = any_storage
+    items = [
+        MetricSample.from_dict({"host": f"web-{i % 2}", "time_stamp": f"2023-01-01T00:00:{i // 2:02d}",
+                                "cpu_percent": i, "memory": {}, "disk": {}, "net_io": {}})
+        for i in range(10)
+    ]
+    async with session_factory() as db:
+        await storage.save_many_to_db(items, db)
+        latest = await storage.get_latest_from_db(db, datetime(2023, 1, 1, 0, 0, 1), 3)
+        host = await storage.get_latest_from_db(db, datetime(2023, 1, 1), 2, host="web-0")
+
+    assert [record.cpu_percent for record in latest] == [7, 8, 9] # oldest first, the oldest of the window dropped
+    assert [record.cpu_percent for record in host] == [6, 8]
+
+
+@pytest.fixture
+def broken_db(any_storage, sqlite_engine):
+    """A session whose writes fail: no tables for SQL, a file in place of the segment directory."""
+    if isinstance(any_storage, SegmentStorage):
+        any_storage.store.directory.write_text("not a directory")
+    return async_sessionmaker(sqlite_engine, expire_on_commit=False)
+
+
+@pytest.mark.asyncio
+async def test_saved_sample_reads_back(any_storage, session_factory, fake_data):
+    storage = any_storage
+    async with session_factory() as db:
+        await storage.save_to_db(fake_data, db)
+        records = await storage.get_data_from_db(db)
+        found = await storage.get_record_from_db(db, records[0].id)
+        missing = await storage.get_record_from_db(db, records[0].id + 1)
+
+    assert [(record.cpu_percent, record.memory) for record in records] == [(75, {"used": 1000})]
+    assert found.id == records[0].id and found.memory == {"used": 1000}
+    assert missing is None
+
+
+@pytest.mark.asyncio
+async def test_batch_writes_and_stream_chunks(any_storage, session_factory):
+    storage = any_storage
+    items = [
+        MetricSample.from_dict({"time_stamp": f"2023-01-01T00:00:{i:02d}", "cpu_percent": i, "memory": {}, "disk": {}, "net_io": {}})
+        for i in range(5)
+    ]
+    async with session_factory() as db:
+        ids = await storage.save_many_to_db(items[:3], db)
+        copied = await storage.copy_to_db(items[3:], db)
+        chunks = [[record.cpu_percent for record in chunk] async for chunk in storage.stream_data_from_db(db, chunk_size=2)]
+
+    assert len(ids) == 3 and ids == sorted(ids)
+    assert copied == 2
+    assert chunks == [[0, 1], [2, 3], [4]]
+
+
+@pytest.mark.asyncio
+async def test_write_failure_is_logged_and_returns_empty(any_storage, broken_db, fake_data):
+    storage = any_storage
+    async with broken_db() as db:
+        await storage.save_to_db(fake_data, db) # logged, not raised
+        assert await storage.save_many_to_db([fake_data], db) == []
+        assert await storage.copy_to_db([fake_data], db) == 0
+        assert await storage.get_data_from_db(db) == []
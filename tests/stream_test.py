@@ -0,0 +1,91 @@
+import json
+import pytest
+from unittest.mock import patch
+from app.ingest.stream import StreamConsumer, StreamProducer
+from app.models.sample import MetricSample
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def fake_redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def make(fake_redis):
+    def factory(cls, **kwargs):
+        with patch("app.ingest.stream.redis.from_url", return_value=fake_redis):
+            return cls(stream="test:stream", **kwargs)
+    return factory
+
+
+def samples(n):
+    return [MetricSample(i * 10 ** 9, float(i)) for i in range(n)]
+
+
+def consumer_kwargs(name, **kwargs):
+    return {"group": "storage", "consumer": name, "batch_size": 10, "block_ms": 0, **kwargs}
+
+
+@pytest.mark.asyncio
+async def test_producer_appends_json_entries(make, fake_redis):
+    producer = make(StreamProducer, maxlen=1000)
+    entry_ids = await producer.add_many(samples(2))
+
+    assert len(entry_ids) == 2
+    entries = await fake_redis.xrange("test:stream")
+    assert [MetricSample.from_dict(json.loads(fields["data"])) for _, fields in entries] == samples(2)
+
+
+@pytest.mark.asyncio
+async def test_producer_caps_stream_length(make, fake_redis):
+    producer = make(StreamProducer, maxlen=100)
+    await producer.add_many(samples(500))
+    # approximate trimming keeps at least maxlen, dropping whole nodes of older entries
+    assert 100 <= await fake_redis.xlen("test:stream") <= 200
+
+
+@pytest.mark.asyncio
+async def test_consumers_share_entries_and_ack(make):
+    producer = make(StreamProducer)
+    first = make(StreamConsumer, **consumer_kwargs("a", batch_size=3))
+    second = make(StreamConsumer, **consumer_kwargs("b", batch_size=3))
+    await first.ensure_group()
+    await second.ensure_group() # idempotent
+    await producer.add_many(samples(5))
+
+    batch_a = await first.read()
+    batch_b = await second.read()
+    assert len(batch_a) == 3 and len(batch_b) == 2
+    assert {e for e, _ in batch_a}.isdisjoint(e for e, _ in batch_b)
+    assert await first.pending() == 5
+
+    await first.ack([e for e, _ in batch_a])
+    await second.ack([e for e, _ in batch_b])
+    assert await first.pending() == 0
+    assert await first.read() == []
+
+
+@pytest.mark.asyncio
+async def test_stale_entries_are_reclaimed_from_crashed_consumer(make):
+    producer = make(StreamProducer)
+    crashed = make(StreamConsumer, **consumer_kwargs("crashed"))
+    survivor = make(StreamConsumer, **consumer_kwargs("survivor", claim_idle_ms=0))
+    await crashed.ensure_group()
+    await producer.add_many(samples(3))
+
+    taken = await crashed.read() # never acked
+    reclaimed = await survivor.read()
+    assert [e for e, _ in reclaimed] == [e for e, _ in taken]
+
+    await survivor.ack([e for e, _ in reclaimed])
+    assert await survivor.pending() == 0
+
+
+@pytest.mark.asyncio
+async def test_producer_errors_are_logged(make, fake_redis, caplog):
+    producer = make(StreamProducer)
+    with patch.object(producer.redis, "pipeline", side_effect=Exception("redis down")):
+        assert await producer.add_many(samples(1)) == []
+    assert "Failed to add to stream 'test:stream': redis down" in caplog.text
@@ -54,3 +54,15 @@ async def test_unsubscribe_error_logs(mock_redis_and_subscriber, caplog):
         await subscriber.unsubscribe("bad_channel")
 
     assert "Error: Failed to unsubscribe 'bad_channel': unsubscribe failed" in caplog.text
+
+@pytest.mark.asyncio
+async def test_listen_yields_only_messages(mock_redis_and_subscriber):
+    subscriber, _, mock_pubsub = mock_redis_and_subscriber
+
+    async def listen():
+        yield {"type": "subscribe", "channel": "test_channel", "data": 1}
+        yield {"type": "message", "channel": "test_channel", "data": "payload"}
+
+    mock_pubsub.listen = listen
+    messages = [message async for message in subscriber.listen()]
+    assert [m["data"] for m in messages] == ["payload"]
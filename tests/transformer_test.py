@@ -1,5 +1,6 @@
 import pytest
 from datetime import datetime
+from app.models.sample import MetricSample, to_ns
 from app.transform.transformer import Transformer
 
 @pytest.fixture
@@ -22,18 +23,18 @@ def test_transform_valid_item(transformer):
     data = [{
         "timestamp": now,
         "cpu_percent": 50,
-        "memory": 2048,
-        "disk": 100,
-        "net_io": "eth0"
+        "memory": {"used": 2048},
+        "disk": {"used": 100},
+        "net_io": {"bytes_sent": 10}
     }]
     
     result = transformer.transform(data)
     assert len(result) == 1
-    assert result[0]["time_stamp"] == now
-    assert result[0]["cpu_percent"] == 50
-    assert result[0]["memory"] == 2048
-    assert result[0]["disk"] == 100
-    assert result[0]["net_io"] == "eth0"
+    assert result[0].time_stamp == datetime.fromisoformat(now)
+    assert result[0].cpu_percent == 50
+    assert result[0].mem_used == 2048
+    assert result[0].disk_used == 100
+    assert result[0].net_bytes_sent == 10
 
 
 def test_transform_skips_invalid_item(transformer):
@@ -41,44 +42,66 @@ def test_transform_skips_invalid_item(transformer):
     data = [{
         "timestamp": datetime.utcnow().isoformat(),
         "cpu_percent": 20,
-        "disk": 50
+        "disk": {"used": 50}
     }]
     result = transformer.transform(data)
     assert result == []
 
 
-def test_parse_datetime_returns_valid(transformer):
-    now = datetime.utcnow().isoformat()
-    result = transformer.parse_datetime(now)
-    assert result == now
+def test_parse_timestamp_returns_epoch_ns(transformer):
+    assert transformer.parse_timestamp("1970-01-01T00:00:01.5") == 1_500_000_000
+    assert transformer.parse_timestamp("2023-01-01T02:00:00+02:00") == to_ns(datetime(2023, 1, 1))
 
 
-def test_parse_datetime_handles_invalid(transformer):
-    result = transformer.parse_datetime("not-a-date")
-    # It falls back to utcnow().isoformat()
-    assert isinstance(result, str)
-    # We check if it at least parses back to datetime
-    parsed = datetime.fromisoformat(result)
-    assert isinstance(parsed, datetime)
+def test_parse_timestamp_handles_invalid(transformer):
+    result = transformer.parse_timestamp("not-a-date")
+    # It falls back to now
+    assert isinstance(result, int)
+    assert abs(datetime.utcfromtimestamp(result / 1e9) - datetime.utcnow()).total_seconds() < 5
 
 
 def test_is_valid_true(transformer):
-    item = {
-        "time_stamp": "2023-01-01T00:00:00",
-        "cpu_percent": 75,
-        "memory": 8000,
-        "disk": 200,
-        "net_io": "eth0"
-    }
+    item = MetricSample(to_ns("2023-01-01T00:00:00"), 75, mem_used=8000, disk_used=200, net_bytes_sent=1)
     assert transformer.is_valid(item) is True
 
 
 def test_is_valid_false(transformer):
-    item = {
-        "time_stamp": None,
-        "cpu_percent": 75,
-        "memory": 8000,
-        "disk": 200,
-        "net_io": "eth0"
-    }
+    item = MetricSample(None, 75, mem_used=8000, disk_used=200, net_bytes_sent=1)
     assert transformer.is_valid(item) is False
+
+
+def test_transform_keeps_degraded_item(transformer):
+    data = [{
+        "timestamp": datetime.utcnow().isoformat(),
+        "cpu_percent": 20,
+        "memory": {"total": 100},
+        "disk": None,
+        "net_io": {"bytes_sent": 1},
+        "degraded": True,
+        "missing": ["disk"]
+    }]
+    result = transformer.transform(data)
+    assert len(result) == 1
+    assert result[0].degraded is True
+    assert result[0].missing == ["disk"]
+    assert result[0].to_dict()["disk"] is None
+
+
+def test_is_valid_degraded_still_needs_cpu(transformer):
+    item = MetricSample(
+        to_ns("2023-01-01T00:00:00"), None, missing=["cpu_percent"], mem_used=8000, disk_used=200, net_bytes_sent=1
+    )
+    assert transformer.is_valid(item) is False
+
+
+def test_transform_keeps_zero_values(transformer):
+    data = [{
+        "timestamp": datetime.utcnow().isoformat(),
+        "cpu_percent": 0.0,
+        "memory": {"used": 0},
+        "disk": {"used": 0},
+        "net_io": {"bytes_sent": 0}
+    }]
+    result = transformer.transform(data)
+    assert len(result) == 1
+    assert result[0].cpu_percent == 0.0
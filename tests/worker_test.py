@@ -0,0 +1,92 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from sqlalchemy import func, select
+
+from app.ingest.stream import StreamConsumer, StreamProducer
+from app.models.models import MetricsModel
+from app.models.sample import MetricSample
+from app.worker import StorageWorker
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def make_item(i):
+    return MetricSample.from_dict({
+        "time_stamp": f"2025-05-21T14:00:{i:02d}+00:00",
+        "cpu_percent": float(i + 1),
+        "memory": {"used": i},
+        "disk": {"used": i},
+        "net_io": {"bytes_sent": i},
+    })
+
+
+@pytest.fixture
+def fake_redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+@pytest.fixture
+def stream(fake_redis):
+    with patch("app.ingest.stream.redis.from_url", return_value=fake_redis):
+        producer = StreamProducer(stream="test:stream")
+        consumers = [
+            StreamConsumer(stream="test:stream", group="storage", consumer=name, batch_size=4, block_ms=0)
+            for name in ("w1", "w2")
+        ]
+    return producer, consumers
+
+
+def make_worker(consumer, session_factory):
+    return StorageWorker(consumer, session_factory, cache=MagicMock(cache_many=AsyncMock()))
+
+
+async def count_rows(session_factory):
+    async with session_factory() as session:
+        return await session.scalar(select(func.count()).select_from(MetricsModel))
+
+
+@pytest.mark.asyncio
+async def test_workers_split_the_stream_and_ack(stream, session_factory):
+    producer, consumers = stream
+    workers = [make_worker(consumer, session_factory) for consumer in consumers]
+    await consumers[0].ensure_group()
+    await producer.add_many([make_item(i) for i in range(6)])
+
+    assert await workers[0].run_batch() == 4
+    assert await workers[1].run_batch() == 2
+    assert await count_rows(session_factory) == 6
+    assert await consumers[0].pending() == 0
+    # stored batches are cached with their new ids
+    (records,) = workers[1].cache.cache_many.call_args.args
+    assert [r["id"] for r in records] == [5, 6]
+
+
+@pytest.mark.asyncio
+async def test_failed_write_leaves_entries_pending(stream, session_factory):
+    producer, (consumer, _) = stream
+    worker = make_worker(consumer, session_factory)
+    await consumer.ensure_group()
+    await producer.add_many([make_item(0)])
+
+    with patch.object(worker.storage, "save_many_to_db", AsyncMock(return_value=[])):
+        assert await worker.run_batch() == 0
+    assert await consumer.pending() == 1
+
+    # the entry is redelivered once it has been idle long enough
+    consumer.claim_idle_ms = 0
+    assert await worker.run_batch() == 1
+    assert await count_rows(session_factory) == 1
+
+
+@pytest.mark.asyncio
+async def test_unreadable_entries_are_dropped(stream, session_factory, fake_redis):
+    producer, (consumer, _) = stream
+    worker = make_worker(consumer, session_factory)
+    await consumer.ensure_group()
+    await fake_redis.xadd("test:stream", {"data": "not json"})
+    await producer.add_many([make_item(1)])
+
+    assert await worker.run_batch() == 2
+    assert worker.stats()["dropped"] == 1
+    assert await count_rows(session_factory) == 1